@@ -1,2 +1,21 @@
-from . import agent
+"""
+Butler host-action agent.
 
+`agent`, `actions` and `root_agent` load on first attribute access (PEP 562),
+so importing the package does not load google.adk or build the agent.
+"""
+import importlib
+
+_SUBMODULES = frozenset({"actions", "agent"})
+
+
+def __getattr__(name: str):
+    if name == "root_agent":
+        return importlib.import_module(".agent", __name__).root_agent
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES | {"root_agent"})
@@ -0,0 +1,562 @@
+"""
+Server-side executor for the host app actions the agent emits.
+
+The agent talks to Google through JSON actions such as
+{"action":"LIST_TASKS","maxResults":10}, which the browser normally runs one
+per model turn. ActionExecutor runs them here instead:
+
+- every action is validated against ACTION_SPECS before anything is called;
+- LIST_* and READ_EMAILS results are cached for a per-action TTL, and a write
+  to the same service (CREATE_EVENT, COMPLETE_TASK, ...) invalidates them;
+- an identical write repeated within ACTION_DEDUPE_WINDOW seconds returns the
+  first result instead of running again, and identical calls in flight share
+  one request;
+- execute_all() runs actions on different services concurrently, keeping the
+  given order only between a write and the other actions on its service.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Tuple
+
+# Seconds an identical write is answered from its first result
+ACTION_DEDUPE_WINDOW = float(os.getenv("ACTION_DEDUPE_WINDOW", "10"))
+# Upper bound on cached read results per executor
+ACTION_CACHE_SIZE = int(os.getenv("ACTION_CACHE_SIZE", "256"))
+# Google API requests in flight at once per executor
+ACTION_CONCURRENCY = int(os.getenv("ACTION_CONCURRENCY", "4"))
+# Replaces every Google API host, e.g. to point at a local fake server
+GOOGLE_API_BASE_URL = os.getenv("GOOGLE_API_BASE_URL", "")
+
+_EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+# RFC 3339 date-time: full date and time with seconds, optional fraction, and a Z or +hh:mm offset
+_RFC3339 = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:\d{2})$", re.IGNORECASE)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class ActionValidationError(ValueError):
+    """An action object is malformed or does not match its schema."""
+
+
+class ActionSpec:
+    """
+    Schema of one action.
+
+    `fields` maps each argument to (type, default); type is str, int, bool,
+    "rfc3339", "email" or ["email"]. Fields in `required` must be present and
+    non-empty. `ttl` marks an idempotent read whose result may be cached for
+    that many seconds; actions without one are writes and invalidate the
+    cached reads of their `service`.
+    """
+
+    def __init__(self, service: str, fields: Dict[str, Tuple[Any, Any]], required: Tuple[str, ...] = (),
+                 choices: Optional[Dict[str, Tuple[Any, ...]]] = None, ttl: Optional[float] = None):
+        self.service = service
+        self.fields = fields
+        self.required = required
+        self.choices = choices or {}
+        self.ttl = ttl
+
+    @property
+    def is_read(self) -> bool:
+        return self.ttl is not None
+
+
+ACTION_SPECS: Dict[str, ActionSpec] = {
+    "READ_EMAILS": ActionSpec(
+        "gmail", {"platform": (str, "gmail"), "filter": (str, "most_recent"), "maxResults": (int, None)},
+        choices={"platform": ("gmail",), "filter": ("most_recent", "unread", "all")},
+        ttl=float(os.getenv("ACTION_TTL_READ_EMAILS", "30")),
+    ),
+    "SEND_EMAIL": ActionSpec(
+        "gmail", {"recipient": ("email", None), "subject": (str, None), "content": (str, None),
+                  "tone": (str, "professional")},
+        required=("recipient", "subject", "content"),
+    ),
+    "REPLY_EMAIL": ActionSpec(
+        "gmail", {"threadId": (str, None), "messageId": (str, None), "content": (str, None)},
+        required=("threadId", "content"),
+    ),
+    "CREATE_EVENT": ActionSpec(
+        "calendar", {"title": (str, None), "start": ("rfc3339", None), "end": ("rfc3339", None),
+                     "attendees": (["email"], None), "description": (str, None)},
+        required=("title", "start", "end"),
+    ),
+    "DELETE_EVENT": ActionSpec("calendar", {"eventId": (str, None)}, required=("eventId",)),
+    "LIST_EVENTS": ActionSpec(
+        "calendar", {"timeMin": ("rfc3339", None), "timeMax": ("rfc3339", None), "q": (str, None),
+                     "maxResults": (int, 10)},
+        ttl=float(os.getenv("ACTION_TTL_LIST_EVENTS", "60")),
+    ),
+    "LIST_DRIVE_FILES": ActionSpec(
+        "drive", {"pageSize": (int, 10)}, ttl=float(os.getenv("ACTION_TTL_LIST_DRIVE_FILES", "120")),
+    ),
+    "LIST_TASKS": ActionSpec(
+        "tasks", {"maxResults": (int, 10), "showCompleted": (bool, None)},
+        ttl=float(os.getenv("ACTION_TTL_LIST_TASKS", "60")),
+    ),
+    "CREATE_TASK": ActionSpec(
+        "tasks", {"title": (str, None), "due": ("rfc3339", None), "notes": (str, None)}, required=("title",),
+    ),
+    "COMPLETE_TASK": ActionSpec("tasks", {"taskId": (str, None)}, required=("taskId",)),
+    "DELETE_TASK": ActionSpec("tasks", {"taskId": (str, None)}, required=("taskId",)),
+}
+
+
+def _check_type(action: str, name: str, value: Any, kind: Any) -> Any:
+    if isinstance(kind, list):
+        if not isinstance(value, list):
+            raise ActionValidationError(f"{action}.{name} must be a list")
+        return [_check_type(action, name, item, kind[0]) for item in value]
+    if kind is int:
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            raise ActionValidationError(f"{action}.{name} must be a positive integer")
+        return value
+    if kind is bool:
+        if not isinstance(value, bool):
+            raise ActionValidationError(f"{action}.{name} must be true or false")
+        return value
+    if not isinstance(value, str):
+        raise ActionValidationError(f"{action}.{name} must be a string")
+    if kind == "email" and not _EMAIL.match(value):
+        raise ActionValidationError(f"{action}.{name} is not an email address: {value!r}")
+    if kind == "rfc3339":
+        # fromisoformat alone also takes dates and offset-less times, which the Google APIs reject
+        try:
+            if not _RFC3339.match(value):
+                raise ValueError(value)
+            datetime.fromisoformat(value.upper())
+        except ValueError:
+            raise ActionValidationError(f"{action}.{name} is not an RFC3339 timestamp: {value!r}")
+    return value
+
+
+def validate_action(obj: Any) -> Dict[str, Any]:
+    """
+    Check an action object against its spec and fill in defaults.
+
+    Returns a new dict holding "action" and every declared field (unknown keys
+    are dropped, so they cannot make otherwise identical actions look different).
+    Raises ActionValidationError on any mismatch.
+    """
+    if not isinstance(obj, dict) or not isinstance(obj.get("action"), str):
+        raise ActionValidationError("An action must be a JSON object with an \"action\" string")
+    name = obj["action"]
+    spec = ACTION_SPECS.get(name)
+    if spec is None:
+        raise ActionValidationError(f"Unknown action: {name}")
+    action: Dict[str, Any] = {"action": name}
+    for field, (kind, default) in spec.fields.items():
+        value = obj.get(field)
+        if value is None or value == "":
+            if field in spec.required:
+                raise ActionValidationError(f"Missing {field} for {name}")
+            action[field] = default
+            continue
+        value = _check_type(name, field, value, kind)
+        if field in spec.choices and value not in spec.choices[field]:
+            raise ActionValidationError(f"{name}.{field} must be one of {', '.join(spec.choices[field])}")
+        action[field] = value
+    return action
+
+
+def parse_actions(text: str) -> List[Dict[str, Any]]:
+    """
+    Action objects found in model output, tolerating code fences and prose.
+
+    Accepts a single object, a JSON array of objects, or several objects in
+    one text; objects without an "action" string are ignored.
+    """
+    candidate = text.strip()
+    if candidate.startswith("```"):
+        candidate = candidate.split("\n", 1)[-1].rsplit("```", 1)[0]
+    decoder = json.JSONDecoder()
+    found: List[Any] = []
+    index = 0
+    while True:
+        starts = [i for i in (candidate.find("{", index), candidate.find("[", index)) if i >= 0]
+        if not starts:
+            break
+        start = min(starts)
+        try:
+            value, index = decoder.raw_decode(candidate, start)
+        except ValueError:
+            index = start + 1
+            continue
+        found.extend(value if isinstance(value, list) else [value])
+    return [obj for obj in found if isinstance(obj, dict) and isinstance(obj.get("action"), str)]
+
+
+def action_key(action: Dict[str, Any]) -> str:
+    """Canonical form of a validated action, identical for identical requests."""
+    return json.dumps(action, sort_keys=True, separators=(",", ":"))
+
+
+class ActionExecutor:
+    """
+    Runs validated actions through `handlers` (action name -> async callable
+    returning the result fields) with caching, deduplication and coalescing.
+
+    Results mirror what the host app sends back to the agent: {"ok": true,
+    "action": ..., <fields>} or {"ok": false, "action": ..., "error": ...};
+    answers served from the cache carry "cached": true and repeated writes
+    "deduplicated": true.
+    """
+
+    def __init__(self, handlers: Dict[str, Handler], dedupe_window: float = ACTION_DEDUPE_WINDOW,
+                 cache_size: int = ACTION_CACHE_SIZE, clock: Callable[[], float] = time.monotonic):
+        self.handlers = handlers
+        self.dedupe_window = dedupe_window
+        self.cache_size = cache_size
+        self.clock = clock
+        # key -> (expires at, service, result); reads only
+        self._cache: "OrderedDict[str, Tuple[float, str, Dict[str, Any]]]" = OrderedDict()
+        # key -> (completed at, result); successful writes only
+        self._recent: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._inflight: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+        self.calls = 0
+
+    def invalidate(self, service: Optional[str] = None) -> None:
+        """Drop cached reads of one service, or all of them."""
+        for key in [k for k, (_, s, _) in self._cache.items() if service is None or s == service]:
+            del self._cache[key]
+
+    def _cached(self, key: str, spec: ActionSpec, now: float) -> Optional[Dict[str, Any]]:
+        if spec.is_read:
+            entry = self._cache.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._cache.move_to_end(key)
+                    return dict(entry[2], cached=True)
+                del self._cache[key]
+            return None
+        entry = self._recent.get(key)
+        if entry is not None and now - entry[0] < self.dedupe_window:
+            return dict(entry[1], deduplicated=True)
+        return None
+
+    def _store(self, key: str, spec: ActionSpec, result: Dict[str, Any], now: float) -> None:
+        if spec.is_read:
+            self._cache[key] = (now + spec.ttl, spec.service, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return
+        self._recent = {k: v for k, v in self._recent.items() if now - v[0] < self.dedupe_window}
+        self._recent[key] = (now, result)
+        self.invalidate(spec.service)
+
+    async def execute(self, obj: Any) -> Dict[str, Any]:
+        """Validate and run one action; never raises."""
+        try:
+            action = validate_action(obj)
+        except ActionValidationError as e:
+            return {"ok": False, "action": obj.get("action") if isinstance(obj, dict) else None, "error": str(e)}
+        name, spec = action["action"], ACTION_SPECS[action["action"]]
+        key = action_key(action)
+        cached = self._cached(key, spec, self.clock())
+        if cached is not None:
+            return cached
+        pending = self._inflight.get(key)
+        if pending is not None:
+            # The same request is already running; share its answer
+            return dict(await asyncio.shield(pending), **({} if spec.is_read else {"deduplicated": True}))
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        result = None
+        try:
+            handler = self.handlers.get(name)
+            if handler is None:
+                raise ActionValidationError(f"Unhandled action {name}")
+            self.calls += 1
+            result = dict({"ok": True, "action": name}, **await handler(action))
+            self._store(key, spec, result, self.clock())
+        except Exception as e:
+            result = {"ok": False, "action": name, "error": str(e)}
+        finally:
+            del self._inflight[key]
+            # Resolved even when this call is cancelled, so coalesced callers never wait forever
+            future.set_result(result if result is not None
+                              else {"ok": False, "action": name, "error": "Cancelled before it completed"})
+        return result
+
+    async def execute_all(self, actions: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Run several actions, concurrently where they are independent.
+
+        Reads on a service wait for the last write before them on that service;
+        a write waits for everything before it on its service. Results come
+        back in the order given.
+        """
+        tasks: List["asyncio.Task[Dict[str, Any]]"] = []
+        last_write: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+        reads_since: Dict[str, List["asyncio.Task[Dict[str, Any]]"]] = {}
+        for obj in actions:
+            spec = ACTION_SPECS.get(obj.get("action")) if isinstance(obj, dict) else None
+            if spec is None:
+                tasks.append(asyncio.ensure_future(self.execute(obj)))
+                continue
+            before = [last_write[spec.service]] if spec.service in last_write else []
+            if not spec.is_read:
+                before += reads_since.pop(spec.service, [])
+            task = asyncio.ensure_future(self._after(before, obj))
+            if spec.is_read:
+                reads_since.setdefault(spec.service, []).append(task)
+            else:
+                last_write[spec.service] = task
+            tasks.append(task)
+        return list(await asyncio.gather(*tasks))
+
+    async def _after(self, before: List["asyncio.Task[Dict[str, Any]]"], obj: Any) -> Dict[str, Any]:
+        if before:
+            await asyncio.gather(*before)
+        return await self.execute(obj)
+
+    async def execute_text(self, text: str) -> List[Dict[str, Any]]:
+        """Run every action found in a piece of model output."""
+        return await self.execute_all(parse_actions(text))
+
+
+class GoogleActions:
+    """
+    Handlers for every action, calling the Gmail, Calendar, Drive and Tasks
+    REST APIs with one OAuth access token. Blocking requests run in worker
+    threads, at most ACTION_CONCURRENCY at a time.
+    """
+
+    def __init__(self, token: str, base_url: Optional[str] = None, concurrency: int = ACTION_CONCURRENCY):
+        self.token = token
+        # Looked up per instance, so GOOGLE_API_BASE_URL can be changed after import
+        self.base_url = (GOOGLE_API_BASE_URL if base_url is None else base_url).rstrip("/")
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._task_list_id: Optional[str] = None
+
+    def _url(self, url: str) -> str:
+        if not self.base_url:
+            return url
+        parts = urllib.parse.urlsplit(url)
+        return self.base_url + parts.path + (f"?{parts.query}" if parts.query else "")
+
+    def _request(self, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                 body: Optional[Dict[str, Any]] = None) -> Any:
+        if params:
+            url += "?" + urllib.parse.urlencode(
+                [(k, v) for k, v in params.items() if v is not None], doseq=True
+            )
+        headers = {"Authorization": f"Bearer {self.token}"}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(self._url(url), data=data, headers=headers, method=method)
+        with self._slots:
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    payload = response.read()
+            except urllib.error.HTTPError as e:
+                raise RuntimeError(f"{method} {url.split('?')[0]} failed {e.code}: {e.read()[:200].decode('utf-8', 'replace')}")
+        return json.loads(payload) if payload else {}
+
+    async def _call(self, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                    body: Optional[Dict[str, Any]] = None) -> Any:
+        return await asyncio.to_thread(self._request, method, url, params, body)
+
+    def handlers(self) -> Dict[str, Handler]:
+        return {
+            "READ_EMAILS": self.read_emails,
+            "SEND_EMAIL": self.send_email,
+            "REPLY_EMAIL": self.reply_email,
+            "CREATE_EVENT": self.create_event,
+            "DELETE_EVENT": self.delete_event,
+            "LIST_EVENTS": self.list_events,
+            "LIST_DRIVE_FILES": self.list_drive_files,
+            "LIST_TASKS": self.list_tasks,
+            "CREATE_TASK": self.create_task,
+            "COMPLETE_TASK": self.complete_task,
+            "DELETE_TASK": self.delete_task,
+        }
+
+    # ---------- Gmail ----------
+    _GMAIL = "https://gmail.googleapis.com/gmail/v1/users/me"
+
+    async def read_emails(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        limit = action["maxResults"] or (1 if action["filter"] == "most_recent" else 5)
+        listing = await self._call("GET", f"{self._GMAIL}/messages", {
+            "labelIds": "INBOX", "includeSpamTrash": "false", "maxResults": limit,
+            "q": "is:unread" if action["filter"] == "unread" else None,
+        })
+        ids = [m["id"] for m in listing.get("messages", [])]
+        details = await asyncio.gather(*(
+            self._call("GET", f"{self._GMAIL}/messages/{urllib.parse.quote(i)}",
+                       {"format": "metadata", "metadataHeaders": ["From", "Subject", "Date"]})
+            for i in ids
+        ), return_exceptions=True)
+        messages = []
+        for message_id, msg in zip(ids, details):
+            if isinstance(msg, Exception):
+                messages.append({"id": message_id})
+                continue
+            headers = {h.get("name", "").lower(): h.get("value") for h in msg.get("payload", {}).get("headers", [])}
+            messages.append({
+                "id": msg.get("id", message_id), "threadId": msg.get("threadId"), "from": headers.get("from"),
+                "subject": headers.get("subject"), "date": headers.get("date"), "snippet": msg.get("snippet"),
+                "labelIds": msg.get("labelIds", []),
+            })
+        return {"filter": action["filter"], "messages": messages}
+
+    @staticmethod
+    def _raw(lines: List[str], body: str) -> str:
+        message = "\r\n".join(lines + ["Content-Type: text/plain; charset=UTF-8", "", body])
+        return base64.urlsafe_b64encode(message.encode("utf-8")).decode().rstrip("=")
+
+    async def send_email(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        raw = self._raw([f"To: {action['recipient']}", f"Subject: {action['subject']}"], action["content"])
+        sent = await self._call("POST", f"{self._GMAIL}/messages/send", body={"raw": raw})
+        return {"id": sent.get("id"), "threadId": sent.get("threadId")}
+
+    async def reply_email(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        thread = await self._call("GET", f"{self._GMAIL}/threads/{urllib.parse.quote(action['threadId'])}",
+                                  {"format": "metadata", "metadataHeaders": ["From", "Subject", "Message-Id"]})
+        messages = thread.get("messages", [])
+        target = next((m for m in messages if m.get("id") == action["messageId"]), messages[-1] if messages else {})
+        headers = {h.get("name", "").lower(): h.get("value", "") for h in target.get("payload", {}).get("headers", [])}
+        subject = headers.get("subject", "")
+        lines = [f"To: {headers.get('from', '')}",
+                 f"Subject: {subject if subject.lower().startswith('re:') else 'Re: ' + subject}"]
+        if headers.get("message-id"):
+            lines += [f"In-Reply-To: {headers['message-id']}", f"References: {headers['message-id']}"]
+        sent = await self._call("POST", f"{self._GMAIL}/messages/send",
+                                body={"raw": self._raw(lines, action["content"]), "threadId": action["threadId"]})
+        return {"id": sent.get("id"), "threadId": sent.get("threadId")}
+
+    # ---------- Calendar ----------
+    _CALENDAR = "https://www.googleapis.com/calendar/v3/calendars/primary/events"
+
+    async def create_event(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        event = {"summary": action["title"], "description": action["description"] or "",
+                 "start": {"dateTime": action["start"]}, "end": {"dateTime": action["end"]}}
+        if action["attendees"]:
+            event["attendees"] = [{"email": email} for email in action["attendees"]]
+        created = await self._call("POST", self._CALENDAR, body=event)
+        return {"eventId": created.get("id")}
+
+    async def delete_event(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        await self._call("DELETE", f"{self._CALENDAR}/{urllib.parse.quote(action['eventId'])}")
+        return {"eventId": action["eventId"]}
+
+    async def list_events(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        data = await self._call("GET", self._CALENDAR, {
+            "singleEvents": "true", "orderBy": "startTime", "timeMin": action["timeMin"],
+            "timeMax": action["timeMax"], "maxResults": action["maxResults"], "q": action["q"],
+        })
+        events = data.get("items", [])
+        return {"count": len(events), "events": events}
+
+    # ---------- Drive ----------
+    async def list_drive_files(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        data = await self._call("GET", "https://www.googleapis.com/drive/v3/files", {
+            "pageSize": action["pageSize"], "orderBy": "modifiedTime desc",
+            "fields": "files(id,name,mimeType,modifiedTime,owners(displayName),webViewLink,iconLink,thumbnailLink,size)",
+        })
+        files = data.get("files", [])
+        return {"count": len(files), "files": files}
+
+    # ---------- Tasks ----------
+    _TASKS = "https://tasks.googleapis.com/tasks/v1"
+
+    async def _tasks_url(self, task_id: Optional[str] = None) -> str:
+        # The default list id never changes, so it is looked up once instead of per call
+        if self._task_list_id is None:
+            lists = (await self._call("GET", f"{self._TASKS}/users/@me/lists")).get("items", [])
+            if not lists:
+                raise RuntimeError("No Google Task lists found for user")
+            preferred = next((l for l in lists if "my tasks" in str(l.get("title", "")).lower()), lists[0])
+            self._task_list_id = preferred["id"]
+        url = f"{self._TASKS}/lists/{urllib.parse.quote(self._task_list_id)}/tasks"
+        return f"{url}/{urllib.parse.quote(task_id)}" if task_id else url
+
+    async def list_tasks(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        data = await self._call("GET", await self._tasks_url(), {
+            "showDeleted": "false", "showHidden": "false", "maxResults": action["maxResults"],
+            "showCompleted": "false" if action["showCompleted"] is False else None,
+        })
+        tasks = data.get("items", [])
+        return {"count": len(tasks), "tasks": tasks}
+
+    async def create_task(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        body = {k: action[k] for k in ("title", "due", "notes") if action[k]}
+        created = await self._call("POST", await self._tasks_url(), body=body)
+        return {"taskId": created.get("id")}
+
+    async def complete_task(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        completed = datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+        updated = await self._call("PATCH", await self._tasks_url(action["taskId"]),
+                                   body={"status": "completed", "completed": completed})
+        return {"taskId": updated.get("id", action["taskId"])}
+
+    async def delete_task(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        await self._call("DELETE", await self._tasks_url(action["taskId"]))
+        return {"taskId": action["taskId"]}
+
+
+_executors: "OrderedDict[str, ActionExecutor]" = OrderedDict()
+_executors_lock = threading.Lock()
+_MAX_EXECUTORS = 64
+
+
+def get_executor(token: str) -> ActionExecutor:
+    """
+    Executor for one Google access token. Caches are per token, so one user
+    never sees another's results; the least recently used executors are dropped.
+    """
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    with _executors_lock:
+        executor = _executors.get(key)
+        if executor is None:
+            executor = _executors[key] = ActionExecutor(GoogleActions(token).handlers())
+            while len(_executors) > _MAX_EXECUTORS:
+                _executors.popitem(last=False)
+        _executors.move_to_end(key)
+        return executor
+
+
+_session_tokens: "OrderedDict[str, str]" = OrderedDict()
+_session_tokens_lock = threading.Lock()
+_MAX_SESSION_TOKENS = 1024
+
+
+def set_session_token(session_id: str, token: Optional[str]) -> None:
+    """
+    Share the user's Google access token for one session with run_actions.
+
+    The host calls this on every request it forwards, e.g. with the bearer
+    token from its own request headers. Tokens live only in this process's
+    memory, never in session state or events; None forgets the session's token,
+    and the least recently used sessions are dropped.
+    """
+    with _session_tokens_lock:
+        if token is None:
+            _session_tokens.pop(session_id, None)
+            return
+        _session_tokens[session_id] = token
+        _session_tokens.move_to_end(session_id)
+        while len(_session_tokens) > _MAX_SESSION_TOKENS:
+            _session_tokens.popitem(last=False)
+
+
+def session_token(session_id: Optional[str]) -> Optional[str]:
+    """The token set_session_token() shared for `session_id`, if any."""
+    with _session_tokens_lock:
+        return _session_tokens.get(session_id) if session_id else None
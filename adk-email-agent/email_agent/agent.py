@@ -1,13 +1,52 @@
+import os
+
 from google.adk.agents import Agent
+from google.adk.tools.tool_context import ToolContext
+
+from .actions import get_executor, parse_actions, session_token
 
 # This agent is designed to use "host app actions" rather than calling provider APIs directly.
 # The frontend will parse emitted JSON actions and execute them using the user's Google OAuth token.
+# When the host shares that token with the server (actions.set_session_token per request, or the
+# GOOGLE_ACCESS_TOKEN environment variable), run_actions executes them here instead, in the same turn.
+# The token is never read from session state, which is persisted and logged.
+
+
+def _session_id(tool_context: ToolContext):
+	"""Id of the session a tool call belongs to, when the context exposes it."""
+	session = getattr(getattr(tool_context, "_invocation_context", None), "session", None)
+	return getattr(session, "id", None)
+
+
+async def run_actions(actions: str, tool_context: ToolContext) -> dict:
+	"""
+	Execute host app actions on the server and return their results.
+
+	Args:
+		actions: One JSON action object, a JSON array of them, or several objects in one string
+		tool_context: Context of the calling session, whose shared token is used
+
+	Returns:
+		Dictionary with one result per action, in order; repeated reads may be served from cache
+	"""
+	token = session_token(_session_id(tool_context)) or os.getenv("GOOGLE_ACCESS_TOKEN")
+	if not token:
+		return {
+			"status": "unavailable",
+			"message": "No Google token on the server; emit the action JSON for the host app instead"
+		}
+	parsed = parse_actions(actions)
+	if not parsed:
+		return {"status": "error", "message": "No action objects found"}
+	results = await get_executor(token).execute_all(parsed)
+	return {
+		"status": "success" if all(r["ok"] for r in results) else "partial",
+		"results": results,
+		"count": len(results),
+	}
 
-root_agent = Agent(
-	name="email_agent",
-	model="gemini-2.0-flash",
-	description="Email, calendar, Drive metadata, and Tasks assistant via host app actions",
-	instruction="""
+
+ROOT_INSTRUCTION = """
 	You are Butler, an assistant that uses HOST APP ACTIONS. The host app executes actions you emit using the user's Google account.
 
 	CORE CAPABILITIES
@@ -66,9 +105,36 @@ root_agent = Agent(
 	- To delete a task, emit ONLY:
 	  {"action":"DELETE_TASK","taskId":"<id>"}
 
+	SERVER EXECUTION
+	- Prefer calling run_actions with the action JSON over emitting it; pass several independent actions as one JSON array
+	  (for example LIST_EVENTS and LIST_TASKS together). Only call it for SEND_EMAIL, REPLY_EMAIL, CREATE_*, DELETE_* or
+	  COMPLETE_TASK after the same confirmation the emitted JSON would need.
+	- If run_actions returns status "unavailable", emit the action JSON for the host app as described above.
+
 	OUTPUT RULES
 	- Be brief and precise. Ask only what’s needed next. Avoid capability lists.
 	- When emitting JSON actions, output exactly one JSON object and nothing else.
 	- Do NOT use code fences or markdown around JSON. Output raw JSON only (no backticks, no language tags).
-	""",
-)
\ No newline at end of file
+	"""
+
+_root_agent = None
+
+
+def get_root_agent() -> Agent:
+	"""The root agent, built on first access to `agent.root_agent`."""
+	global _root_agent
+	if _root_agent is None:
+		_root_agent = Agent(
+			name="email_agent",
+			model="gemini-2.0-flash",
+			description="Email, calendar, Drive metadata, and Tasks assistant via host app actions",
+			instruction=ROOT_INSTRUCTION,
+			tools=[run_actions],
+		)
+	return _root_agent
+
+
+def __getattr__(name: str):
+	if name == "root_agent":
+		return get_root_agent()
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
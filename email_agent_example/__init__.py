@@ -1 +1,26 @@
-from . import agent
+"""
+Email agent with local mailbox, search, summaries and provider fan-out.
+
+Submodules and `root_agent` load on first attribute access (PEP 562), so
+importing the package, or a single submodule such as mailbox, neither loads
+google.adk nor builds the agent.
+"""
+import importlib
+
+_SUBMODULES = frozenset({
+    "agent", "async_tools", "attachments", "batch", "benchmarks", "cache", "categorizer", "drafts", "duplicates",
+    "events", "gmail", "history", "loadtest", "mailbox", "metrics", "providers", "records", "replies", "responses",
+    "search_index", "spam", "state_log", "stub_server", "summaries", "text_analysis", "tool_schemas",
+})
+
+
+def __getattr__(name: str):
+    if name == "root_agent":
+        return importlib.import_module(".agent", __name__).root_agent
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES | {"root_agent"})
@@ -1,176 +1,279 @@
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
+import json
 from datetime import datetime, timedelta
-import re
 from typing import List, Dict, Any, Optional
 
-
-def read_emails(platform: str, tool_context: ToolContext, filter_type: str = "all") -> dict:
+from . import state_log
+from .attachments import get_attachment_store
+from .batch import summarize_cached
+from .categorizer import category_map, get_categorizer, save_categories, set_category
+from .drafts import display_name, iter_drafts, iter_recipients, read_batch, render_body, write_batch
+from .duplicates import collapse, normalize_subject
+from .events import get_event_extractor
+from .history import HistoryPolicy, append_history, content_digest, history_entries
+from .mailbox import encode_cursor, get_mailbox
+from .metrics import instrument
+from .records import HEADER_FIELDS, EmailRecord
+from .replies import days_since, get_reply_tracker, parse_deadline
+from .responses import ResponsePolicy, by_priority, one, response_budget, shape_response
+from .spam import CorrectionOverlay, get_classifier
+from .summaries import get_summary_cache
+from .text_analysis import get_analyzer
+
+# Upper bound on emails returned by a single read_emails call
+MAX_PAGE_SIZE = 50
+
+# Spam probability at or above which detect_spam flags an email
+SPAM_THRESHOLD = 0.5
+
+DAY = 24 * 60 * 60
+
+
+def _session_id(tool_context: ToolContext) -> Optional[str]:
+    """Id of the session a tool call belongs to, when the context exposes it."""
+    session = getattr(getattr(tool_context, "_invocation_context", None), "session", None)
+    return getattr(session, "id", None)
+
+
+def _compact_summary_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {"timestamp": entry["timestamp"], "count": entry["count"]}
+
+
+def _compact_draft_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    if "draft" not in entry:
+        return entry
+    compacted = {k: v for k, v in entry.items() if k != "draft"}
+    compacted["draft_digest"] = content_digest(entry["draft"])
+    compacted["draft_length"] = len(entry["draft"])
+    return compacted
+
+
+def _compact_spam_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: entry.get(k) for k in ("timestamp", "email_id", "is_spam")}
+
+
+def _compact_attachment_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    compacted = {k: v for k, v in entry.items() if k != "result"}
+    compacted["ok"] = "error" not in entry["result"]
+    return compacted
+
+
+# Retention for the per-tool histories kept in session state; every tool write
+# goes through append_history so state stays bounded on long-running sessions.
+HISTORY_POLICIES = {
+    "email_reading_history": HistoryPolicy(capacity=50, ttl_seconds=7 * DAY),
+    "email_search_history": HistoryPolicy(capacity=50, ttl_seconds=7 * DAY),
+    "email_summary_history": HistoryPolicy(capacity=50, ttl_seconds=7 * DAY, keep_full=10,
+                                           compact=_compact_summary_entry),
+    "email_draft_history": HistoryPolicy(capacity=25, ttl_seconds=30 * DAY, keep_full=5,
+                                         compact=_compact_draft_entry),
+    "extracted_calendar_events": HistoryPolicy(capacity=100, ttl_seconds=30 * DAY),
+    "spam_detection_history": HistoryPolicy(capacity=200, ttl_seconds=30 * DAY, keep_full=50,
+                                            compact=_compact_spam_entry),
+    "attachment_management_history": HistoryPolicy(capacity=50, ttl_seconds=30 * DAY, keep_full=10,
+                                                   compact=_compact_attachment_entry),
+}
+
+# Shaping of the tool responses sent back to the model: per-item field limits
+# and which items go first when a response exceeds its token budget
+RESPONSE_POLICIES = {
+    "read_emails": ResponsePolicy(items="emails", truncate={"content": 2000, "attachments": 5}, paged=True),
+    "search_emails": ResponsePolicy(items="emails", truncate={"attachments": 5}, counts={"count": one}),
+    "summarize_emails": ResponsePolicy(items="summaries", rank=by_priority, truncate={
+        "keywords": 8, "actions_required": 5, "deadlines": 5, "attachments": 5, "duplicates": 20,
+    }, counts={"count": lambda summary: 1 + len(summary.get("duplicates") or []), "unique": one}),
+    "draft_bulk_emails": ResponsePolicy(items=("sample", "failed")),
+    "get_draft_batch": ResponsePolicy(items="drafts", paged=True),
+    "extract_calendar_events": ResponsePolicy(items="events", truncate={"duplicates": 20}, counts={"count": one}),
+    "detect_spam": ResponsePolicy(items="spam_results", rank=lambda result: not result.get("is_spam"),
+                                  counts={"spam_count": lambda result: int(bool(result.get("is_spam")))}),
+    "track_unanswered_emails": ResponsePolicy(items=("unanswered_emails", "newly_overdue")),
+}
+
+
+def shape_tool_response(tool_context: ToolContext, tool: str, result: Dict[str, Any],
+            fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Apply the tool's response policy and the session's token budget to a result."""
+    return shape_response(result, RESPONSE_POLICIES[tool], fields, response_budget(tool_context.state))
+
+
+@instrument
+def read_emails(platform: str, tool_context: ToolContext, filter_type: str = "all",
+                limit: int = 5, cursor: Optional[str] = None, include_body: bool = False,
+                fields: Optional[List[str]] = None) -> dict:
     """
-    Read emails from Gmail or Outlook with specified filtering.
+    Read emails from Gmail or Outlook with specified filtering, one page at a time.
     
     Args:
         platform: "gmail" or "outlook"
-        filter_type: "all", "unread", "read", "urgent", "promotional"
+        filter_type: "all", "most_recent", "unread", "read", "urgent", "promotional"
+        limit: Maximum number of emails to return (capped at MAX_PAGE_SIZE)
+        cursor: Continuation token from a previous call's next_cursor
+        include_body: Also return each email's full content; by default only headers and a preview
+        fields: Only return these fields of each email (the id is always included)
         tool_context: Context for accessing session state
     
     Returns:
-        Dictionary containing email data and metadata
+        Dictionary containing one page of email data, metadata and the next_cursor
     """
-    print(f"--- Tool: read_emails called for {platform} with filter: {filter_type} ---")
-    
-    # Simulate email reading - in real implementation, this would connect to Gmail/Outlook APIs
-    sample_emails = [
-        {
-            "id": "email_001",
-            "sender": "john.doe@company.com",
-            "sender_name": "John Doe",
-            "subject": "Q4 Project Update - Urgent Review Required",
-            "date": "2024-01-15 09:30:00",
-            "content": "Hi team, I need your review of the Q4 project deliverables by EOD today. The client meeting is scheduled for tomorrow morning and we need to ensure all materials are ready. Please prioritize this as it's critical for our quarterly review.",
-            "priority": "high",
-            "category": "urgent",
-            "has_attachments": True,
-            "attachments": ["Q4_Report.pdf", "Project_Timeline.xlsx"],
-            "requires_response": True,
-            "deadline": "2024-01-15 17:00:00"
-        },
-        {
-            "id": "email_002", 
-            "sender": "newsletter@techcompany.com",
-            "sender_name": "Tech Weekly Newsletter",
-            "subject": "This Week in AI: Latest Developments",
-            "date": "2024-01-15 08:15:00",
-            "content": "This week's top AI news: New developments in machine learning, breakthrough in natural language processing, and upcoming AI conferences. Read more about the latest trends and innovations in artificial intelligence.",
-            "priority": "low",
-            "category": "promotional",
-            "has_attachments": False,
-            "attachments": [],
-            "requires_response": False,
-            "deadline": None
-        },
-        {
-            "id": "email_003",
-            "sender": "sarah.wilson@client.com", 
-            "sender_name": "Sarah Wilson",
-            "subject": "Follow-up: Contract Discussion",
-            "date": "2024-01-14 16:45:00",
-            "content": "Hi, I wanted to follow up on our contract discussion from last week. I'm still interested in moving forward with the project and would like to schedule a call to discuss the next steps. When would be a good time for you?",
-            "priority": "medium",
-            "category": "follow-up",
-            "has_attachments": False,
-            "attachments": [],
-            "requires_response": True,
-            "deadline": "2024-01-17 17:00:00"
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    try:
+        # Every filter is an index lookup against the shared local mailbox store;
+        # only the requested page is ever read from it.
+        filtered_emails, next_cursor = get_mailbox().page_emails(filter_type, limit, cursor)
+    except ValueError as e:
+        return {
+            "status": "error",
+            "platform": platform,
+            "filter_type": filter_type,
+            "message": str(e)
         }
-    ]
-    
-    # Filter emails based on type
-    if filter_type == "unread":
-        filtered_emails = [email for email in sample_emails if email.get("unread", True)]
-    elif filter_type == "urgent":
-        filtered_emails = [email for email in sample_emails if email.get("priority") == "high"]
-    elif filter_type == "promotional":
-        filtered_emails = [email for email in sample_emails if email.get("category") == "promotional"]
-    else:
-        filtered_emails = sample_emails
     
     # Update state with email reading history
-    reading_history = tool_context.state.get("email_reading_history", [])
-    reading_history.append({
+    append_history(tool_context.state, "email_reading_history", [{
         "timestamp": datetime.now().isoformat(),
         "platform": platform,
         "filter": filter_type,
         "count": len(filtered_emails)
-    })
-    tool_context.state["email_reading_history"] = reading_history
+    }], HISTORY_POLICIES["email_reading_history"])
     
-    return {
+    result = shape_tool_response(tool_context, "read_emails", {
         "status": "success",
         "platform": platform,
         "filter_type": filter_type,
-        "emails": filtered_emails,
+        "emails": filtered_emails.to_dicts(HEADER_FIELDS + ("content",) if include_body else HEADER_FIELDS),
         "count": len(filtered_emails),
+        "has_more": next_cursor is not None,
+        "next_cursor": next_cursor,
         "message": f"Successfully read {len(filtered_emails)} emails from {platform}"
-    }
+    }, fields)
+    if "omitted" in result.get("response", {}):
+        # Emails cut to fit the budget start the next page
+        kept = len(result["emails"])
+        result.update(count=kept, has_more=True,
+                      next_cursor=encode_cursor(filter_type, filtered_emails[kept - 1]),
+                      message=f"Successfully read {kept} emails from {platform}; "
+                              f"{len(filtered_emails) - kept} more moved to the next page to fit the response budget")
+    return result
+
+
+@instrument
+def search_emails(query: str, tool_context: ToolContext, sender: Optional[str] = None,
+                  category: Optional[str] = None, priority: Optional[str] = None, date_from: Optional[str] = None,
+                  date_to: Optional[str] = None, limit: int = 10, fields: Optional[List[str]] = None) -> dict:
+    """
+    Search emails by text across subject, sender and body, ranked by relevance.
+    
+    Args:
+        query: Words to search for; all must match. End a word with * for prefix search
+        sender: Only emails from this address, or from a domain given as "@domain.com"
+        category: Only emails in this category (e.g. "urgent", "promotional")
+        priority: Only emails with this priority ("high", "medium", "low")
+        date_from: Earliest date to include, "YYYY-MM-DD"
+        date_to: Latest date to include, "YYYY-MM-DD"
+        limit: Maximum number of results (capped at MAX_PAGE_SIZE)
+        fields: Only return these fields of each email (the id is always included)
+        tool_context: Context for accessing session state
+    
+    Returns:
+        Dictionary containing matching emails, best match first, with relevance scores
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    results = get_mailbox().search(query, sender=sender, category=category, priority=priority,
+                                   date_from=date_from, date_to=date_to, limit=limit)
+    
+    # Update state with search history
+    append_history(tool_context.state, "email_search_history", [{
+        "timestamp": datetime.now().isoformat(),
+        "query": query,
+        "count": len(results)
+    }], HISTORY_POLICIES["email_search_history"])
+    
+    return shape_tool_response(tool_context, "search_emails", {
+        "status": "success",
+        "query": query,
+        "emails": [dict(email.to_dict(HEADER_FIELDS), score=score) for email, score in results],
+        "count": len(results),
+        "message": f"Found {len(results)} emails matching '{query}'"
+    }, fields)
 
 
-def summarize_emails(email_ids: List[str], tool_context: ToolContext) -> dict:
+@instrument
+def summarize_emails(email_ids: List[str], tool_context: ToolContext, fields: Optional[List[str]] = None) -> dict:
     """
     Provide detailed summaries of specified emails with key information extraction.
     
     Args:
         email_ids: List of email IDs to summarize
+        fields: Only return these fields of each summary, e.g. ["subject", "actions_required"]
+            (email_id is always included)
         tool_context: Context for accessing session state
     
     Returns:
         Dictionary containing email summaries with extracted information
     """
-    print(f"--- Tool: summarize_emails called for emails: {email_ids} ---")
-    
-    # In real implementation, this would fetch actual emails by ID
-    # For now, using sample data
-    sample_emails = {
-        "email_001": {
-            "sender": "john.doe@company.com",
-            "sender_name": "John Doe",
-            "subject": "Q4 Project Update - Urgent Review Required",
-            "date": "2024-01-15 09:30:00",
-            "content": "Hi team, I need your review of the Q4 project deliverables by EOD today. The client meeting is scheduled for tomorrow morning and we need to ensure all materials are ready. Please prioritize this as it's critical for our quarterly review.",
-            "priority": "high",
-            "category": "urgent",
-            "has_attachments": True,
-            "attachments": ["Q4_Report.pdf", "Project_Timeline.xlsx"],
-            "requires_response": True,
-            "deadline": "2024-01-15 17:00:00"
-        }
-    }
-    
-    summaries = []
-    for email_id in email_ids:
-        if email_id in sample_emails:
-            email = sample_emails[email_id]
-            
-            # Extract key information
-            keywords = extract_keywords(email["content"])
-            actions = extract_actions(email["content"])
-            deadlines = extract_deadlines(email["content"])
-            
-            summary = {
-                "email_id": email_id,
-                "sender": email["sender_name"],
-                "sender_email": email["sender"],
-                "date": email["date"],
-                "subject": email["subject"],
-                "priority": email["priority"],
-                "category": email["category"],
-                "main_content": email["content"][:200] + "..." if len(email["content"]) > 200 else email["content"],
-                "keywords": keywords,
-                "actions_required": actions,
-                "deadlines": deadlines,
-                "has_attachments": email["has_attachments"],
-                "attachments": email["attachments"],
-                "requires_response": email["requires_response"]
-            }
-            summaries.append(summary)
+    mailbox = get_mailbox()
+    emails = mailbox.get_emails(email_ids)
+    cache = get_summary_cache(_session_id(tool_context))
+    
+    # Near-duplicates (newsletter issues, the same message in several threads)
+    # are summarized once and listed under their representative. Bodies are read
+    # only for uncached signatures and summaries, one batched query for each.
+    representatives, clusters = collapse(
+        [(email_id, emails[email_id]) for email_id in email_ids if email_id in emails],
+        load_bodies=mailbox.load_bodies
+    )
+    
+    # Unchanged emails are served from the cache keyed by id + content hash;
+    # large sets of misses are split across the worker pool
+    summaries, cache_hits, timed_out, failed = summarize_cached(representatives, cache,
+                                                                load_bodies=mailbox.load_bodies)
+    misses = len(summaries) + len(timed_out) + len(failed) - cache_hits
+    timed_out = [member for email_id in timed_out for member in [email_id] + clusters[email_id]]
+    failed = [member for email_id in failed for member in [email_id] + clusters[email_id]]
+    entries = []
+    for summary in summaries:
+        entry = summary.to_dict()
+        if clusters[summary.email_id]:
+            # Each duplicate keeps its own headers: a copy may differ in subject, date or priority
+            entry["duplicates"] = [{
+                "email_id": member,
+                "sender": emails[member].sender,
+                "date": emails[member].date,
+                "subject": emails[member].subject,
+                "priority": emails[member].priority
+            } for member in clusters[summary.email_id]]
+        entries.append(entry)
+    covered = sum(1 + len(clusters[summary.email_id]) for summary in summaries)
     
     # Update state with summary history
-    summary_history = tool_context.state.get("email_summary_history", [])
-    summary_history.append({
+    append_history(tool_context.state, "email_summary_history", [{
         "timestamp": datetime.now().isoformat(),
         "email_ids": email_ids,
-        "count": len(summaries)
-    })
-    tool_context.state["email_summary_history"] = summary_history
-    
-    return {
-        "status": "success",
-        "summaries": summaries,
-        "count": len(summaries),
-        "message": f"Successfully summarized {len(summaries)} emails"
+        "count": covered
+    }], HISTORY_POLICIES["email_summary_history"])
+    
+    result = {
+        "status": "partial" if timed_out or failed else "success",
+        "summaries": entries,
+        "count": covered,
+        "unique": len(summaries),
+        "cache": {"hits": cache_hits, "misses": misses},
+        "message": f"Successfully summarized {covered} emails"
     }
-
-
+    if covered > len(summaries):
+        result["message"] += f" ({covered - len(summaries)} near-duplicates listed under their representative)"
+    if timed_out:
+        result["timed_out"] = timed_out
+        result["message"] += f"; {len(timed_out)} timed out and can be requested again"
+    if failed:
+        result["failed"] = failed
+        result["message"] += f"; {len(failed)} could not be summarized and can be requested again"
+    return shape_tool_response(tool_context, "summarize_emails", result, fields)
+
+
+@instrument
 def draft_email(recipient: str, subject: str, content: str, tool_context: ToolContext, 
                 tone: str = "professional") -> dict:
     """
@@ -186,61 +289,17 @@ def draft_email(recipient: str, subject: str, content: str, tool_context: ToolCo
     Returns:
         Dictionary containing the drafted email
     """
-    print(f"--- Tool: draft_email called for {recipient} with tone: {tone} ---")
-    
-    # Generate email based on tone
-    if tone == "professional":
-        draft = f"""Dear {recipient.split('@')[0].replace('.', ' ').title()},
-
-{content}
-
-Best regards,
-[Your Name]"""
-    elif tone == "casual":
-        draft = f"""Hi {recipient.split('@')[0].replace('.', ' ').title()}!
-
-{content}
-
-Cheers,
-[Your Name]"""
-    elif tone == "persuasive":
-        draft = f"""Dear {recipient.split('@')[0].replace('.', ' ').title()},
+    draft = render_body(tone, display_name(recipient), content)
 
-I hope this email finds you well. I'm reaching out because {content}
-
-I believe this opportunity would be mutually beneficial, and I'd love to discuss it further with you.
-
-Looking forward to hearing from you.
-
-Best regards,
-[Your Name]"""
-    elif tone == "empathetic":
-        draft = f"""Dear {recipient.split('@')[0].replace('.', ' ').title()},
-
-I understand that {content}
-
-Please know that I'm here to support you through this process, and I'm committed to finding the best solution for everyone involved.
-
-Warm regards,
-[Your Name]"""
-    else:
-        draft = f"""Dear {recipient.split('@')[0].replace('.', ' ').title()},
-
-{content}
-
-Best regards,
-[Your Name]"""
-    
     # Update state with draft history
-    draft_history = tool_context.state.get("email_draft_history", [])
-    draft_history.append({
+    append_history(tool_context.state, "email_draft_history", [{
         "timestamp": datetime.now().isoformat(),
         "recipient": recipient,
         "subject": subject,
         "tone": tone,
-        "draft": draft
-    })
-    tool_context.state["email_draft_history"] = draft_history
+        "draft_digest": content_digest(draft),
+        "draft_length": len(draft)
+    }], HISTORY_POLICIES["email_draft_history"])
     
     return {
         "status": "success",
@@ -252,26 +311,124 @@ Best regards,
     }
 
 
+@instrument
+def draft_bulk_emails(subject: str, content: str, tool_context: ToolContext,
+                      recipients: Optional[List[str]] = None, csv_data: Optional[str] = None,
+                      tone: str = "professional") -> dict:
+    """
+    Draft the same email for many recipients in one call (mail merge).
+
+    Args:
+        subject: Subject line; may use placeholders such as {name} or any CSV column
+        content: Main content; may use placeholders such as {first_name}, {company} or any CSV column
+        recipients: Email addresses to draft for
+        csv_data: CSV text with a header row and an email column; other columns become placeholders
+        tone: "professional", "casual", "persuasive", "empathetic"
+        tool_context: Context for accessing session state
+
+    Returns:
+        Dictionary with the batch id, draft count, a few sample drafts and any rows that failed
+    """
+    try:
+        rows = iter_recipients(recipients, csv_data)
+        # Same inputs give the same batch id, so a repeated request rewrites one batch
+        batch_id = content_digest(json.dumps([subject, content, tone, recipients, csv_data]))
+        written = write_batch(iter_drafts(rows, subject, content, tone), batch_id, _session_id(tool_context))
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+
+    # Only a reference to the batch is kept in state, never the drafts themselves
+    append_history(tool_context.state, "email_draft_history", [{
+        "timestamp": datetime.now().isoformat(),
+        "batch_id": batch_id,
+        "subject": subject,
+        "tone": tone,
+        "count": written["count"],
+        "drafts_digest": written["digest"]
+    }], HISTORY_POLICIES["email_draft_history"])
+
+    return shape_tool_response(tool_context, "draft_bulk_emails", {
+        "status": "success" if written["count"] and not written["error_count"] else
+                  "partial" if written["count"] else "error",
+        "batch_id": batch_id,
+        "tone": tone,
+        "count": written["count"],
+        "sample": written["sample"],
+        "failed": written["errors"],
+        "failed_count": written["error_count"],
+        "message": f"Drafted {written['count']} emails in {tone} tone"
+                   + (f"; {written['error_count']} rows could not be drafted" if written["error_count"] else "")
+    })
+
+
+@instrument
+def get_draft_batch(batch_id: str, tool_context: ToolContext, offset: int = 0, limit: int = 10) -> dict:
+    """
+    Page through the drafts of a draft_bulk_emails batch.
+
+    Args:
+        batch_id: Batch id returned by draft_bulk_emails
+        offset: Index of the first draft to return; use the previous page's next_offset to continue
+        limit: Maximum number of drafts to return (capped at MAX_PAGE_SIZE)
+        tool_context: Context for accessing session state
+
+    Returns:
+        Dictionary containing the requested drafts and the next_offset to continue from
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    offset = max(0, offset)
+    try:
+        # One draft past the page tells whether another page exists
+        drafts = read_batch(batch_id, offset, limit + 1, _session_id(tool_context))
+    except (ValueError, OSError):
+        return {"status": "error", "batch_id": batch_id, "message": f"Draft batch {batch_id} not found"}
+    has_more = len(drafts) > limit
+    drafts = drafts[:limit]
+    result = shape_tool_response(tool_context, "get_draft_batch", {
+        "status": "success",
+        "batch_id": batch_id,
+        "offset": offset,
+        "drafts": drafts,
+        "count": len(drafts),
+        "has_more": has_more,
+        "next_offset": offset + len(drafts) if has_more else None,
+        "message": f"Returned {len(drafts)} drafts from batch {batch_id}"
+    })
+    if "omitted" in result.get("response", {}):
+        # Drafts cut to fit the budget start the next page
+        kept = len(result["drafts"])
+        result.update(count=kept, has_more=True, next_offset=offset + kept,
+                      message=f"Returned {kept} drafts from batch {batch_id}; {len(drafts) - kept} more "
+                              f"moved to the next page to fit the response budget")
+    return result
+
+
+@instrument
 def categorize_emails(email_ids: List[str], categories: List[str], tool_context: ToolContext) -> dict:
     """
     Organize emails into specified categories.
     
     Args:
         email_ids: List of email IDs to categorize
-        categories: List of categories to assign
+        categories: List of categories to assign, one per email ID (or a single category for all of them)
         tool_context: Context for accessing session state
     
     Returns:
         Dictionary containing categorization results
     """
-    print(f"--- Tool: categorize_emails called for emails: {email_ids} with categories: {categories} ---")
-    
-    # Update state with categorization
-    email_categories = tool_context.state.get("email_categories", {})
+    if len(categories) == 1 and len(email_ids) > 1:
+        categories = categories * len(email_ids)
+    if len(categories) != len(email_ids):
+        return {
+            "status": "error",
+            "message": f"Got {len(email_ids)} email IDs but {len(categories)} categories; pass one category per email"
+        }
+
+    # State keeps category codes rather than repeating the names per email
+    email_categories = category_map(tool_context.state)
     for email_id, category in zip(email_ids, categories):
-        email_categories[email_id] = category
-    
-    tool_context.state["email_categories"] = email_categories
+        set_category(email_categories, email_id, category)
+    save_categories(tool_context.state, email_categories, email_ids)
     
     return {
         "status": "success",
@@ -280,6 +437,56 @@ def categorize_emails(email_ids: List[str], categories: List[str], tool_context:
     }
 
 
+@instrument
+def auto_categorize_emails(tool_context: ToolContext, email_ids: Optional[List[str]] = None,
+                           scope: str = "new") -> dict:
+    """
+    Categorize emails automatically with the rule engine (sender domain, subject, body and keyword rules).
+    
+    Args:
+        tool_context: Context for accessing session state
+        email_ids: Specific email IDs to categorize; when omitted, `scope` decides
+        scope: "new" for emails categorized since the last call, "all" for the whole mailbox
+    
+    Returns:
+        Dictionary containing per-category counts and a sample of the assignments
+    """
+    mailbox = get_mailbox()
+    categorizer = get_categorizer(mailbox)
+    names = categorizer.engine.categories
+    email_categories = category_map(tool_context.state)
+
+    if email_ids:
+        emails = list(mailbox.get_emails(email_ids).values())
+        found = categorizer.engine.categorize_many(emails, mailbox)
+        assigned: Dict[str, Optional[str]] = {email.id: found.get(email.id) for email in emails}
+    else:
+        since = 0 if scope == "all" else email_categories["sequence"]
+        changed, email_categories["sequence"] = categorizer.changed_since(since)
+        assigned = {email_id: None if code is None else names[code] for email_id, code in changed.items()}
+
+    counts: Dict[str, int] = {}
+    for email_id, category in assigned.items():
+        # Emails no rule matches keep any category assigned by hand
+        if category is None:
+            continue
+        set_category(email_categories, email_id, category)
+        counts[category] = counts.get(category, 0) + 1
+    save_categories(tool_context.state, email_categories,
+                    [email_id for email_id, category in assigned.items() if category is not None])
+
+    categorized = {email_id: category for email_id, category in assigned.items() if category is not None}
+    return {
+        "status": "success",
+        "counts": counts,
+        "categorized_emails": dict(list(categorized.items())[:MAX_PAGE_SIZE]),
+        "count": len(categorized),
+        "uncategorized": len(assigned) - len(categorized),
+        "message": f"Categorized {len(categorized)} of {len(assigned)} emails"
+    }
+
+
+@instrument
 def extract_calendar_events(email_ids: List[str], tool_context: ToolContext) -> dict:
     """
     Extract calendar events from emails and offer to add them to calendar.
@@ -289,77 +496,145 @@ def extract_calendar_events(email_ids: List[str], tool_context: ToolContext) ->
         tool_context: Context for accessing session state
     
     Returns:
-        Dictionary containing extracted events
+        Dictionary containing extracted events as CREATE_EVENT actions (RFC3339 start/end)
     """
-    print(f"--- Tool: extract_calendar_events called for emails: {email_ids} ---")
-    
-    # Sample event extraction - in real implementation, this would use NLP to extract events
-    extracted_events = [
-        {
-            "email_id": "email_001",
-            "event_title": "Q4 Project Review Meeting",
-            "date": "2024-01-16",
-            "time": "10:00 AM",
-            "duration": "1 hour",
-            "attendees": ["john.doe@company.com", "team@company.com"],
-            "location": "Conference Room A",
-            "description": "Quarterly project review meeting with client"
-        }
-    ]
-    
-    # Update state with extracted events
-    calendar_events = tool_context.state.get("extracted_calendar_events", [])
-    calendar_events.extend(extracted_events)
-    tool_context.state["extracted_calendar_events"] = calendar_events
-    
-    return {
+    # Dates, times, durations and attendees are parsed relative to each email's
+    # date; already-processed emails are served from the extractor's cache
+    mailbox = get_mailbox()
+    emails = mailbox.get_emails(email_ids)
+    # Near-duplicates received the same day resolve to the same events, so only
+    # one per cluster is parsed and its events list the others as duplicates
+    representatives, clusters = collapse(
+        [(email_id, emails[email_id]) for email_id in email_ids if email_id in emails],
+        partition=lambda email: (email.get("date") or "")[:10], load_bodies=mailbox.load_bodies
+    )
+    events_by_email, cache_hits = get_event_extractor().extract(representatives, load_bodies=mailbox.load_bodies)
+    extracted_events = []
+    for email_id, events in events_by_email.items():
+        for event in events:
+            item = {"email_id": email_id, "event": event}
+            if clusters[email_id]:
+                item["duplicates"] = clusters[email_id]
+            extracted_events.append(item)
+    
+    # Update state with newly extracted events; re-extractions are not recorded again
+    known = {(entry.get("email_id"), entry.get("start"))
+             for entry in history_entries(tool_context.state, "extracted_calendar_events")}
+    new_events = [item for item in extracted_events
+                  if (item["email_id"], item["event"]["start"]) not in known]
+    if new_events:
+        append_history(tool_context.state, "extracted_calendar_events", [{
+            "timestamp": datetime.now().isoformat(),
+            "email_id": item["email_id"],
+            "title": item["event"]["title"],
+            "start": item["event"]["start"]
+        } for item in new_events], HISTORY_POLICIES["extracted_calendar_events"])
+    
+    return shape_tool_response(tool_context, "extract_calendar_events", {
         "status": "success",
         "events": extracted_events,
         "count": len(extracted_events),
+        "cache": {"hits": cache_hits, "misses": len(events_by_email) - cache_hits},
         "message": f"Successfully extracted {len(extracted_events)} calendar events"
-    }
+    })
 
 
-def detect_spam(email_ids: List[str], tool_context: ToolContext) -> dict:
+@instrument
+def detect_spam(email_ids: List[str], tool_context: ToolContext, not_spam_ids: Optional[List[str]] = None,
+                spam_ids: Optional[List[str]] = None) -> dict:
     """
-    Detect and flag suspicious emails as spam.
+    Detect and flag suspicious emails as spam, learning from the user's corrections.
     
     Args:
         email_ids: List of email IDs to check for spam
+        not_spam_ids: Email IDs the user says are not spam (trains the classifier)
+        spam_ids: Email IDs the user says are spam (trains the classifier)
         tool_context: Context for accessing session state
     
     Returns:
         Dictionary containing spam detection results
     """
-    print(f"--- Tool: detect_spam called for emails: {email_ids} ---")
+    mailbox = get_mailbox()
+    classifier = get_classifier()
+    
+    # Corrections persist in session state and override the model for this session.
+    # They reach the model only through a per-session overlay; the shared model is
+    # never relabelled, so one user's corrections never change another's verdicts.
+    corrections = state_log.load(tool_context.state, "spam_corrections", {})
+    new_corrections = {email_id: "not_spam" for email_id in not_spam_ids or []}
+    new_corrections.update({email_id: "spam" for email_id in spam_ids or []})
+    if new_corrections:
+        # Only the new corrections are written to state
+        corrections = state_log.update(tool_context.state, "spam_corrections", new_corrections)
+    overlay = None
+    if corrections:
+        overlay = CorrectionOverlay(mailbox.get_emails(list(corrections), include_body=True), corrections)
+    
+    # Score one email per near-duplicate cluster in one batch. A duplicate shares
+    # the verdict only when its headers match too; otherwise it is scored itself.
+    emails = mailbox.get_emails(email_ids, include_body=True)
+    _, clusters = collapse(
+        [(email_id, emails[email_id]) for email_id in email_ids if email_id in emails]
+    )
+
+    def headers(email: EmailRecord):
+        return email.sender.lower(), normalize_subject(email.subject)
+
+    duplicate_of = {member: email_id for email_id, members in clusters.items() for member in members
+                    if headers(emails[member]) == headers(emails[email_id])}
+    scored = [(email_id, email) for email_id, email in emails.items() if email_id not in duplicate_of]
+    predictions = classifier.predict([email for _, email in scored], overlay)
+    scores = dict(zip([email_id for email_id, _ in scored], predictions))
+    for member, email_id in duplicate_of.items():
+        scores[member] = scores[email_id]
     
-    # Sample spam detection - in real implementation, this would use ML models
     spam_results = []
     for email_id in email_ids:
-        # Simulate spam detection logic
-        is_spam = email_id == "email_002"  # Newsletter marked as promotional
+        if email_id not in scores:
+            spam_results.append({
+                "email_id": email_id,
+                "is_spam": False,
+                "confidence": 0.0,
+                "reason": "Email not found"
+            })
+            continue
+        if email_id in corrections:
+            is_spam = corrections[email_id] == "spam"
+            spam_results.append({
+                "email_id": email_id,
+                "is_spam": is_spam,
+                "confidence": 1.0,
+                "reason": "Marked as spam by the user" if is_spam else "Marked as not spam by the user"
+            })
+            continue
+        probability, indicators = scores[email_id]
+        is_spam = probability >= SPAM_THRESHOLD
         spam_results.append({
             "email_id": email_id,
             "is_spam": is_spam,
-            "confidence": 0.85 if is_spam else 0.15,
-            "reason": "Promotional content" if is_spam else "Legitimate email"
+            "confidence": round(probability if is_spam else 1 - probability, 2),
+            "reason": f"Spam indicators: {', '.join(indicators)}" if is_spam else "Legitimate email"
         })
+        if email_id in duplicate_of:
+            spam_results[-1]["duplicate_of"] = duplicate_of[email_id]
     
     # Update state with spam detection history
-    spam_history = tool_context.state.get("spam_detection_history", [])
-    spam_history.extend(spam_results)
-    tool_context.state["spam_detection_history"] = spam_history
+    append_history(tool_context.state, "spam_detection_history",
+                   [dict(result) for result in spam_results],
+                   HISTORY_POLICIES["spam_detection_history"])
     
-    return {
+    return shape_tool_response(tool_context, "detect_spam", {
         "status": "success",
         "spam_results": spam_results,
         "spam_count": sum(1 for result in spam_results if result["is_spam"]),
         "message": f"Spam detection completed for {len(email_ids)} emails"
-    }
+    })
 
 
+@instrument
 def manage_attachments(email_id: str, action: str, tool_context: ToolContext, 
-                      new_name: str = None, folder: str = None) -> dict:
+                      new_name: Optional[str] = None, folder: Optional[str] = None,
+                      attachment_name: Optional[str] = None) -> dict:
     """
     Manage email attachments by describing, renaming, or organizing them.
     
@@ -369,57 +644,68 @@ def manage_attachments(email_id: str, action: str, tool_context: ToolContext,
         new_name: New name for attachment (for rename action)
         folder: Folder to organize into (for organize action)
         tool_context: Context for accessing session state
+        attachment_name: Attachment to rename or organize; rename defaults to the first attachment and
+            organize to all of them
     
     Returns:
         Dictionary containing attachment management results
     """
-    print(f"--- Tool: manage_attachments called for email {email_id} with action: {action} ---")
-    
-    # Sample attachment data
-    attachments = [
-        {"name": "Q4_Report.pdf", "size": "2.5MB", "type": "PDF"},
-        {"name": "Project_Timeline.xlsx", "size": "1.2MB", "type": "Excel"}
-    ]
-    
-    if action == "describe":
-        result = {
-            "email_id": email_id,
-            "action": action,
-            "attachments": attachments,
-            "description": f"Email contains {len(attachments)} attachments: {', '.join([att['name'] for att in attachments])}"
-        }
-    elif action == "rename" and new_name:
-        result = {
-            "email_id": email_id,
-            "action": action,
-            "old_name": attachments[0]["name"],
-            "new_name": new_name,
-            "message": f"Attachment renamed from {attachments[0]['name']} to {new_name}"
-        }
-    elif action == "organize" and folder:
-        result = {
-            "email_id": email_id,
-            "action": action,
-            "folder": folder,
-            "attachments": [att["name"] for att in attachments],
-            "message": f"Attachments organized into folder: {folder}"
-        }
-    else:
-        result = {
-            "email_id": email_id,
-            "action": action,
-            "error": "Invalid action or missing parameters"
-        }
+    email = get_mailbox().get_email(email_id)
+    if email is None:
+        return {"status": "error", "message": f"Email {email_id} not found"}
+
+    # Renaming and filing only touch the store's metadata; attachment bytes are never copied
+    store = get_attachment_store()
+    store.register(email_id, email.attachments or [])
+    attachments = store.list(email_id)
+    target = attachment_name or (attachments[0]["name"] if attachments else None)
+
+    try:
+        if action == "describe":
+            result = {
+                "email_id": email_id,
+                "action": action,
+                "attachments": [{k: att[k] for k in ("name", "size", "type", "folder", "stored")}
+                                for att in attachments],
+                "description": f"Email contains {len(attachments)} attachments: {', '.join([att['name'] for att in attachments])}"
+            }
+        elif action == "rename" and new_name and target:
+            renamed = store.rename(email_id, target, new_name)
+            result = {
+                "email_id": email_id,
+                "action": action,
+                "old_name": target,
+                "new_name": renamed["name"],
+                "message": f"Attachment renamed from {target} to {renamed['name']}"
+            }
+        elif action == "organize" and folder and attachments:
+            organized = store.organize(email_id, folder, [attachment_name] if attachment_name else None)
+            names = [att["name"] for att in organized if att["folder"] == folder]
+            result = {
+                "email_id": email_id,
+                "action": action,
+                "folder": folder,
+                "attachments": names,
+                "message": f"Attachments organized into folder: {folder}"
+            }
+        else:
+            result = {
+                "email_id": email_id,
+                "action": action,
+                "error": "Invalid action or missing parameters" if attachments else "Email has no attachments"
+            }
+    except KeyError:
+        result = {"email_id": email_id, "action": action, "error": f"No attachment named {target}"}
+    except ValueError as e:
+        result = {"email_id": email_id, "action": action, "error": str(e)}
     
     # Update state with attachment management history
-    attachment_history = tool_context.state.get("attachment_management_history", [])
-    attachment_history.append({
+    append_history(tool_context.state, "attachment_management_history", [{
         "timestamp": datetime.now().isoformat(),
         "email_id": email_id,
         "action": action,
         "result": result
-    })
-    tool_context.state["attachment_management_history"] = attachment_history
+    }], HISTORY_POLICIES["attachment_management_history"])
     
     return {
         "status": "success",
@@ -428,99 +714,82 @@ def manage_attachments(email_id: str, action: str, tool_context: ToolContext,
     }
 
 
-def track_unanswered_emails(tool_context: ToolContext) -> dict:
+@instrument
+def track_unanswered_emails(tool_context: ToolContext, limit: int = 10,
+                            replied_ids: Optional[List[str]] = None) -> dict:
     """
     Track emails that require responses and remind user to respond.
     
     Args:
         tool_context: Context for accessing session state
+        limit: Maximum number of emails to return in each list, most pressing deadline first
+        replied_ids: Email IDs the user has since replied to; they stop being tracked
     
     Returns:
-        Dictionary containing unanswered emails
+        Dictionary containing unanswered emails and those that became overdue since the last check
     """
-    print("--- Tool: track_unanswered_emails called ---")
-    
-    # Sample unanswered emails
-    unanswered_emails = [
-        {
-            "email_id": "email_001",
-            "sender": "john.doe@company.com",
-            "subject": "Q4 Project Update - Urgent Review Required",
-            "date": "2024-01-15 09:30:00",
-            "days_since_received": 1,
-            "priority": "high",
-            "deadline": "2024-01-15 17:00:00"
-        },
-        {
-            "email_id": "email_003",
-            "sender": "sarah.wilson@client.com",
-            "subject": "Follow-up: Contract Discussion",
-            "date": "2024-01-14 16:45:00",
-            "days_since_received": 2,
-            "priority": "medium",
-            "deadline": "2024-01-17 17:00:00"
+    mailbox = get_mailbox()
+    tracker = get_reply_tracker(mailbox)
+    if replied_ids:
+        mailbox.mark_replied(replied_ids)
+
+    now = datetime.now().replace(microsecond=0)
+    now_key = now.strftime("%Y-%m-%d %H:%M:%S")
+    last_check = tool_context.state.get("unanswered_last_check")
+
+    def view(email: EmailRecord) -> Dict[str, Any]:
+        return {
+            "email_id": email.id,
+            "sender": email.sender,
+            "subject": email.subject,
+            "date": email.date,
+            "days_since_received": days_since(email.date, now),
+            "priority": email.priority,
+            "deadline": email.deadline
         }
-    ]
+
+    pressing = tracker.most_pressing(max(1, limit))
+    unanswered_emails = [view(email) for email in pressing]
+    # Capped like unanswered_emails. On the first check every overdue email is
+    # "new", so only their count is reported; the most pressing are listed above.
+    overdue = tracker.overdue_between(parse_deadline(last_check) if last_check else None, now)
+    newly_overdue = [view(email) for email in overdue[:max(1, limit)]] if last_check else []
     
-    # Update state with unanswered email tracking
-    tool_context.state["unanswered_emails"] = unanswered_emails
+    # Only ids go into state; the tracker holds the details
+    tool_context.state["unanswered_emails"] = [email.id for email in pressing]
+    tool_context.state["unanswered_last_check"] = now_key
     
-    return {
+    return shape_tool_response(tool_context, "track_unanswered_emails", {
         "status": "success",
         "unanswered_emails": unanswered_emails,
-        "count": len(unanswered_emails),
-        "urgent_count": sum(1 for email in unanswered_emails if email["priority"] == "high"),
-        "message": f"Found {len(unanswered_emails)} emails requiring responses"
-    }
+        "newly_overdue": newly_overdue,
+        "newly_overdue_count": len(overdue),
+        "count": len(tracker),
+        "urgent_count": tracker.high_priority,
+        "message": f"Found {len(tracker)} emails requiring responses, {len(overdue)} {'newly ' if last_check else ''}overdue"
+    })
 
 
-# Helper functions for text analysis
+# Helper functions for text analysis. Each is a view over the shared
+# precompiled analyzer; callers needing more than one result should call
+# get_analyzer().analyze() (or analyze_many()) directly.
 def extract_keywords(text: str) -> List[str]:
     """Extract important keywords from email content."""
-    # Simple keyword extraction - in real implementation, use NLP
-    keywords = ["urgent", "deadline", "meeting", "review", "project", "client", "important"]
-    found_keywords = [word for word in keywords if word.lower() in text.lower()]
-    return found_keywords
+    return get_analyzer().analyze(text)["keywords"]
 
 
 def extract_actions(text: str) -> List[str]:
     """Extract required actions from email content."""
-    # Simple action extraction - in real implementation, use NLP
-    action_patterns = [
-        r"need your (review|approval|feedback)",
-        r"please (respond|reply|confirm)",
-        r"schedule a (call|meeting)",
-        r"send (the|your) (report|document)"
-    ]
-    actions = []
-    for pattern in action_patterns:
-        matches = re.findall(pattern, text.lower())
-        actions.extend(matches)
-    return actions
+    return get_analyzer().analyze(text)["actions"]
 
 
 def extract_deadlines(text: str) -> List[str]:
     """Extract deadlines from email content."""
-    # Simple deadline extraction - in real implementation, use NLP
-    deadline_patterns = [
-        r"by (EOD|end of day)",
-        r"by (\d{1,2}:\d{2} (AM|PM))",
-        r"by (\w+ \d{1,2},? \d{4})",
-        r"(\d{1,2}:\d{2} (AM|PM))"
-    ]
-    deadlines = []
-    for pattern in deadline_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        deadlines.extend([match[0] if isinstance(match, tuple) else match for match in matches])
-    return deadlines
-
-
-# Create the Elite AI Email Agent
-root_agent = Agent(
-    name="elite_email_agent",
-    model="gemini-2.0-flash",
-    description="Elite AI Email Agent focused on reading and sending emails only",
-    instruction="""
+    return get_analyzer().analyze(text)["deadlines"]
+
+
+# Instruction of the root agent; kept at module level so building the agent is cheap
+ROOT_INSTRUCTION = """
     You are the Elite AI Email Agent for two tasks only:
     1) READ emails
     2) SEND emails
@@ -529,7 +798,12 @@ root_agent = Agent(
 
     READING
     - If asked to read, clarify platform if missing (gmail/outlook). If the host has already authenticated, assume gmail.
+    - Use platform "all" to read or search every connected account at once; results are merged newest first and tagged with their platform.
     - For "most recent", fetch the latest message. For "unread"/"all", provide up to 5 with sender, date, subject, preview.
+    - read_emails returns one page (limit defaults to 5). If the user asks for more, call it again with the returned next_cursor.
+    - To find specific emails by words, sender, category or date range, use search_emails instead of paging through read_emails.
+    - When only some details are needed, pass fields (e.g. ["sender", "subject", "date"]) to read_emails,
+      search_emails or summarize_emails to keep responses small.
     - When you want the host app to fetch emails, emit only:
       {"action":"READ_EMAILS","platform":"gmail","filter":"most_recent|unread|all"}
 
@@ -541,13 +815,48 @@ root_agent = Agent(
     - Only after explicit approval, emit exactly:
       {"action":"SEND_EMAIL","recipient":"<email>","subject":"<subject>","content":"<final body>","tone":"<tone>"}
     - Do not add commentary when emitting that JSON. Never send without approval.
+    - For the same email to many recipients (a list or CSV), call draft_bulk_emails once instead of draft_email per
+      recipient. For personal details, put name, first_name or a CSV column name in curly braces in the subject
+      and content. Show the sample drafts and use get_draft_batch to show more.
 
     OUTPUT RULES
     - Be brief and precise. Ask only what’s needed. Avoid capability lists.
-    """,
-    tools=[
-        read_emails,
-        summarize_emails,
-        draft_email,
-    ],
-)
+    """
+
+_root_agent: Optional[Agent] = None
+
+
+def get_root_agent() -> Agent:
+    """
+    The root agent, built on first use.
+
+    `agent.root_agent` resolves here through the module __getattr__, so tools
+    and helpers can be imported without constructing the agent or loading the
+    async tool modules.
+    """
+    global _root_agent
+    if _root_agent is None:
+        from . import async_tools
+        from .tool_schemas import cached_tools
+
+        _root_agent = Agent(
+            name="elite_email_agent",
+            model="gemini-2.0-flash",
+            description="Elite AI Email Agent focused on reading and sending emails only",
+            instruction=ROOT_INSTRUCTION,
+            tools=cached_tools([
+                async_tools.read_emails,
+                async_tools.search_emails,
+                async_tools.summarize_emails,
+                draft_email,
+                draft_bulk_emails,
+                get_draft_batch,
+            ]),
+        )
+    return _root_agent
+
+
+def __getattr__(name: str) -> Any:
+    if name == "root_agent":
+        return get_root_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
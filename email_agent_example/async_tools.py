@@ -0,0 +1,164 @@
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+
+from google.adk.tools.tool_context import ToolContext
+
+from . import agent
+from .history import append_history
+from .metrics import instrument
+from .providers import (
+    PROVIDER_TIMEOUT, connected_providers, decode_multi_cursor, encode_multi_cursor, fetch_merged,
+    get_provider, page_prefix, search_merged,
+)
+from .records import HEADER_FIELDS
+
+# Awaitable versions of the I/O-bound tools. They share names, arguments and
+# response shapes with the synchronous tools in agent.py, and additionally
+# accept platform="all" to query every connected provider at once.
+
+
+def _providers_for(platform: str):
+    return connected_providers() if platform == "all" else [get_provider(platform)]
+
+
+@instrument
+async def read_emails(platform: str, tool_context: ToolContext, filter_type: str = "all",
+                      limit: int = 5, cursor: Optional[str] = None, include_body: bool = False,
+                      fields: Optional[List[str]] = None) -> dict:
+    """
+    Read emails from Gmail, Outlook or all connected accounts, one page at a time.
+
+    Args:
+        platform: "gmail", "outlook", or "all" to merge every connected account by date
+        filter_type: "all", "most_recent", "unread", "read", "urgent", "promotional"
+        limit: Maximum number of emails to return (capped at MAX_PAGE_SIZE)
+        cursor: Continuation token from a previous call's next_cursor
+        include_body: Also return each email's full content; by default only headers and a preview
+        fields: Only return these fields of each email (the id is always included)
+        tool_context: Context for accessing session state
+
+    Returns:
+        Dictionary containing one page of email data, metadata and the next_cursor
+    """
+    limit = max(1, min(limit, agent.MAX_PAGE_SIZE))
+    providers = _providers_for(platform)
+    try:
+        positions, exhausted = decode_multi_cursor(cursor, filter_type) if cursor else ({}, ())
+    except ValueError as e:
+        return {
+            "status": "error",
+            "platform": platform,
+            "filter_type": filter_type,
+            "message": str(e)
+        }
+
+    # Every provider is queried concurrently, each under its own timeout
+    page = await fetch_merged(providers, filter_type, limit, positions, exhausted,
+                              include_body=include_body, timeout=PROVIDER_TIMEOUT)
+    columns = HEADER_FIELDS + ("content",) if include_body else HEADER_FIELDS
+    emails = [dict(record.to_dict(columns), platform=name) for name, record in page["emails"]]
+    next_cursor = (encode_multi_cursor(filter_type, page["positions"], page["exhausted"])
+                   if page["has_more"] else None)
+
+    # Update state with email reading history
+    append_history(tool_context.state, "email_reading_history", [{
+        "timestamp": datetime.now().isoformat(),
+        "platform": platform,
+        "filter": filter_type,
+        "count": len(emails)
+    }], agent.HISTORY_POLICIES["email_reading_history"])
+
+    result = {
+        "status": "partial" if page["failed"] else "success",
+        "platform": platform,
+        "platforms": [provider.name for provider in providers],
+        "filter_type": filter_type,
+        "emails": emails,
+        "count": len(emails),
+        "has_more": next_cursor is not None,
+        "next_cursor": next_cursor,
+        "message": f"Successfully read {len(emails)} emails from {platform}"
+    }
+    if page["failed"]:
+        result["failed_platforms"] = page["failed"]
+        result["message"] += f"; {', '.join(page['failed'])} did not respond and will be retried on the next page"
+    result = agent.shape_tool_response(tool_context, "read_emails", result, fields)
+    if "omitted" in result.get("response", {}):
+        # Emails cut to fit the budget start the next page
+        kept = page_prefix(page, len(result["emails"]), positions, exhausted)
+        result.update(count=len(kept["emails"]), has_more=True,
+                      next_cursor=encode_multi_cursor(filter_type, kept["positions"], kept["exhausted"]),
+                      message=f"Successfully read {len(kept['emails'])} emails from {platform}; "
+                              f"{len(emails) - len(kept['emails'])} more moved to the next page "
+                              f"to fit the response budget")
+    return result
+
+
+@instrument
+async def search_emails(query: str, tool_context: ToolContext, platform: str = "all",
+                        sender: Optional[str] = None, category: Optional[str] = None, priority: Optional[str] = None,
+                        date_from: Optional[str] = None, date_to: Optional[str] = None, limit: int = 10,
+                        fields: Optional[List[str]] = None) -> dict:
+    """
+    Search emails by text across subject, sender and body, ranked by relevance.
+
+    Args:
+        query: Words to search for; all must match. End a word with * for prefix search
+        platform: "gmail", "outlook", or "all" to search every connected account
+        sender: Only emails from this address, or from a domain given as "@domain.com"
+        category: Only emails in this category (e.g. "urgent", "promotional")
+        priority: Only emails with this priority ("high", "medium", "low")
+        date_from: Earliest date to include, "YYYY-MM-DD"
+        date_to: Latest date to include, "YYYY-MM-DD"
+        limit: Maximum number of results (capped at MAX_PAGE_SIZE)
+        fields: Only return these fields of each email (the id is always included)
+        tool_context: Context for accessing session state
+
+    Returns:
+        Dictionary containing matching emails, best match first, with relevance scores
+    """
+    limit = max(1, min(limit, agent.MAX_PAGE_SIZE))
+    found = await search_merged(_providers_for(platform), query, limit, timeout=PROVIDER_TIMEOUT,
+                                sender=sender, category=category, priority=priority,
+                                date_from=date_from, date_to=date_to)
+    emails = [dict(record.to_dict(HEADER_FIELDS), score=score, platform=name)
+              for name, record, score in found["emails"]]
+
+    # Update state with search history
+    append_history(tool_context.state, "email_search_history", [{
+        "timestamp": datetime.now().isoformat(),
+        "query": query,
+        "count": len(emails)
+    }], agent.HISTORY_POLICIES["email_search_history"])
+
+    result = {
+        "status": "partial" if found["failed"] else "success",
+        "query": query,
+        "emails": emails,
+        "count": len(emails),
+        "message": f"Found {len(emails)} emails matching '{query}'"
+    }
+    if found["failed"]:
+        result["failed_platforms"] = found["failed"]
+    return agent.shape_tool_response(tool_context, "search_emails", result, fields)
+
+
+@instrument
+async def summarize_emails(email_ids: List[str], tool_context: ToolContext,
+                           fields: Optional[List[str]] = None) -> dict:
+    """
+    Provide detailed summaries of specified emails with key information extraction.
+
+    Args:
+        email_ids: List of email IDs to summarize
+        fields: Only return these fields of each summary, e.g. ["subject", "actions_required"]
+            (email_id is always included)
+        tool_context: Context for accessing session state
+
+    Returns:
+        Dictionary containing email summaries with extracted information
+    """
+    # Mailbox reads and extraction block, so they run off the event loop;
+    # the unwrapped function avoids counting the call twice in the metrics.
+    return await asyncio.to_thread(agent.summarize_emails.__wrapped__, email_ids, tool_context, fields)
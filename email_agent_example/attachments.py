@@ -0,0 +1,283 @@
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterable, Iterator, BinaryIO, Union
+
+# Chunks and the metadata database live here
+ATTACHMENTS_DIR = os.getenv("EMAIL_ATTACHMENTS_DIR", os.path.expanduser("~/.email_agent/attachments"))
+# Attachments are split into chunks of this size; identical chunks are stored once
+CHUNK_SIZE = int(os.getenv("ATTACHMENT_CHUNK_SIZE", str(1024 * 1024)))
+
+_TYPES = {
+    ".pdf": "PDF", ".doc": "Word", ".docx": "Word", ".xls": "Excel", ".xlsx": "Excel", ".csv": "CSV",
+    ".ppt": "PowerPoint", ".pptx": "PowerPoint", ".txt": "Text", ".png": "Image", ".jpg": "Image",
+    ".jpeg": "Image", ".gif": "Image", ".zip": "Archive",
+}
+
+
+def attachment_type(name: str) -> str:
+    extension = os.path.splitext(name)[1].lower()
+    return _TYPES.get(extension, extension.lstrip(".").upper() or "File")
+
+
+def format_size(size: int) -> str:
+    """Human-readable size in the style "2.5MB"."""
+    value = float(size)
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            return f"{int(value)}{unit}" if unit == "B" else f"{value:.1f}{unit}"
+        value /= 1024
+
+
+class AttachmentStore:
+    """
+    Content-addressed attachment storage.
+
+    Attachment bytes are cut into fixed-size chunks stored once per sha256 under
+    chunks/; a blob is the ordered list of its chunks. Attachments are metadata
+    rows (email, name, folder) pointing at a blob, so the same PDF forwarded in
+    fifty threads is stored once, and renaming or filing an attachment only
+    updates its row. Reads map chunk files and hand out memoryview slices
+    instead of copying.
+
+    Attachments known only by name (listed on an email but not downloaded yet)
+    have a row without a blob.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS chunks (
+            digest TEXT PRIMARY KEY,
+            size INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS blobs (
+            digest TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            chunk_size INTEGER NOT NULL,
+            chunks TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS attachments (
+            email_id TEXT NOT NULL,
+            original_name TEXT NOT NULL,
+            name TEXT NOT NULL,
+            folder TEXT,
+            blob TEXT,
+            stored_at TEXT,
+            PRIMARY KEY (email_id, original_name)
+        );
+        CREATE INDEX IF NOT EXISTS idx_attachments_folder ON attachments (folder);
+        CREATE INDEX IF NOT EXISTS idx_attachments_blob ON attachments (blob);
+    """
+
+    def __init__(self, root: str = ATTACHMENTS_DIR, chunk_size: int = CHUNK_SIZE):
+        self.root = root
+        self.chunk_size = chunk_size
+        self._chunk_dir = os.path.join(root, "chunks")
+        os.makedirs(self._chunk_dir, exist_ok=True)
+        # Reentrant so writes can look rows up while holding it
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(root, "attachments.db"), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self._SCHEMA)
+
+    def _chunk_path(self, digest: str) -> str:
+        return os.path.join(self._chunk_dir, digest[:2], digest)
+
+    def _write_chunk(self, data: memoryview) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._chunk_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            partial = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(partial, "wb") as f:
+                f.write(data)
+            os.replace(partial, path)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO chunks (digest, size) VALUES (?, ?)", (digest, len(data)))
+        return digest
+
+    def _iter_pieces(self, source: Union[bytes, bytearray, memoryview, BinaryIO]) -> Iterator[memoryview]:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            view = memoryview(source).cast("B")
+            for start in range(0, len(view), self.chunk_size):
+                yield view[start:start + self.chunk_size]
+            return
+        while True:
+            piece = source.read(self.chunk_size)
+            if not piece:
+                return
+            yield memoryview(piece)
+
+    def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _row(self, email_id: str, name: str) -> Optional[sqlite3.Row]:
+        rows = self._query(
+            "SELECT * FROM attachments WHERE email_id = ? AND (name = ? OR original_name = ?) "
+            "ORDER BY name = ? DESC LIMIT 1", (email_id, name, name, name)
+        )
+        return rows[0] if rows else None
+
+    def register(self, email_id: str, names: Iterable[str]) -> None:
+        """Record attachments listed on an email; names already known are left as they are."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO attachments (email_id, original_name, name) VALUES (?, ?, ?)",
+                [(email_id, name, name) for name in names],
+            )
+
+    def put(self, email_id: str, name: str, source: Union[bytes, bytearray, memoryview, BinaryIO]) -> Dict[str, Any]:
+        """
+        Store an attachment's bytes, reading `source` (bytes or a binary file) one chunk at a time.
+
+        Chunks already in the store are not written again. Returns the attachment's metadata.
+        """
+        whole = hashlib.sha256()
+        chunks, size = [], 0
+        for piece in self._iter_pieces(source):
+            whole.update(piece)
+            chunks.append(self._write_chunk(piece))
+            size += len(piece)
+        digest = whole.hexdigest()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO blobs (digest, size, chunk_size, chunks) VALUES (?, ?, ?, ?)",
+                (digest, size, self.chunk_size, " ".join(chunks)),
+            )
+            row = self._row(email_id, name)
+            original = row["original_name"] if row else name
+            self._conn.execute(
+                "INSERT INTO attachments (email_id, original_name, name, blob, stored_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(email_id, original_name) DO UPDATE SET blob = excluded.blob, "
+                "stored_at = excluded.stored_at",
+                (email_id, original, name, digest, datetime.now().isoformat()),
+            )
+        return self.get(email_id, name)
+
+    def _describe(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "name": row["name"],
+            "original_name": row["original_name"],
+            "folder": row["folder"],
+            "type": attachment_type(row["name"]),
+            "size": format_size(row["size"]) if row["size"] is not None else None,
+            "bytes": row["size"],
+            "digest": row["blob"],
+            "stored": row["blob"] is not None,
+        }
+
+    _SELECT = ("SELECT a.*, b.size FROM attachments a LEFT JOIN blobs b ON b.digest = a.blob ")
+
+    def get(self, email_id: str, name: str) -> Optional[Dict[str, Any]]:
+        row = self._row(email_id, name)
+        if row is None:
+            return None
+        return self._describe(self._query(
+            self._SELECT + "WHERE a.email_id = ? AND a.original_name = ?", (email_id, row["original_name"])
+        )[0])
+
+    def list(self, email_id: str) -> List[Dict[str, Any]]:
+        return [self._describe(row) for row in self._query(
+            self._SELECT + "WHERE a.email_id = ? ORDER BY a.rowid", (email_id,)
+        )]
+
+    def in_folder(self, folder: str) -> List[Dict[str, Any]]:
+        return [dict(self._describe(row), email_id=row["email_id"]) for row in self._query(
+            self._SELECT + "WHERE a.folder = ? ORDER BY a.email_id, a.rowid", (folder,)
+        )]
+
+    def rename(self, email_id: str, name: str, new_name: str) -> Dict[str, Any]:
+        """Rename an attachment; only its metadata row changes."""
+        with self._lock, self._conn:
+            row = self._row(email_id, name)
+            if row is None:
+                raise KeyError(name)
+            clash = self._row(email_id, new_name)
+            if clash is not None and clash["original_name"] != row["original_name"]:
+                raise ValueError(f"Email {email_id} already has an attachment named {new_name}")
+            self._conn.execute("UPDATE attachments SET name = ? WHERE email_id = ? AND original_name = ?",
+                               (new_name, email_id, row["original_name"]))
+        return self.get(email_id, new_name)
+
+    def organize(self, email_id: str, folder: str, names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """File an email's attachments (or just `names`) under `folder`; only metadata changes."""
+        with self._lock, self._conn:
+            if names is None:
+                self._conn.execute("UPDATE attachments SET folder = ? WHERE email_id = ?", (folder, email_id))
+            else:
+                for name in names:
+                    row = self._row(email_id, name)
+                    if row is None:
+                        raise KeyError(name)
+                    self._conn.execute("UPDATE attachments SET folder = ? WHERE email_id = ? AND original_name = ?",
+                                       (folder, email_id, row["original_name"]))
+        return self.list(email_id)
+
+    def iter_chunks(self, email_id: str, name: str, offset: int = 0,
+                    length: Optional[int] = None) -> Iterator[memoryview]:
+        """
+        The attachment's bytes from `offset` as memoryview slices of mapped chunk files.
+
+        Each view is only valid until the next one is requested; copy it
+        (bytes(view)) to keep it.
+        """
+        row = self._row(email_id, name)
+        if row is None or row["blob"] is None:
+            raise KeyError(name)
+        blob = self._query("SELECT * FROM blobs WHERE digest = ?", (row["blob"],))[0]
+        end = blob["size"] if length is None else min(blob["size"], offset + length)
+        chunk_size = blob["chunk_size"]
+        chunks = blob["chunks"].split()
+        position = offset - offset % chunk_size
+        for digest in chunks[offset // chunk_size:]:
+            if position >= end:
+                return
+            with open(self._chunk_path(digest), "rb") as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                piece = view[max(offset - position, 0):min(end - position, len(view))]
+                try:
+                    yield piece
+                finally:
+                    # The map cannot close while views of it exist
+                    piece.release()
+                    view.release()
+            position += chunk_size
+
+    def read(self, email_id: str, name: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        return b"".join(bytes(view) for view in self.iter_chunks(email_id, name, offset, length))
+
+    def stats(self) -> Dict[str, Any]:
+        """Bytes referenced by attachments against bytes actually stored."""
+        logical = self._query(
+            "SELECT COUNT(*), COALESCE(SUM(b.size), 0) FROM attachments a JOIN blobs b ON b.digest = a.blob"
+        )[0]
+        stored = self._query("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM chunks")[0]
+        return {
+            "attachments": logical[0],
+            "logical_bytes": logical[1],
+            "chunks": stored[0],
+            "stored_bytes": stored[1],
+            "dedupe_ratio": round(logical[1] / stored[1], 2) if stored[1] else 1.0,
+        }
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_store: Optional[AttachmentStore] = None
+_store_lock = threading.Lock()
+
+
+def get_attachment_store() -> AttachmentStore:
+    """Return the process-wide attachment store under ATTACHMENTS_DIR."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AttachmentStore()
+    return _store
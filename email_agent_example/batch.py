@@ -0,0 +1,131 @@
+import logging
+import os
+import threading
+from concurrent.futures import BrokenExecutor, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import List, Any, Tuple, Callable, Optional
+
+from .summaries import EmailSummary, SummaryCache, build_summary
+
+
+# Below this many summaries the pool round trip costs more than it saves
+BATCH_THRESHOLD = int(os.getenv("SUMMARY_BATCH_THRESHOLD", "200"))
+CHUNK_SIZE = int(os.getenv("SUMMARY_CHUNK_SIZE", "250"))
+CHUNK_TIMEOUT = float(os.getenv("SUMMARY_CHUNK_TIMEOUT", "30"))
+WORKERS = int(os.getenv("SUMMARY_WORKERS", str(os.cpu_count() or 1)))
+# "process" for CPU-bound extraction, "thread" where forking workers is not allowed
+POOL_KIND = os.getenv("SUMMARY_POOL", "process")
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[Executor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> Executor:
+    """Return the long-lived worker pool, created on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                factory = ThreadPoolExecutor if POOL_KIND == "thread" else ProcessPoolExecutor
+                _pool = factory(max_workers=WORKERS)
+    return _pool
+
+
+def _discard_pool(pool: Executor) -> None:
+    # A worker died and the pool refuses new work; the next get_pool() starts a fresh one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _summarize_chunk(chunk: List[Tuple[str, Any]]) -> List[EmailSummary]:
+    # Runs in the worker; must stay a module-level function so it pickles
+    return [build_summary(email_id, email) for email_id, email in chunk]
+
+
+def _submit(pool: Executor, worker: Callable, chunk: List[Tuple[str, Any]]) -> Future:
+    # A pool that broke mid-batch raises on submit; report that through the future like a worker error
+    try:
+        return pool.submit(worker, chunk)
+    except BrokenExecutor as e:
+        future: Future = Future()
+        future.set_exception(e)
+        return future
+
+
+def summarize_batch(items: List[Tuple[str, Any]], chunk_size: int = CHUNK_SIZE,
+                    chunk_timeout: float = CHUNK_TIMEOUT, executor: Optional[Executor] = None,
+                    worker: Callable = _summarize_chunk
+                    ) -> Tuple[List[Optional[EmailSummary]], List[str], List[str]]:
+    """
+    Summarize (email_id, email) pairs across the worker pool.
+
+    Every chunk shares one deadline, `chunk_timeout` seconds after submission.
+    Returns (summaries, timed_out_ids, failed_ids). `summaries` is aligned with
+    `items`, with None in the slots of chunks that missed the deadline or whose
+    worker raised (including a broken pool); those chunks' ids are listed in
+    `timed_out_ids` or `failed_ids` so the caller can return partial results.
+    """
+    pool = executor or get_pool()
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    futures = [_submit(pool, worker, chunk) for chunk in chunks]
+    done, _ = wait(futures, timeout=chunk_timeout)
+
+    summaries: List[Optional[EmailSummary]] = []
+    timed_out: List[str] = []
+    failed: List[str] = []
+    broken = False
+    for chunk, future in zip(chunks, futures):
+        if future not in done:
+            future.cancel()
+            summaries.extend([None] * len(chunk))
+            timed_out.extend(email_id for email_id, _ in chunk)
+        elif future.exception() is not None:
+            logger.warning("Summary chunk of %d emails failed: %r", len(chunk), future.exception())
+            broken = broken or isinstance(future.exception(), BrokenExecutor)
+            summaries.extend([None] * len(chunk))
+            failed.extend(email_id for email_id, _ in chunk)
+        else:
+            summaries.extend(future.result())
+    if broken and executor is None:
+        _discard_pool(pool)
+    return summaries, timed_out, failed
+
+
+def summarize_cached(items: List[Tuple[str, Any]], cache: SummaryCache, batch_threshold: int = BATCH_THRESHOLD,
+                     load_bodies: Optional[Callable[[List[Any]], None]] = None
+                     ) -> Tuple[List[EmailSummary], int, List[str], List[str]]:
+    """
+    Summarize (email_id, email) pairs, serving unchanged emails from `cache`.
+
+    Misses are built inline, or across the worker pool once there are at least
+    `batch_threshold` of them. Returns (summaries in input order, cache hits,
+    timed-out ids, failed ids); timed-out and failed emails are left out of the
+    summaries. `load_bodies`, when given, is called once with the misses so
+    their bodies are read in one batch before summarizing.
+    """
+    slots: List[Optional[EmailSummary]] = []
+    pending = []
+    for email_id, email in items:
+        key, summary = cache.lookup(email_id, email)
+        if summary is None:
+            pending.append((len(slots), key, email_id, email))
+        slots.append(summary)
+    hits = len(slots) - len(pending)
+
+    misses = [(email_id, email) for _, _, email_id, email in pending]
+    if load_bodies is not None:
+        load_bodies([email for _, email in misses])
+    if len(pending) >= batch_threshold:
+        built, timed_out, failed = summarize_batch(misses)
+    else:
+        built, timed_out, failed = _summarize_chunk(misses), [], []
+
+    for (slot, key, _, _), summary in zip(pending, built):
+        if summary is not None:
+            cache.put(key, summary)
+            slots[slot] = summary
+    return [summary for summary in slots if summary is not None], hits, timed_out, failed
@@ -0,0 +1,391 @@
+"""
+Benchmarks for the agent tools over deterministic synthetic mailboxes.
+
+Run from the repository root:
+
+    python -m email_agent_example.benchmarks --sizes 1000 100000 1000000 --output bench.json
+    python -m email_agent_example.benchmarks --sizes 1000 --compare bench.json
+    python -m email_agent_example.benchmarks --startup --startup-budget 50
+
+Each case is timed over several runs after a warm-up, then run once more under
+tracemalloc to record its peak Python allocation. Results are written as JSON;
+--compare exits non-zero when a case's median slows down beyond --threshold.
+--startup times package import, root_agent construction and tool schemas in
+fresh interpreters and exits non-zero when an import exceeds its budget.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List, Dict, Any, Optional, Callable, Iterator
+
+from . import agent, categorizer, events, replies, spam, summaries
+from .mailbox import FILTERS, SQLiteMailbox, set_mailbox
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+SEED = 1234
+# Emails requested per call by the id-based cases
+ID_SAMPLE = 50
+BULK_SAMPLE = 1000
+
+_FIRST_NAMES = ["john", "sarah", "li", "maria", "ahmed", "olga", "raj", "emma", "kofi", "yuki",
+                "pablo", "nina", "omar", "chloe", "ivan", "fatima", "lucas", "mei", "noah", "zara"]
+_LAST_NAMES = ["doe", "wilson", "chen", "garcia", "khan", "ivanova", "patel", "brown", "mensah",
+               "tanaka", "lopez", "berg", "haddad", "martin", "petrov", "ali", "silva", "wong"]
+_WORK_DOMAINS = ["company.com", "client.com", "partner.io", "vendor.net", "agency.co"]
+_PROMO_DOMAINS = ["deals.shop", "newsletter.tech", "offers.travel", "promo.store"]
+_TOPICS = ["Q4 report", "project timeline", "contract renewal", "budget review", "client onboarding",
+           "hiring plan", "security audit", "product launch", "invoice", "roadmap"]
+_WORK_SENTENCES = [
+    "Please review the {topic} before the client meeting.",
+    "I need your feedback on the {topic} by EOD today.",
+    "Can you confirm the {topic} numbers? The deadline is Friday.",
+    "Let's schedule a call tomorrow at 3pm to discuss the {topic}.",
+    "The {topic} is attached for your review and approval.",
+    "Following up on the {topic} from last week, any updates?",
+    "We have a meeting on Monday at 10am about the {topic} for 30 minutes.",
+    "Urgent: the {topic} must be submitted by 2024-02-01.",
+    "Thanks for the update on the {topic}, looks good to me.",
+]
+_PROMO_SENTENCES = [
+    "Limited time offer: 50% off everything, click here now!",
+    "You have been selected as a winner, claim your free prize today.",
+    "This week's top stories in AI and machine learning.",
+    "Unsubscribe at any time. Act now before this deal expires!",
+    "Exclusive discount for our best customers, buy now.",
+]
+
+
+def synthetic_emails(count: int, seed: int = SEED) -> Iterator[Dict[str, Any]]:
+    """
+    Yield `count` reproducible email dicts shaped like the mailbox's records.
+
+    Roughly 20% are promotional, 30% need a reply (most with a deadline), 40%
+    are unread; work mail mixes sentences with keywords, requests, deadlines
+    and meeting times so every extractor has something to find.
+    """
+    rng = random.Random(seed)
+    senders = [(f"{first}.{last}@{domain}", f"{first.title()} {last.title()}")
+               for first in _FIRST_NAMES for last in _LAST_NAMES for domain in _WORK_DOMAINS]
+    promo_senders = [(f"news@{domain}", domain.split(".")[0].title()) for domain in _PROMO_DOMAINS]
+    start = datetime(2024, 1, 1)
+    span = 365 * 24 * 3600
+    for i in range(count):
+        received = start + timedelta(seconds=rng.randrange(span))
+        if rng.random() < 0.2:
+            sender, name = rng.choice(promo_senders)
+            content = " ".join(rng.choice(_PROMO_SENTENCES) for _ in range(rng.randint(2, 5)))
+            yield {
+                "id": f"email_{i:07d}", "sender": sender, "sender_name": name,
+                "subject": rng.choice(["Weekly digest", "Special offer inside", "Don't miss out"]),
+                "date": received.strftime("%Y-%m-%d %H:%M:%S"), "content": content,
+                "priority": "low", "category": "promotional", "attachments": [],
+                "requires_response": False, "deadline": None, "unread": rng.random() < 0.6,
+            }
+            continue
+        sender, name = rng.choice(senders)
+        topic = rng.choice(_TOPICS)
+        content = " ".join(rng.choice(_WORK_SENTENCES).format(topic=topic) for _ in range(rng.randint(2, 8)))
+        priority = rng.choices(["high", "medium", "low"], weights=[2, 5, 3])[0]
+        requires_response = rng.random() < 0.3
+        deadline = None
+        if requires_response and rng.random() < 0.8:
+            deadline = (received + timedelta(hours=rng.randint(4, 24 * 14))).strftime("%Y-%m-%d %H:%M:%S")
+        attachments = [f"{topic.replace(' ', '_')}.pdf"] if rng.random() < 0.25 else []
+        yield {
+            "id": f"email_{i:07d}", "sender": sender, "sender_name": name,
+            "subject": f"{rng.choice(['Re: ', 'Fwd: ', ''])}{topic.title()}",
+            "date": received.strftime("%Y-%m-%d %H:%M:%S"), "content": content,
+            "priority": priority, "category": "urgent" if priority == "high" else rng.choice(["work", "follow-up"]),
+            "attachments": attachments, "requires_response": requires_response,
+            "deadline": deadline, "unread": rng.random() < 0.4,
+        }
+
+
+def build_mailbox(count: int, seed: int = SEED, path: str = ":memory:",
+                  batch_size: int = 10000) -> SQLiteMailbox:
+    """Create a SQLite mailbox holding `count` synthetic emails."""
+    mailbox = SQLiteMailbox(path)
+    batch = []
+    for email in synthetic_emails(count, seed):
+        batch.append(email)
+        if len(batch) >= batch_size:
+            mailbox.add_emails(batch)
+            batch = []
+    if batch:
+        mailbox.add_emails(batch)
+    return mailbox
+
+
+class StubToolContext:
+    """Minimal stand-in for ADK's ToolContext: session state plus a session id."""
+
+    def __init__(self, session_id: str = "benchmark"):
+        self.state: Dict[str, Any] = {}
+        self._invocation_context = SimpleNamespace(session=SimpleNamespace(id=session_id))
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(fn: Callable[[], Any], setup: Optional[Callable[[], None]] = None,
+            repeat: int = 5, warmup: int = 1) -> Dict[str, Any]:
+    """
+    Time `fn` over `repeat` runs (after `warmup` untimed ones) and record its memory peak.
+
+    `setup` runs before every call, outside the timed region. Tool output on
+    stdout is discarded so console I/O does not skew the timings.
+    """
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()) as sink:
+        for run in range(warmup + repeat):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - started
+            if run >= warmup:
+                timings.append(elapsed * 1000)
+            sink.seek(0)
+            sink.truncate()
+        if setup:
+            setup()
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {
+        "runs": repeat,
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(_percentile(timings, 0.95), 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def _reset_caches() -> None:
+    summaries.get_summary_cache().clear()
+    events.get_event_extractor().cache.clear()
+
+
+def run_size(count: int, seed: int = SEED, repeat: int = 5) -> List[Dict[str, Any]]:
+    """Build a mailbox of `count` emails and benchmark every tool against it."""
+    results = []
+
+    def record(tool: str, case: str, stats: Dict[str, Any]) -> None:
+        results.append(dict({"size": count, "tool": tool, "case": case}, **stats))
+        print(f"  {tool:28} {case:24} median {stats['median_ms']:>10.3f} ms   "
+              f"p95 {stats['p95_ms']:>10.3f} ms   peak {stats['peak_kib']:>10.1f} KiB", file=sys.stderr)
+
+    started = time.perf_counter()
+    mailbox = build_mailbox(count, seed)
+    print(f"size {count}: mailbox built in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    set_mailbox(mailbox)
+    _reset_caches()
+
+    rng = random.Random(seed)
+    sample_ids = [f"email_{i:07d}" for i in rng.sample(range(count), min(ID_SAMPLE, count))]
+    bulk_ids = [f"email_{i:07d}" for i in rng.sample(range(count), min(BULK_SAMPLE, count))]
+    bodies = [email.content for email in mailbox.get_emails(bulk_ids, include_body=True).values()]
+    context = StubToolContext()
+
+    for filter_type in FILTERS:
+        record("read_emails", filter_type, measure(
+            lambda: agent.read_emails("gmail", context, filter_type, limit=agent.MAX_PAGE_SIZE), repeat=repeat))
+    record("search_emails", "text", measure(
+        lambda: agent.search_emails("contract review", context), repeat=repeat))
+
+    record("summarize_emails", f"{len(sample_ids)} cold", measure(
+        lambda: agent.summarize_emails(sample_ids, context), setup=_reset_caches, repeat=repeat))
+    record("summarize_emails", f"{len(sample_ids)} warm", measure(
+        lambda: agent.summarize_emails(sample_ids, context), repeat=repeat))
+    record("summarize_emails", f"{len(bulk_ids)} cold", measure(
+        lambda: agent.summarize_emails(bulk_ids, context), setup=_reset_caches, repeat=repeat))
+
+    for name in ("extract_keywords", "extract_actions", "extract_deadlines"):
+        helper = getattr(agent, name)
+        record(name, f"{len(bodies)} bodies", measure(
+            lambda: [helper(body) for body in bodies], repeat=repeat))
+    record("extract_calendar_events", f"{len(sample_ids)} cold", measure(
+        lambda: agent.extract_calendar_events(sample_ids, context), setup=_reset_caches, repeat=repeat))
+
+    def reset_classifier() -> None:
+        spam._classifier = None
+
+    record("detect_spam", "bootstrap", measure(
+        lambda: agent.detect_spam(sample_ids[:1], context), setup=reset_classifier, repeat=1, warmup=0))
+    record("detect_spam", f"{len(sample_ids)} ids", measure(
+        lambda: agent.detect_spam(sample_ids, StubToolContext()), repeat=repeat))
+
+    record("categorize_emails", f"{len(bulk_ids)} ids", measure(
+        lambda: agent.categorize_emails(bulk_ids, ["work"] * len(bulk_ids), StubToolContext()), repeat=repeat))
+
+    def new_categorizer() -> None:
+        # Drop the process-wide categorizer so the next call runs the bulk pass again
+        mailbox.remove_listener(categorizer.get_categorizer(mailbox)._on_mailbox_event)
+        categorizer._categorizer = None
+
+    record("auto_categorize_emails", "bulk", measure(
+        lambda: agent.auto_categorize_emails(StubToolContext(), scope="all"), setup=new_categorizer,
+        repeat=repeat, warmup=0))
+    record("auto_categorize_emails", "new", measure(
+        lambda: agent.auto_categorize_emails(context), repeat=repeat))
+
+    def new_tracker() -> None:
+        # Drop the process-wide tracker so the next call rebuilds it from the mailbox
+        mailbox.remove_listener(replies.get_reply_tracker(mailbox)._on_mailbox_event)
+        replies._tracker = None
+
+    record("track_unanswered_emails", "cold", measure(
+        lambda: agent.track_unanswered_emails(StubToolContext()), setup=new_tracker, repeat=repeat, warmup=0))
+    record("track_unanswered_emails", "warm", measure(
+        lambda: agent.track_unanswered_emails(context), repeat=repeat))
+
+    mailbox.close()
+    return results
+
+
+# Median milliseconds a bare package import may take before --startup fails
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "50"))
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter; every stage is timed on its own, after the ones before it
+_STARTUP_SCRIPT = """
+import json, time
+stages = {{}}
+started = time.perf_counter()
+import {package} as package
+stages["import"] = time.perf_counter() - started
+started = time.perf_counter()
+package.root_agent
+stages["root_agent"] = time.perf_counter() - started
+if "{package}" == "email_agent_example":
+    started = time.perf_counter()
+    [tool._get_declaration() for tool in package.root_agent.tools]
+    stages["tool_declarations"] = time.perf_counter() - started
+    started = time.perf_counter()
+    [tool._get_declaration() for tool in package.root_agent.tools]
+    stages["tool_declarations_cached"] = time.perf_counter() - started
+print(json.dumps(stages))
+"""
+
+
+def measure_startup(repeat: int = 5) -> List[Dict[str, Any]]:
+    """Cold-start cost of both agent packages, as benchmark results with size 0."""
+    paths = [REPO_ROOT, os.path.join(REPO_ROOT, "adk-email-agent"), os.getenv("PYTHONPATH", "")]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, paths)))
+    results = []
+    for package in ("email_agent_example", "email_agent"):
+        timings: Dict[str, List[float]] = {}
+        for _ in range(repeat):
+            output = subprocess.run(
+                [sys.executable, "-c", _STARTUP_SCRIPT.format(package=package)],
+                env=env, cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+            ).stdout
+            for stage, seconds in json.loads(output.strip().splitlines()[-1]).items():
+                timings.setdefault(stage, []).append(seconds * 1000)
+        for stage, values in timings.items():
+            results.append({
+                "size": 0, "tool": package, "case": f"startup {stage}", "runs": repeat,
+                "min_ms": round(min(values), 3),
+                "median_ms": round(statistics.median(values), 3),
+                "p95_ms": round(_percentile(values, 0.95), 3),
+                "mean_ms": round(statistics.fmean(values), 3),
+            })
+            print(f"  {package:28} {'startup ' + stage:24} median {results[-1]['median_ms']:>10.3f} ms",
+                  file=sys.stderr)
+    return results
+
+
+def over_budget(results: List[Dict[str, Any]], budget_ms: float) -> List[str]:
+    """Describe every package whose median bare import took longer than `budget_ms`."""
+    return [
+        f"{r['tool']} import: {r['median_ms']:.3f} ms > {budget_ms:.3f} ms"
+        for r in results if r["case"] == "startup import" and r["median_ms"] > budget_ms
+    ]
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """Describe every (size, tool, case) whose median grew by more than `threshold`x."""
+    previous = {(r["size"], r["tool"], r["case"]): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get((result["size"], result["tool"], result["case"]))
+        if before and before["median_ms"] > 0 and result["median_ms"] > before["median_ms"] * threshold:
+            regressions.append(
+                f"{result['tool']} [{result['case']}] @ {result['size']}: "
+                f"{before['median_ms']:.3f} ms -> {result['median_ms']:.3f} ms"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        help=f"Mailbox sizes (default: {' '.join(map(str, DEFAULT_SIZES))}, none with --startup)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON to this file (default: stdout)")
+    parser.add_argument("--compare", help="Baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="Median slowdown ratio that counts as a regression")
+    parser.add_argument("--startup", action="store_true", help="Also benchmark import and agent construction")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET_MS,
+                        help="Milliseconds a package import may take before --startup fails")
+    args = parser.parse_args(argv)
+    sizes = args.sizes if args.sizes is not None else ([] if args.startup else list(DEFAULT_SIZES))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": [],
+    }
+    if args.startup:
+        report["results"].extend(measure_startup(args.repeat))
+    for size in sizes:
+        report["results"].extend(run_size(size, args.seed, args.repeat))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    failed = False
+    if args.startup:
+        for line in over_budget(report["results"], args.startup_budget):
+            print(f"OVER BUDGET {line}", file=sys.stderr)
+            failed = True
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
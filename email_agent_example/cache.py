@@ -0,0 +1,65 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Hashable, Iterable
+
+
+def fields_hash(email: Dict[str, Any], fields: Iterable[str]) -> str:
+    """
+    Hash of the given fields of an email record, for content-keyed caches.
+
+    Records that carry a stored `body_hash` are keyed on it instead of their
+    content, so a cache lookup never has to load the body.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for field in fields:
+        if field == "content" and getattr(email, "body_hash", None):
+            value = email.body_hash
+        else:
+            value = email.get(field)
+        digest.update(repr(value).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU mapping with hit/miss counters."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def __contains__(self, key: Hashable) -> bool:
+        # A peek: neither counts as a hit or miss nor refreshes the entry
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
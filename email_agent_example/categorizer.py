@@ -0,0 +1,282 @@
+import json
+import os
+import re
+import threading
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+from . import state_log
+from .mailbox import MailboxBackend
+from .records import make_preview
+
+# JSON file with a list of rules replacing DEFAULT_RULES, e.g.
+# [{"category": "finance", "domains": ["bank.com"], "subject": "statement|invoice"}]
+CATEGORY_RULES_PATH = os.getenv("EMAIL_CATEGORY_RULES", "")
+
+# Checked in order; the first rule whose conditions all hold assigns the category
+DEFAULT_RULES: List[Dict[str, Any]] = [
+    {"category": "promotional", "sender": r"^(no-?reply|newsletter|news|deals|offers|marketing|promo)[.@+_-]"},
+    {"category": "promotional", "keywords": ["unsubscribe", "% off", "limited time", "flash sale",
+                                             "special offer", "newsletter"]},
+    {"category": "urgent", "subject": r"\b(urgent|asap|immediately|action required|critical)\b"},
+    {"category": "meeting", "subject": r"\b(meeting|invitation|invite|agenda|call|sync)\b"},
+    {"category": "finance", "keywords": ["invoice", "payment", "receipt", "billing", "budget", "expense"]},
+    {"category": "follow-up", "keywords": ["follow up", "following up", "reminder", "checking in"]},
+]
+
+_CONDITIONS = ("domains", "sender", "subject", "body", "keywords")
+
+
+class Rule:
+    """
+    One compiled categorization rule; every condition given must hold.
+
+    domains:  sender domain or any parent of it ("company.com" matches "mail.company.com")
+    sender:   regex searched in the sender address
+    subject:  regex searched in the subject
+    body:     regex searched in the body (the only condition that loads it)
+    keywords: any of these words or phrases in the subject or preview
+    Patterns are case-insensitive.
+    """
+
+    __slots__ = ("index", "category", "domains", "sender", "subject", "body", "keywords")
+
+    def __init__(self, index: int, category: str, domains: Iterable[str] = (), sender: Optional[str] = None,
+                 subject: Optional[str] = None, body: Optional[str] = None, keywords: Iterable[str] = ()):
+        self.index = index
+        self.category = category
+        self.domains = tuple(domain.lower().lstrip("@") for domain in domains)
+        self.sender = re.compile(sender, re.IGNORECASE) if sender else None
+        self.subject = re.compile(subject, re.IGNORECASE) if subject else None
+        self.body = re.compile(body, re.IGNORECASE) if body else None
+        # All keywords in one alternation, so a rule costs one scan however many it lists
+        words = sorted((re.escape(k.lower()) for k in keywords), key=len, reverse=True)
+        self.keywords = re.compile(r"(?<!\w)(?:" + "|".join(words) + r")", re.IGNORECASE) if words else None
+
+    @classmethod
+    def from_dict(cls, index: int, spec: Dict[str, Any]) -> "Rule":
+        unknown = set(spec) - set(_CONDITIONS) - {"category"}
+        if not spec.get("category") or unknown:
+            raise ValueError(f"Invalid rule {index}: needs a category and only {', '.join(_CONDITIONS)}")
+        return cls(index, spec["category"], spec.get("domains", ()), spec.get("sender"), spec.get("subject"),
+                   spec.get("body"), spec.get("keywords", ()))
+
+    def matches_headers(self, email: Any) -> bool:
+        if self.sender and not self.sender.search(email.get("sender") or ""):
+            return False
+        if self.subject and not self.subject.search(email.get("subject") or ""):
+            return False
+        if self.keywords and not (self.keywords.search(email.get("subject") or "")
+                                  or self.keywords.search(_preview(email))):
+            return False
+        return True
+
+
+def _preview(email: Any) -> str:
+    # Records carry a preview; plain dicts handed to add_emails only have content
+    if "preview" in email:
+        return email["preview"] or ""
+    return make_preview(email.get("content") or "")
+
+
+def _domain(sender: str) -> str:
+    return sender.rpartition("@")[2].lower()
+
+
+class RuleEngine:
+    """
+    Ordered rules indexed by sender domain.
+
+    An email is only checked against rules without a domain condition and the
+    rules listing its domain or a parent domain; the merged candidate list is
+    cached per domain. Bodies are read only when a body rule is reached.
+    """
+
+    def __init__(self, rules: Iterable[Dict[str, Any]]):
+        self.rules = [Rule.from_dict(index, spec) for index, spec in enumerate(rules)]
+        self.categories: List[str] = list(dict.fromkeys(rule.category for rule in self.rules))
+        self._generic = [rule for rule in self.rules if not rule.domains]
+        self._by_domain: Dict[str, List[Rule]] = {}
+        for rule in self.rules:
+            for domain in rule.domains:
+                self._by_domain.setdefault(domain, []).append(rule)
+        self._candidates: Dict[str, Tuple[Rule, ...]] = {}
+
+    def candidates(self, domain: str) -> Tuple[Rule, ...]:
+        cached = self._candidates.get(domain)
+        if cached is None:
+            labels = domain.split(".")
+            specific = [rule for i in range(len(labels)) for rule in self._by_domain.get(".".join(labels[i:]), ())]
+            cached = tuple(sorted(set(specific + self._generic), key=lambda rule: rule.index))
+            if len(self._candidates) >= 10000:
+                self._candidates.clear()
+            self._candidates[domain] = cached
+        return cached
+
+    def needs_body(self, email: Any) -> bool:
+        return any(rule.body for rule in self.candidates(_domain(email.get("sender") or "")))
+
+    def categorize(self, email: Any, body: Optional[str] = None) -> Optional[str]:
+        """Category of the first matching rule, or None; `body` saves loading it from the email."""
+        for rule in self.candidates(_domain(email.get("sender") or "")):
+            if not rule.matches_headers(email):
+                continue
+            if rule.body:
+                text = body if body is not None else email.get("content") or ""
+                if not rule.body.search(text):
+                    continue
+            return rule.category
+        return None
+
+    def categorize_many(self, emails: List[Any], mailbox: Optional[MailboxBackend] = None) -> Dict[str, str]:
+        """Categorize a batch, fetching the bodies body rules need in one query."""
+        bodies: Dict[str, str] = {}
+        if mailbox is not None:
+            wanted = [email["id"] for email in emails if self.needs_body(email)]
+            if wanted:
+                bodies = mailbox.get_bodies(wanted)
+        results = {}
+        for email in emails:
+            category = self.categorize(email, bodies.get(email["id"]))
+            if category is not None:
+                results[email["id"]] = category
+        return results
+
+
+def load_rules(path: str = CATEGORY_RULES_PATH) -> List[Dict[str, Any]]:
+    if not path:
+        return DEFAULT_RULES
+    with open(path) as f:
+        return json.load(f)
+
+
+class AutoCategorizer:
+    """
+    Categories of every email in a mailbox, kept current from mailbox events.
+
+    Built with one bulk pass over the mailbox; afterwards only added or
+    updated emails are categorized. Each assignment is appended to a log, so
+    a session can pick up just what changed since its last sequence number.
+    Categories are held as small integer codes into `engine.categories`.
+    """
+
+    BATCH = 500
+
+    def __init__(self, mailbox: MailboxBackend, engine: RuleEngine):
+        self.mailbox = mailbox
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._codes: Dict[str, int] = {}
+        self._log: List[str] = []
+        self._code_of = {name: code for code, name in enumerate(engine.categories)}
+        batch: List[Any] = []
+        for email in mailbox.iter_emails("all", batch_size=self.BATCH):
+            batch.append(email)
+            if len(batch) == self.BATCH:
+                self._assign(batch)
+                batch = []
+        self._assign(batch)
+        mailbox.add_listener(self._on_mailbox_event)
+
+    def _assign(self, emails: List[Any], bodies_known: bool = False) -> None:
+        if not emails:
+            return
+        found = (self.engine.categorize_many(emails) if bodies_known
+                 else self.engine.categorize_many(emails, self.mailbox))
+        for email in emails:
+            email_id = email["id"]
+            category = found.get(email_id)
+            code = None if category is None else self._code_of[category]
+            if self._codes.get(email_id) != code:
+                if code is None:
+                    del self._codes[email_id]
+                else:
+                    self._codes[email_id] = code
+                self._log.append(email_id)
+
+    def _on_mailbox_event(self, event: str, payload: List[Any]) -> None:
+        if event == "added":
+            with self._lock:
+                # Written emails carry their content, so no body needs to be fetched
+                self._assign(payload, bodies_known=True)
+
+    @property
+    def sequence(self) -> int:
+        return len(self._log)
+
+    def changed_since(self, sequence: int) -> Tuple[Dict[str, Optional[int]], int]:
+        """
+        Current code (None when uncategorized) of every email assigned after
+        `sequence`, and the sequence number to pass next time.
+        """
+        with self._lock:
+            if sequence > len(self._log):
+                # Recorded against an earlier categorizer; start over
+                sequence = 0
+            changed = {email_id: self._codes.get(email_id) for email_id in self._log[sequence:]}
+            return changed, len(self._log)
+
+    def counts(self) -> Dict[str, int]:
+        totals = [0] * len(self.engine.categories)
+        for code in self._codes.values():
+            totals[code] += 1
+        return {name: totals[code] for code, name in enumerate(self.engine.categories) if totals[code]}
+
+
+_categorizer: Optional[AutoCategorizer] = None
+_categorizer_lock = threading.Lock()
+
+
+def get_categorizer(mailbox: MailboxBackend) -> AutoCategorizer:
+    """Return the categorizer for `mailbox`, running the bulk pass on first use."""
+    global _categorizer
+    with _categorizer_lock:
+        if _categorizer is None or _categorizer.mailbox is not mailbox:
+            if _categorizer is not None:
+                _categorizer.mailbox.remove_listener(_categorizer._on_mailbox_event)
+            _categorizer = AutoCategorizer(mailbox, RuleEngine(load_rules()))
+        return _categorizer
+
+
+def category_map(state) -> Dict[str, Any]:
+    """
+    The compact session-state form: {"names": [...], "codes": {email id: index
+    into names}, "sequence": categorizer position already merged}. Upgrades the
+    old {email id: category name} dict.
+    """
+    stored = state_log.load(state, "email_categories")
+    if isinstance(stored, dict) and "codes" in stored and "names" in stored:
+        return {"names": list(stored["names"]), "codes": dict(stored["codes"]),
+                "sequence": stored.get("sequence", 0)}
+    upgraded = {"names": [], "codes": {}, "sequence": 0}
+    for email_id, category in (stored or {}).items():
+        set_category(upgraded, email_id, category)
+    return upgraded
+
+
+def save_categories(state, categories: Dict[str, Any], email_ids: Iterable[str]) -> None:
+    """Write back a category map from category_map, recording only the codes of `email_ids`."""
+    stored = state.get("email_categories")
+    if not (isinstance(stored, dict) and "codes" in stored):
+        state_log.snapshot(state, "email_categories", categories)
+        return
+    codes = categories["codes"]
+    state_log.update(state, "email_categories", {
+        "names": categories["names"],
+        "sequence": categories["sequence"],
+        "codes": {email_id: codes.get(email_id) for email_id in email_ids},
+    })
+
+
+def set_category(categories: Dict[str, Any], email_id: str, category: Optional[str]) -> None:
+    if category is None:
+        categories["codes"].pop(email_id, None)
+        return
+    names = categories["names"]
+    if category not in names:
+        names.append(category)
+    categories["codes"][email_id] = names.index(category)
+
+
+def category_of(categories: Dict[str, Any], email_id: str) -> Optional[str]:
+    code = categories["codes"].get(email_id)
+    return None if code is None else categories["names"][code]
@@ -0,0 +1,246 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import string
+import time
+from itertools import islice
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Mapping, Tuple
+
+# Rendered bulk drafts are written here, in a directory per session, one JSON line
+# per draft in a file named by batch id
+DRAFTS_DIR = os.getenv("EMAIL_DRAFTS_DIR", os.path.expanduser("~/.email_agent/drafts"))
+# Seconds a batch stays readable after it is written; older files are deleted
+DRAFT_BATCH_TTL = float(os.getenv("DRAFT_BATCH_TTL", str(24 * 3600)))
+MAX_BULK_RECIPIENTS = int(os.getenv("MAX_BULK_RECIPIENTS", "5000"))
+
+# Column names accepted for the recipient address in CSV input, in order of preference
+_ADDRESS_COLUMNS = ("email", "recipient", "to", "address")
+
+
+class Template:
+    """
+    A str.format-style template parsed once into literal and placeholder segments.
+
+    Only plain names are allowed as placeholders ({name}, {company}); rendering
+    joins the segments, so a template used for 500 rows is parsed once.
+    Missing variables raise KeyError naming the placeholder.
+    """
+
+    __slots__ = ("source", "fields", "_segments")
+
+    def __init__(self, source: str):
+        segments: List[Tuple[str, bool]] = []
+        for literal, field, spec, conversion in string.Formatter().parse(source):
+            if literal:
+                segments.append((literal, False))
+            if field is None:
+                continue
+            if not field.isidentifier() or spec or conversion:
+                raise ValueError(f"Unsupported placeholder {{{field}}}; use plain names like {{name}}")
+            segments.append((field, True))
+        self.source = source
+        self.fields = frozenset(text for text, is_field in segments if is_field)
+        self._segments = tuple(segments)
+
+    def render(self, variables: Mapping[str, Any]) -> str:
+        return "".join(str(variables[text]) if is_field else text for text, is_field in self._segments)
+
+
+# Body layout per tone; {name} is the greeting name and {content} the rendered message
+TONE_TEMPLATES = {
+    "professional": Template("""Dear {name},
+
+{content}
+
+Best regards,
+[Your Name]"""),
+    "casual": Template("""Hi {name}!
+
+{content}
+
+Cheers,
+[Your Name]"""),
+    "persuasive": Template("""Dear {name},
+
+I hope this email finds you well. I'm reaching out because {content}
+
+I believe this opportunity would be mutually beneficial, and I'd love to discuss it further with you.
+
+Looking forward to hearing from you.
+
+Best regards,
+[Your Name]"""),
+    "empathetic": Template("""Dear {name},
+
+I understand that {content}
+
+Please know that I'm here to support you through this process, and I'm committed to finding the best solution for everyone involved.
+
+Warm regards,
+[Your Name]"""),
+}
+
+
+def display_name(recipient: str) -> str:
+    """Greeting name guessed from an address: "john.doe@x.com" -> "John Doe"."""
+    return recipient.split("@")[0].replace(".", " ").title()
+
+
+def render_body(tone: str, name: str, content: str) -> str:
+    """Wrap already-rendered content in the tone's layout; unknown tones read as professional."""
+    template = TONE_TEMPLATES.get(tone, TONE_TEMPLATES["professional"])
+    return template.render({"name": name, "content": content})
+
+
+def _variable_name(column: Any) -> str:
+    return "_".join(str(column).strip().lower().split())
+
+
+def iter_recipients(recipients: Optional[Iterable[Any]] = None,
+                    csv_data: Optional[str] = None) -> Iterator[Dict[str, str]]:
+    """
+    Rows of merge variables, each with at least "email".
+
+    `recipients` holds addresses or dicts of variables; `csv_data` is CSV text
+    with a header row and an email/recipient/to/address column. Other columns
+    become variables of the same name. Rows are produced lazily.
+    """
+    for recipient in recipients or ():
+        if isinstance(recipient, Mapping):
+            yield {_variable_name(k): "" if v is None else str(v).strip() for k, v in recipient.items()}
+        else:
+            yield {"email": str(recipient).strip()}
+    if csv_data:
+        reader = csv.DictReader(io.StringIO(csv_data.strip()))
+        columns = [_variable_name(name) for name in reader.fieldnames or ()]
+        address = next((c for c in _ADDRESS_COLUMNS if c in columns), None)
+        if address is None:
+            raise ValueError(f"CSV needs one of the columns: {', '.join(_ADDRESS_COLUMNS)}")
+        for row in reader:
+            variables = {_variable_name(name): (value or "").strip() for name, value in row.items() if name}
+            variables["email"] = variables.pop(address, "")
+            yield variables
+
+
+def iter_drafts(rows: Iterable[Dict[str, str]], subject: str, content: str,
+                tone: str = "professional") -> Iterator[Dict[str, Any]]:
+    """
+    Render one draft per row, yielding each as soon as it is ready.
+
+    Subject and content are compiled once. Every row gets `name` (from its
+    name column or the address) and `first_name` unless it supplies them.
+    Rows that cannot be rendered yield {"row", "email", "error"} instead.
+    """
+    subject_template = Template(subject)
+    content_template = Template(content)
+    for index, row in enumerate(rows, start=1):
+        email = row.get("email", "")
+        if "@" not in email:
+            yield {"row": index, "email": email, "error": "missing or invalid email address"}
+            continue
+        variables = dict(row)
+        variables.setdefault("recipient", email)
+        variables["name"] = variables.get("name") or display_name(email)
+        variables.setdefault("first_name", variables["name"].split()[0] if variables["name"].split() else "")
+        try:
+            yield {
+                "row": index,
+                "recipient": email,
+                "subject": subject_template.render(variables),
+                "draft": render_body(tone, variables["name"], content_template.render(variables)),
+            }
+        except KeyError as e:
+            yield {"row": index, "email": email, "error": f"no value for placeholder {{{e.args[0]}}}"}
+
+
+def batch_path(batch_id: str, session_id: Optional[str] = None) -> str:
+    """Path of a batch file. Each session has its own directory, so a batch id only resolves in its session."""
+    if not batch_id.isalnum():
+        raise ValueError("Invalid batch id")
+    scope = hashlib.sha256((session_id or "").encode("utf-8")).hexdigest()[:32]
+    return os.path.join(DRAFTS_DIR, scope, f"{batch_id}.jsonl")
+
+
+def _expired(path: str, now: float) -> bool:
+    try:
+        return os.path.getmtime(path) + DRAFT_BATCH_TTL < now
+    except OSError:
+        return False
+
+
+def expire_batches(now: Optional[float] = None) -> int:
+    """Delete batch files older than DRAFT_BATCH_TTL and any session directory left empty. Returns files removed."""
+    now = time.time() if now is None else now
+    removed = 0
+    for directory, _, files in os.walk(DRAFTS_DIR, topdown=False):
+        for name in files:
+            path = os.path.join(directory, name)
+            if _expired(path, now):
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        if directory != DRAFTS_DIR:
+            try:
+                os.rmdir(directory)  # only succeeds once the directory is empty
+            except OSError:
+                pass
+    return removed
+
+
+def write_batch(drafts: Iterable[Dict[str, Any]], batch_id: str, session_id: Optional[str] = None,
+                sample: int = 3, max_errors: int = 20) -> Dict[str, Any]:
+    """
+    Stream rendered drafts to the session's batch file as they arrive.
+
+    Only a few drafts and errors are kept in memory for the response. The file
+    appears under its final name once complete, readable only by this user, and
+    expired batches are cleaned up first. Returns {"count", "errors",
+    "error_count", "sample", "digest"}; the digest covers every draft.
+    """
+    expire_batches()
+    path = batch_path(batch_id, session_id)
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    partial = f"{path}.{os.getpid()}.tmp"
+    count, error_count, errors, kept = 0, 0, [], []
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+            for draft in drafts:
+                if "error" in draft:
+                    error_count += 1
+                    if len(errors) < max_errors:
+                        errors.append(draft)
+                    continue
+                if count >= MAX_BULK_RECIPIENTS:
+                    raise ValueError(f"At most {MAX_BULK_RECIPIENTS} recipients per batch")
+                f.write(json.dumps(draft, separators=(",", ":")) + "\n")
+                digest.update(draft["draft"].encode("utf-8"))
+                count += 1
+                if len(kept) < sample:
+                    kept.append(draft)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return {"count": count, "errors": errors, "error_count": error_count, "sample": kept,
+            "digest": digest.hexdigest()[:16]}
+
+
+def read_batch(batch_id: str, offset: int = 0, limit: int = 10,
+               session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Drafts offset..offset+limit of one of the session's batches, read without loading the rest.
+
+    Raises:
+        FileNotFoundError: If the session has no such batch or it has expired.
+    """
+    path = batch_path(batch_id, session_id)
+    if _expired(path, time.time()):
+        os.remove(path)
+        raise FileNotFoundError(path)
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in islice(f, offset, offset + limit)]
@@ -0,0 +1,203 @@
+import hashlib
+import operator
+import os
+import re
+import struct
+import threading
+from typing import List, Dict, Any, Optional, Tuple, Callable, Hashable
+
+from .cache import LRUCache
+
+# NEAR_DUPLICATES=0 turns clustering off; every email is then processed on its own
+NEAR_DUPLICATES = os.getenv("NEAR_DUPLICATES", "1") != "0"
+# Estimated Jaccard similarity of word shingles at or above which two bodies are duplicates
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+NUM_PERMUTATIONS = 64
+# LSH bands of NUM_PERMUTATIONS // BANDS rows; 16 bands of 4 catch pairs down to ~0.5 similarity,
+# which the signature comparison then narrows to the threshold
+BANDS = 16
+SHINGLE_WORDS = 5
+# Bodies with fewer distinct shingles than this ("Thanks!", an empty or fully
+# quoted reply) look alike whatever they say, so they are never clustered
+MIN_SHINGLES = int(os.getenv("NEAR_DUPLICATE_MIN_SHINGLES", "8"))
+# Only the start of a long body is signed; newsletters and quoted chains differ early if at all
+MAX_SIGNED_CHARS = 4000
+
+# One SHAKE-128 digest per shingle yields all NUM_PERMUTATIONS 32-bit hash values at once
+_UNPACK = struct.Struct(f"<{NUM_PERMUTATIONS}I").unpack
+
+# Where a reply's quoted history starts: "On <date>, <name> wrote:", Outlook headers, forwarded blocks
+_QUOTE_HEADER = re.compile(
+    r"^\s*(?:On\b.{0,200}?\bwrote:|-{2,}\s*(?:Original|Forwarded) Message\s*-{2,}|From:\s.+\n\s*(?:Sent|Date):)",
+    re.IGNORECASE | re.MULTILINE,
+)
+_QUOTED_LINE = re.compile(r"^\s*>.*$\n?", re.MULTILINE)
+_WORD = re.compile(r"\w+")
+_REPLY_PREFIX = re.compile(r"^\s*(?:(?:re|fw|fwd|aw|wg)\s*(?:\[\d+\])?\s*:\s*)+", re.IGNORECASE)
+
+
+def strip_quoted(text: str) -> str:
+    """The new part of a message: quoted history and "> " lines removed."""
+    header = _QUOTE_HEADER.search(text)
+    if header:
+        text = text[:header.start()]
+    return _QUOTED_LINE.sub("", text).strip()
+
+
+def normalize_subject(subject: str) -> str:
+    """Subject without reply/forward prefixes, case or repeated whitespace: "Re: FW: Q4  plan" -> "q4 plan"."""
+    return " ".join(_REPLY_PREFIX.sub("", subject or "").lower().split())
+
+
+def sender_key(email: Any) -> str:
+    """Default clustering partition: copies of one message share a sender."""
+    return (email.get("sender") or "").strip().lower()
+
+
+def _shingles(text: str) -> List[str]:
+    words = _WORD.findall(strip_quoted(text)[:MAX_SIGNED_CHARS].lower())
+    if len(words) < SHINGLE_WORDS:
+        return [" ".join(words)] if words else []
+    return list({" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)})
+
+
+def minhash(text: str) -> Tuple[int, ...]:
+    """MinHash signature of the word shingles of a body's new (unquoted) text."""
+    return _minhash(_shingles(text))
+
+
+def _minhash(shingles: List[str]) -> Tuple[int, ...]:
+    rows = [_UNPACK(hashlib.shake_128(shingle.encode("utf-8")).digest(NUM_PERMUTATIONS * 4))
+            for shingle in shingles]
+    # Column-wise minimum: the smallest value of each hash function over all shingles
+    return tuple(map(min, zip(*rows))) if rows else (0,) * NUM_PERMUTATIONS
+
+
+def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(map(operator.eq, first, second)) / len(first)
+
+
+def _body_key(email: Any) -> str:
+    stored = getattr(email, "body_hash", None)
+    if stored:
+        return stored
+    return hashlib.blake2b((email.get("content") or "").encode("utf-8"), digest_size=16).hexdigest()
+
+
+class NearDuplicateIndex:
+    """
+    Groups emails whose bodies are near-duplicates, with signatures cached by body hash.
+
+    Signatures of identical bodies are computed once, and stored body hashes
+    let cached signatures be found without loading the body. Candidate pairs
+    come from LSH buckets and are kept only when their signatures agree on at
+    least `threshold` of the permutations. Bodies with fewer than
+    `min_shingles` shingles are too short to tell apart and stay on their own.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD, max_entries: int = 50000,
+                 min_shingles: int = MIN_SHINGLES):
+        self.threshold = threshold
+        self.min_shingles = min_shingles
+        self.signatures = LRUCache(max_entries)
+
+    def signature(self, email: Any) -> Tuple[Tuple[int, ...], Tuple[int, ...], int]:
+        """(MinHash signature, LSH band keys, number of shingles) of an email's body."""
+        key = _body_key(email)
+        cached = self.signatures.get(key)
+        if cached is None:
+            shingles = _shingles(email.get("content") or "")
+            signature = _minhash(shingles)
+            rows = NUM_PERMUTATIONS // BANDS
+            bands = tuple(hash(signature[band * rows:(band + 1) * rows]) for band in range(BANDS))
+            cached = (signature, bands, len(shingles))
+            self.signatures.put(key, cached)
+        return cached
+
+    def cluster(self, items: List[Tuple[str, Any]], partition: Optional[Callable[[Any], Hashable]] = None,
+                load_bodies: Optional[Callable[[List[Any]], None]] = None) -> Dict[str, List[str]]:
+        """
+        Group (email_id, email) pairs into {representative id: [duplicate ids]}.
+
+        Every id appears once, as a representative (the first of its cluster in
+        input order) or as a duplicate. Emails from different senders, or with
+        different `partition` keys, are never grouped, and neither are bodies
+        below `min_shingles`. `load_bodies`, when given, is called once with the
+        emails whose signature is not cached, so their bodies can be read in
+        one batch rather than one by one.
+        """
+        if load_bodies is not None:
+            load_bodies([email for _, email in items if _body_key(email) not in self.signatures])
+        parent = list(range(len(items)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        signatures, band_keys, sizes = zip(*[self.signature(email) for _, email in items]) if items else ((), (), ())
+        groups = [(sender_key(email), partition(email) if partition else None) for _, email in items]
+        # Each bucket keeps one member per cluster it has seen, so a band shared by
+        # a hundred copies of a newsletter costs one comparison per new copy
+        buckets: Dict[Tuple[Any, int, int], List[int]] = {}
+        for i, signature in enumerate(signatures):
+            if sizes[i] < self.min_shingles:
+                continue
+            compared = set()
+            for band, band_key in enumerate(band_keys[i]):
+                bucket = buckets.setdefault((groups[i], band, band_key), [])
+                merged = False
+                for j in bucket:
+                    root_i, root_j = find(i), find(j)
+                    if root_i == root_j:
+                        merged = True
+                    elif j in compared:
+                        continue
+                    elif similarity(signature, signatures[j]) >= self.threshold:
+                        # The earlier email stays the representative
+                        parent[max(root_i, root_j)] = min(root_i, root_j)
+                        merged = True
+                    else:
+                        compared.add(j)
+                if not merged:
+                    bucket.append(i)
+
+        clusters: Dict[str, List[str]] = {}
+        for i, (email_id, _) in enumerate(items):
+            root = find(i)
+            if root == i:
+                clusters.setdefault(email_id, [])
+            elif items[root][0] != email_id:
+                clusters.setdefault(items[root][0], []).append(email_id)
+        return clusters
+
+
+def collapse(items: List[Tuple[str, Any]], partition: Optional[Callable[[Any], Hashable]] = None,
+             load_bodies: Optional[Callable[[List[Any]], None]] = None
+             ) -> Tuple[List[Tuple[str, Any]], Dict[str, List[str]]]:
+    """
+    The representatives of `items` in input order and {representative: [duplicates]}.
+
+    With NEAR_DUPLICATES off every email represents only itself. `load_bodies`
+    is passed on to NearDuplicateIndex.cluster.
+    """
+    if not NEAR_DUPLICATES or len(items) < 2:
+        return items, {email_id: [] for email_id, _ in items}
+    clusters = get_duplicate_index().cluster(items, partition, load_bodies)
+    return [(email_id, email) for email_id, email in items if email_id in clusters], clusters
+
+
+_index: Optional[NearDuplicateIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_duplicate_index() -> NearDuplicateIndex:
+    """Return the process-wide near-duplicate index and its signature cache."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = NearDuplicateIndex()
+    return _index
@@ -0,0 +1,286 @@
+import os
+import re
+from datetime import datetime, date, time, timedelta, timezone, tzinfo
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+from .cache import LRUCache, fields_hash
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+
+# Words that make a sentence describe something to put on a calendar
+EVENT_WORDS = (
+    "meeting", "call", "sync", "standup", "conference", "lunch", "dinner", "demo",
+    "interview", "appointment", "webinar", "presentation", "workshop",
+)
+DEFAULT_DURATION = timedelta(hours=1)
+# Used when an email names a day but no time
+DEFAULT_START = time(9, 0)
+EVENT_FIELDS = ("date", "subject", "sender", "content", "to", "cc")
+
+_MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6, "jul": 7, "aug": 8,
+    "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+_MONTH = r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sept?(?:ember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+_WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+_PARTS_OF_DAY = {"morning": time(9, 0), "noon": time(12, 0), "lunchtime": time(12, 0),
+                 "afternoon": time(14, 0), "evening": time(18, 0), "tonight": time(19, 0),
+                 "eod": time(17, 0), "end of day": time(17, 0)}
+
+_ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_MONTH_DAY = re.compile(r"\b" + _MONTH + r"\.? (\d{1,2})(?:st|nd|rd|th)?(?:,? (\d{4}))?\b")
+_DAY_MONTH = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)? (?:of )?" + _MONTH + r"(?:,? (\d{4}))?\b")
+_NUMERIC_DATE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2}|\d{4}))?\b")
+_RELATIVE_DAY = re.compile(r"\b(day after tomorrow|tomorrow|today|tonight|next week)\b")
+_WEEKDAY = re.compile(r"\b(?:(next|this) )?(" + "|".join(_WEEKDAYS) + r")\b")
+
+_TIME_RANGE = re.compile(
+    r"\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)?\s*(?:-|–|to|until)\s*(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b"
+)
+_CLOCK_TIME = re.compile(r"\b(\d{1,2}):(\d{2})\s*(am|pm)?\b|\b(\d{1,2})\s*(am|pm)\b")
+_PART_OF_DAY = re.compile(r"\b(" + "|".join(_PARTS_OF_DAY) + r")\b")
+_DURATION = re.compile(
+    r"\b(?:for )?(?:(half an|an|a|\d+(?:\.\d+)?)[ -])?(hours?|hrs?|minutes?|mins?)\b(?!\s*ago)"
+)
+_EMAIL_ADDRESS = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_EVENT_PHRASE = re.compile(r"\b(?:(\w+) )?(" + "|".join(EVENT_WORDS) + r")s?\b")
+_LOCATION = re.compile(r"\b(?:in|at) ((?:conference |meeting )?room [\w-]+|the office|zoom|google meet|teams)\b")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+_SUBJECT_PREFIX = re.compile(r"^(?:(?:re|fwd?|fw):\s*)+", re.IGNORECASE)
+_TITLE_STOPWORDS = {"the", "a", "an", "our", "your", "my", "this", "that", "for", "to", "of", "and",
+                    "next", "quick", "is", "be", "will", "schedule", "book", "set", "up"}
+
+
+def event_timezone() -> tzinfo:
+    """Zone that naive email dates are interpreted in (EVENT_TIMEZONE, default UTC)."""
+    name = os.getenv("EVENT_TIMEZONE", "UTC")
+    if ZoneInfo is not None and name != "UTC":
+        try:
+            return ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return timezone.utc
+
+
+def _year_for(month: int, day: int, reference: date) -> int:
+    # Dates without a year that already passed more than a month ago mean next year
+    year = reference.year
+    try:
+        if date(year, month, day) < reference - timedelta(days=31):
+            year += 1
+    except ValueError:
+        pass
+    return year
+
+
+def _safe_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def parse_day(text: str, reference: date) -> Optional[date]:
+    """Resolve the first date expression in lowercased `text` relative to `reference`."""
+    match = _ISO_DATE.search(text)
+    if match:
+        return _safe_date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    match = _MONTH_DAY.search(text)
+    if match:
+        month, day = _MONTHS[match.group(1)[:3]], int(match.group(2))
+        return _safe_date(int(match.group(3) or _year_for(month, day, reference)), month, day)
+    match = _DAY_MONTH.search(text)
+    if match:
+        month, day = _MONTHS[match.group(2)[:3]], int(match.group(1))
+        return _safe_date(int(match.group(3) or _year_for(month, day, reference)), month, day)
+    match = _NUMERIC_DATE.search(text)
+    if match:
+        month, day = int(match.group(1)), int(match.group(2))
+        year = match.group(3)
+        year = (2000 + int(year) if len(year) == 2 else int(year)) if year else _year_for(month, day, reference)
+        return _safe_date(year, month, day)
+    match = _RELATIVE_DAY.search(text)
+    if match:
+        offsets = {"today": 0, "tonight": 0, "tomorrow": 1, "day after tomorrow": 2}
+        if match.group(1) == "next week":
+            return reference + timedelta(days=7 - reference.weekday())
+        return reference + timedelta(days=offsets[match.group(1)])
+    match = _WEEKDAY.search(text)
+    if match:
+        qualifier, weekday = match.group(1), _WEEKDAYS.index(match.group(2))
+        ahead = (weekday - reference.weekday()) % 7
+        if ahead == 0 and qualifier != "this":
+            ahead = 7
+        if qualifier == "next" and reference.weekday() + ahead < 7:
+            # "next friday" said on a Monday means the Friday of next week
+            ahead += 7
+        return reference + timedelta(days=ahead)
+    return None
+
+
+def _clock(hour: int, minute: int, meridiem: Optional[str]) -> Optional[time]:
+    if meridiem == "pm" and hour < 12:
+        hour += 12
+    elif meridiem == "am" and hour == 12:
+        hour = 0
+    if hour > 23 or minute > 59:
+        return None
+    return time(hour, minute)
+
+
+def parse_times(text: str) -> Tuple[Optional[time], Optional[time]]:
+    """Return (start, end) times found in lowercased `text`; either may be None."""
+    match = _TIME_RANGE.search(text)
+    if match:
+        end_meridiem = match.group(6)
+        end = _clock(int(match.group(4)), int(match.group(5) or 0), end_meridiem)
+        start = _clock(int(match.group(1)), int(match.group(2) or 0), match.group(3) or end_meridiem)
+        if start and end and end > start:
+            return start, end
+    match = _CLOCK_TIME.search(text)
+    if match:
+        if match.group(1):
+            return _clock(int(match.group(1)), int(match.group(2)), match.group(3)), None
+        return _clock(int(match.group(4)), 0, match.group(5)), None
+    match = _PART_OF_DAY.search(text)
+    if match:
+        return _PARTS_OF_DAY[match.group(1)], None
+    return None, None
+
+
+def parse_duration(text: str) -> Optional[timedelta]:
+    """Return the first duration ("for 30 minutes", "1-hour", "half an hour") in lowercased `text`."""
+    for match in _DURATION.finditer(text):
+        amount, unit = match.group(1), match.group(2)
+        if amount is None and not match.group(0).startswith("for "):
+            continue  # a bare "hours" is not a duration
+        value = {None: 1.0, "a": 1.0, "an": 1.0, "half an": 0.5}.get(amount)
+        if value is None:
+            value = float(amount)
+        return timedelta(hours=value) if unit.startswith("h") else timedelta(minutes=value)
+    return None
+
+
+def _title(sentence: str, subject: str) -> str:
+    subject = _SUBJECT_PREFIX.sub("", subject).strip()
+    match = _EVENT_PHRASE.search(sentence)
+    words = [match.group(2)] if match else []
+    if match and match.group(1) and match.group(1) not in _TITLE_STOPWORDS and not match.group(1).isdigit():
+        words.insert(0, match.group(1))
+    phrase = " ".join(words).capitalize()
+    if phrase and subject:
+        return f"{phrase}: {subject}"
+    return phrase or subject or "Event"
+
+
+def _attendees(email: Dict[str, Any]) -> List[str]:
+    candidates = [email.get("sender", "")]
+    for header in ("to", "cc"):
+        value = email.get(header) or []
+        candidates.extend([value] if isinstance(value, str) else value)
+    candidates.extend(_EMAIL_ADDRESS.findall(email.get("content", "")))
+    seen, attendees = set(), []
+    for address in candidates:
+        address = address.strip().lower()
+        if address and "@" in address and address not in seen:
+            seen.add(address)
+            attendees.append(address)
+    return attendees
+
+
+def extract_events(email: Dict[str, Any], tz: Optional[tzinfo] = None) -> List[Dict[str, Any]]:
+    """
+    Extract CREATE_EVENT host actions from one email record.
+
+    Each sentence (and the subject) that mentions a meeting-type word together
+    with a date or time becomes one event, resolved relative to the email's date.
+    """
+    tz = tz or event_timezone()
+    try:
+        received = datetime.fromisoformat(email["date"])
+    except (KeyError, TypeError, ValueError):
+        return []
+    if received.tzinfo is None:
+        received = received.replace(tzinfo=tz)
+
+    attendees = _attendees(email)
+    subject = email.get("subject", "")
+    events, starts = [], set()
+    for sentence in [subject] + _SENTENCE.split(email.get("content", "")):
+        text = sentence.lower()
+        if not _EVENT_PHRASE.search(text):
+            continue
+        day = parse_day(text, received.date())
+        start_time, end_time = parse_times(text)
+        if day is None and start_time is None:
+            continue
+        if day is None:
+            # A bare time means the next occurrence of it after the email arrived
+            day = received.date() if start_time > received.time() else received.date() + timedelta(days=1)
+        start = datetime.combine(day, start_time or DEFAULT_START, tz)
+        if end_time is not None:
+            end = datetime.combine(day, end_time, tz)
+        else:
+            end = start + (parse_duration(text) or DEFAULT_DURATION)
+        if start in starts:
+            continue
+        starts.add(start)
+
+        description = sentence.strip()
+        location = _LOCATION.search(text)
+        if location:
+            description += f"\nLocation: {sentence[location.start(1):location.end(1)]}"
+        if start_time is None:
+            description += "\n(Time not specified in the email.)"
+        events.append({
+            "action": "CREATE_EVENT",
+            "title": _title(text, subject),
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "attendees": attendees,
+            "description": description,
+        })
+    return events
+
+
+class EventExtractor:
+    """Batch event extraction with a per-email cache keyed by id and content hash."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.cache = LRUCache(max_entries)
+
+    def extract(self, items: List[Tuple[str, Dict[str, Any]]],
+                load_bodies: Optional[Callable[[List[Any]], None]] = None
+                ) -> Tuple[Dict[str, List[Dict[str, Any]]], int]:
+        """
+        Return ({email_id: events}, cache hits) for (email_id, email) pairs.
+
+        `load_bodies`, when given, is called once with the emails not in the
+        cache so their bodies are read in one batch.
+        """
+        tz = event_timezone()
+        keys = [(email_id, fields_hash(email, EVENT_FIELDS), str(tz)) for email_id, email in items]
+        if load_bodies is not None:
+            load_bodies([email for key, (_, email) in zip(keys, items) if key not in self.cache])
+        results, hits = {}, 0
+        for key, (email_id, email) in zip(keys, items):
+            events = self.cache.get(key)
+            if events is None:
+                events = extract_events(email, tz)
+                self.cache.put(key, events)
+            else:
+                hits += 1
+            results[email_id] = [dict(event) for event in events]
+        return results, hits
+
+
+_extractor = EventExtractor()
+
+
+def get_event_extractor() -> EventExtractor:
+    """Return the process-wide event extractor and its cache."""
+    return _extractor
@@ -0,0 +1,385 @@
+"""
+Gmail API provider.
+
+Replaces the host's N+1 read (one messages.list call, then one messages.get per
+message) with a list call plus Gmail batch requests: up to GMAIL_BATCH_SIZE
+messages.get calls travel in one multipart/mixed POST to /batch/gmail/v1, over
+keep-alive connections from a bounded pool. Reading 50 messages costs two
+round trips instead of 51.
+
+Point GMAIL_API_URL at a stub_server.FakeGmailServer to run without Google.
+"""
+import asyncio
+import base64
+import http.client
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.utils import parseaddr
+from typing import List, Dict, Any, Optional, Tuple
+
+from .providers import MailProvider, PROVIDER_TIMEOUT, Position
+from .records import EmailRecord
+
+GMAIL_API_URL = os.getenv("GMAIL_API_URL", "https://gmail.googleapis.com")
+# Gmail accepts up to 100 calls per batch but throttles large ones; 50 is its recommendation
+GMAIL_BATCH_SIZE = int(os.getenv("GMAIL_BATCH_SIZE", "50"))
+# Open connections per client; also the number of requests in flight at once
+GMAIL_POOL_SIZE = int(os.getenv("GMAIL_POOL_SIZE", "4"))
+GMAIL_MAX_RETRIES = int(os.getenv("GMAIL_MAX_RETRIES", "4"))
+GMAIL_BACKOFF = float(os.getenv("GMAIL_BACKOFF", "0.5"))
+GMAIL_BACKOFF_MAX = 32.0
+
+METADATA_HEADERS = ("From", "Subject", "Date")
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Exceptions meaning a kept-alive connection was closed by the server while idle
+_STALE_CONNECTION = (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                     ConnectionResetError, BrokenPipeError)
+
+# filter_type -> Gmail search query, mirroring mailbox.FILTERS
+FILTER_QUERIES = {
+    "all": "",
+    "most_recent": "",
+    "unread": "is:unread",
+    "read": "is:read",
+    "urgent": "is:important",
+    "promotional": "category:promotions",
+}
+
+
+class GmailAPIError(Exception):
+    """A Gmail call failed with a non-retryable status or ran out of retries."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Gmail API error {status}: {message}")
+        self.status = status
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP(S) connections to one host, reused across requests and threads.
+
+    At most `size` requests are in flight at once; callers beyond that wait on
+    a bounded semaphore, so one client never opens more than `size` sockets.
+    Idle connections are reused most-recently-used first.
+    """
+
+    def __init__(self, base_url: str, size: int = GMAIL_POOL_SIZE, timeout: float = PROVIDER_TIMEOUT):
+        parts = urllib.parse.urlsplit(base_url)
+        self._factory = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self._netloc = parts.netloc
+        self._timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self.opened = 0
+
+    def _connect(self) -> http.client.HTTPConnection:
+        self.opened += 1
+        return self._factory(self._netloc, timeout=self._timeout)
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """Send one request; returns (status, lower-cased headers, body)."""
+        with self._slots:
+            try:
+                conn, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                conn, reused = self._connect(), False
+            while True:
+                try:
+                    conn.request(method, path, body=body, headers=headers or {})
+                    response = conn.getresponse()
+                    data = response.read()
+                    break
+                except _STALE_CONNECTION:
+                    conn.close()
+                    if not reused:
+                        raise
+                    # The server dropped an idle connection; retry once on a fresh one
+                    conn, reused = self._connect(), False
+                except BaseException:
+                    conn.close()
+                    raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._idle.put(conn)
+            return response.status, {k.lower(): v for k, v in response.getheaders()}, data
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def multipart_boundary(content_type: str) -> str:
+    match = re.search(r'boundary="?([^";]+)"?', content_type or "")
+    if not match:
+        raise ValueError("multipart body without a boundary")
+    return match.group(1)
+
+
+def _parse_headers(block: bytes) -> Dict[str, str]:
+    headers = {}
+    for line in block.decode("utf-8", "replace").split("\r\n"):
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+def split_multipart(body: bytes, boundary: str) -> List[Tuple[Dict[str, str], bytes]]:
+    """Parts of a multipart/mixed body as (lower-cased headers, payload)."""
+    parts = []
+    for chunk in body.split(b"--" + boundary.encode())[1:]:
+        if chunk.startswith(b"--"):
+            break
+        head, _, payload = chunk.strip(b"\r\n").partition(b"\r\n\r\n")
+        parts.append((_parse_headers(head), payload))
+    return parts
+
+
+def encode_batch(requests: List[str], boundary: str) -> bytes:
+    """Multipart/mixed body carrying one `GET <path>` per part, Content-ID <itemN>."""
+    lines = []
+    for index, path in enumerate(requests):
+        lines += [f"--{boundary}", "Content-Type: application/http", f"Content-ID: <item{index}>",
+                  "", f"GET {path}", ""]
+    lines.append(f"--{boundary}--")
+    return "\r\n".join(lines).encode("utf-8")
+
+
+def decode_batch(content_type: str, body: bytes) -> Dict[int, Tuple[int, bytes]]:
+    """Responses of a batch call keyed by request index: {index: (status, body)}."""
+    responses = {}
+    for headers, payload in split_multipart(body, multipart_boundary(content_type)):
+        match = re.search(r"item(\d+)", headers.get("content-id", ""))
+        status_line, _, rest = payload.partition(b"\r\n")
+        _, _, inner = rest.partition(b"\r\n\r\n")
+        if match:
+            responses[int(match.group(1))] = (int(status_line.split()[1]), inner)
+    return responses
+
+
+class GmailClient:
+    """
+    Blocking Gmail REST client: pooled connections, batched message fetches,
+    and exponential backoff with jitter on 429/5xx (honouring Retry-After).
+    Safe to share between threads.
+    """
+
+    def __init__(self, token: str, base_url: str = GMAIL_API_URL, pool: Optional[ConnectionPool] = None,
+                 batch_size: int = GMAIL_BATCH_SIZE, max_retries: int = GMAIL_MAX_RETRIES,
+                 backoff: float = GMAIL_BACKOFF):
+        self.token = token
+        self.pool = pool or ConnectionPool(base_url)
+        self.batch_size = max(1, min(batch_size, 100))
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.round_trips = 0
+
+    def _delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return min(GMAIL_BACKOFF_MAX, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def _send(self, method: str, path: str, body: Optional[bytes] = None,
+              headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        headers = dict(headers or {}, Authorization=f"Bearer {self.token}")
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                self.round_trips += 1
+                status, response_headers, data = self.pool.request(method, path, body, headers)
+            except OSError:
+                if attempt == self.max_retries:
+                    raise
+            else:
+                if status not in _RETRY_STATUSES or attempt == self.max_retries:
+                    return status, response_headers, data
+                retry_after = response_headers.get("retry-after")
+            time.sleep(self._delay(attempt, retry_after))
+        raise AssertionError("unreachable")
+
+    def _get_json(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        query = urllib.parse.urlencode([(k, v) for k, v in params.items() if v not in (None, "")], doseq=True)
+        status, _, data = self._send("GET", f"{path}?{query}" if query else path)
+        if status >= 400:
+            raise GmailAPIError(status, data.decode("utf-8", "replace")[:200])
+        return json.loads(data or b"{}")
+
+    def list_messages(self, query: str = "", limit: int = 100,
+                      page_token: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        """One messages.list page: (message ids newest first, next page token)."""
+        payload = self._get_json("/gmail/v1/users/me/messages", {
+            "labelIds": "INBOX", "includeSpamTrash": "false", "q": query,
+            "maxResults": max(1, min(limit, 500)), "pageToken": page_token,
+        })
+        return [m["id"] for m in payload.get("messages", [])], payload.get("nextPageToken")
+
+    @staticmethod
+    def message_path(message_id: str, format: str = "metadata") -> str:
+        params = [("format", format)]
+        if format == "metadata":
+            params += [("metadataHeaders", header) for header in METADATA_HEADERS]
+        return f"/gmail/v1/users/me/messages/{urllib.parse.quote(message_id)}?{urllib.parse.urlencode(params)}"
+
+    def batch_get(self, message_ids: List[str], format: str = "metadata") -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch up to batch_size messages in one batch request.
+
+        Parts answered with 429/5xx are resent in a smaller batch after a
+        backoff; messages that fail permanently (e.g. deleted, 404) are left out.
+        """
+        if len(message_ids) > self.batch_size:
+            raise ValueError(f"batch_get takes at most {self.batch_size} ids")
+        pending = list(dict.fromkeys(message_ids))
+        messages: Dict[str, Dict[str, Any]] = {}
+        for attempt in range(self.max_retries + 1):
+            boundary = f"batch_{uuid.uuid4().hex}"
+            status, headers, data = self._send(
+                "POST", "/batch/gmail/v1",
+                encode_batch([self.message_path(i, format) for i in pending], boundary),
+                {"Content-Type": f"multipart/mixed; boundary={boundary}"},
+            )
+            if status >= 400:
+                raise GmailAPIError(status, data.decode("utf-8", "replace")[:200])
+            retry = []
+            for index, (part_status, body) in decode_batch(headers.get("content-type", ""), data).items():
+                if part_status == 200:
+                    messages[pending[index]] = json.loads(body)
+                elif part_status in _RETRY_STATUSES:
+                    retry.append(pending[index])
+            if not retry or attempt == self.max_retries:
+                break
+            pending = retry
+            time.sleep(self._delay(attempt))
+        return messages
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+def _header(message: Dict[str, Any], name: str) -> str:
+    for header in message.get("payload", {}).get("headers", []):
+        if header.get("name", "").lower() == name.lower():
+            return header.get("value", "")
+    return ""
+
+
+def _plain_text(payload: Dict[str, Any]) -> str:
+    """First text/plain body in a message payload, depth first."""
+    if payload.get("mimeType", "").startswith("text/plain") and payload.get("body", {}).get("data"):
+        data = payload["body"]["data"]
+        return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)).decode("utf-8", "replace")
+    for part in payload.get("parts", []):
+        text = _plain_text(part)
+        if text:
+            return text
+    return ""
+
+
+def message_to_record(message: Dict[str, Any], include_body: bool = False) -> EmailRecord:
+    """EmailRecord from a messages.get resource (format=metadata, or full with include_body)."""
+    sender_name, sender = parseaddr(_header(message, "From"))
+    labels = set(message.get("labelIds", []))
+    # internalDate orders the mailbox; the Date header is sender-controlled
+    received = datetime.fromtimestamp(int(message.get("internalDate", 0)) / 1000, tz=timezone.utc)
+    attachments = [part.get("filename") for part in message.get("payload", {}).get("parts", [])
+                   if part.get("filename")]
+    return EmailRecord(
+        id=message["id"],
+        sender=sender,
+        sender_name=sender_name,
+        subject=_header(message, "Subject"),
+        date=received.strftime("%Y-%m-%d %H:%M:%S"),
+        content=_plain_text(message.get("payload", {})) if include_body else None,
+        preview=message.get("snippet", ""),
+        priority="high" if "IMPORTANT" in labels else "medium",
+        category="promotional" if "CATEGORY_PROMOTIONS" in labels else "",
+        has_attachments=bool(attachments),
+        attachments=attachments,
+        unread="UNREAD" in labels,
+    )
+
+
+def _epoch(date: str) -> int:
+    return int(datetime.strptime(date, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp())
+
+
+class GmailProvider(MailProvider):
+    """
+    MailProvider backed by the Gmail API.
+
+    Keyset positions are translated to a `before:` query (Gmail dates have
+    one-second resolution), and records at or above the position are dropped
+    client side. Message details for a page are fetched as concurrent batch
+    requests, bounded by the client's connection pool.
+    """
+
+    def __init__(self, name: str, client: GmailClient):
+        super().__init__(name)
+        self.client = client
+
+    async def _get(self, message_ids: List[str], format: str) -> Dict[str, Dict[str, Any]]:
+        size = self.client.batch_size
+        chunks = [message_ids[i:i + size] for i in range(0, len(message_ids), size)]
+        results = await asyncio.gather(*(asyncio.to_thread(self.client.batch_get, chunk, format)
+                                         for chunk in chunks))
+        return {k: v for result in results for k, v in result.items()}
+
+    async def fetch_page(self, filter_type: str, limit: int, after: Position = None,
+                         include_body: bool = False) -> List[EmailRecord]:
+        if filter_type == "most_recent":
+            if after is not None:
+                return []
+            limit = 1
+        terms = [FILTER_QUERIES.get(filter_type, "")]
+        if after is not None:
+            terms.append(f"before:{_epoch(after[0]) + 1}")
+        query = " ".join(filter(None, terms))
+        records: List[EmailRecord] = []
+        page_token = None
+        while len(records) < limit:
+            message_ids, page_token = await asyncio.to_thread(
+                self.client.list_messages, query, limit - len(records), page_token
+            )
+            messages = await self._get(message_ids, "full" if include_body else "metadata")
+            for message_id in message_ids:
+                if message_id in messages:
+                    record = message_to_record(messages[message_id], include_body)
+                    if after is None or (record.date, record.id) < tuple(after):
+                        records.append(record)
+            if not page_token:
+                break
+        records.sort(key=lambda record: (record.date, record.id), reverse=True)
+        return records[:limit]
+
+    async def search(self, query: str, limit: int = 10, **filters: Any) -> List[Tuple[EmailRecord, float]]:
+        terms = [query]
+        if filters.get("sender"):
+            terms.append(f"from:{filters['sender'].lstrip('@')}")
+        if filters.get("category") == "promotional":
+            terms.append("category:promotions")
+        if filters.get("priority") == "high":
+            terms.append("is:important")
+        if filters.get("date_from"):
+            terms.append(f"after:{filters['date_from'].replace('-', '/')}")
+        if filters.get("date_to"):
+            # before: is exclusive, date_to is not
+            end = datetime.strptime(filters["date_to"], "%Y-%m-%d") + timedelta(days=1)
+            terms.append(f"before:{end.strftime('%Y/%m/%d')}")
+        message_ids, _ = await asyncio.to_thread(self.client.list_messages, " ".join(terms), limit)
+        messages = await self._get(message_ids, "metadata")
+        # Gmail returns matches in its own relevance order without scores
+        ranked = [message_to_record(messages[i]) for i in message_ids if i in messages]
+        return [(record, 1.0 / (rank + 1)) for rank, record in enumerate(ranked)]
@@ -0,0 +1,97 @@
+import hashlib
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Callable
+
+from . import state_log
+
+
+class HistoryPolicy:
+    """
+    Bounds for one session-state history.
+
+    Args:
+        capacity: Maximum number of entries kept (ring buffer); older ones are evicted
+        ttl_seconds: Entries older than this are evicted regardless of capacity
+        keep_full: Number of newest entries kept verbatim; older ones go through `compact`
+        compact: Function returning a slimmed-down copy of an entry
+    """
+
+    def __init__(self, capacity: int = 50, ttl_seconds: Optional[float] = None,
+                 keep_full: Optional[int] = None,
+                 compact: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self.keep_full = capacity if keep_full is None else keep_full
+        self.compact = compact
+
+
+def _empty_history() -> Dict[str, Any]:
+    # "evicted" summarizes everything dropped so the history still reports totals
+    return {"entries": [], "evicted": {"count": 0, "first": None, "last": None}}
+
+
+def get_history(state, key: str) -> Dict[str, Any]:
+    """Return the stored history for `key`, upgrading the old plain-list format."""
+    history = state_log.load(state, key)
+    if history is None:
+        return _empty_history()
+    if isinstance(history, list):
+        upgraded = _empty_history()
+        upgraded["entries"] = list(history)
+        return upgraded
+    return {"entries": list(history["entries"]), "evicted": dict(history["evicted"])}
+
+
+def history_entries(state, key: str) -> List[Dict[str, Any]]:
+    """Return the retained entries of a history, oldest first."""
+    return get_history(state, key)["entries"]
+
+
+def _enforce(history: Dict[str, Any], policy: HistoryPolicy, now: datetime) -> Dict[str, Any]:
+    """Apply the policy's capacity, TTL and compaction to a history, returning a new one."""
+    retained = list(history["entries"])
+    evicted = dict(history["evicted"])
+    drop = max(0, len(retained) - policy.capacity)
+    if policy.ttl_seconds is not None:
+        cutoff = (now - timedelta(seconds=policy.ttl_seconds)).isoformat()
+        # Entries carried over from the old list format may lack a timestamp
+        while drop < len(retained) and retained[drop].get("timestamp", "") < cutoff:
+            drop += 1
+    if drop:
+        evicted["count"] += drop
+        evicted["first"] = evicted["first"] or retained[0].get("timestamp")
+        evicted["last"] = retained[drop - 1].get("timestamp")
+        del retained[:drop]
+
+    if policy.compact is not None:
+        for i in range(len(retained) - policy.keep_full):
+            if not retained[i].get("compacted"):
+                retained[i] = dict(policy.compact(retained[i]), compacted=True)
+    return {"entries": retained, "evicted": evicted}
+
+
+def append_history(state, key: str, entries: List[Dict[str, Any]], policy: HistoryPolicy,
+                   now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Append entries to a bounded history in session state.
+
+    Only the new entries are written (see state_log); the policy is applied
+    to the stored history each time it is snapshotted, so between snapshots
+    it may hold up to STATE_SNAPSHOT_EVERY entries beyond its bounds.
+    Entries are expected to carry an ISO "timestamp"; one is added when missing.
+    Returns the history with the policy applied.
+    """
+    now = now or datetime.now()
+    for entry in entries:
+        entry.setdefault("timestamp", now.isoformat())
+    if not isinstance(state.get(key), dict):
+        # Start the log from a snapshot in the current format
+        state_log.snapshot(state, key, _enforce(get_history(state, key), policy, now))
+    history = state_log.append(state, key, entries, path=("entries",),
+                               fold=lambda current: _enforce(current, policy, now))
+    return _enforce(history, policy, now)
+
+
+def content_digest(text: str) -> str:
+    """Short stable digest used to reference payloads that are no longer stored."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,495 @@
+"""
+Offline load test of the agents' root_agent under many concurrent sessions.
+
+Run from the repository root:
+
+    python -m email_agent_example.loadtest --sessions 50 --turns 40
+    python -m email_agent_example.loadtest --agent email_agent_example --sessions 20 --model-latency 0.4
+    python -m email_agent_example.loadtest --sessions 100 --session-db sqlite:///load.db --output load.json
+
+Every session is driven through the same ADK Runner and session service that
+`adk api_server` builds, with ScriptedModel in place of gemini-2.0-flash: it
+answers the scripted read, compose and calendar flows with the tool calls and
+host-action JSON the instructions ask the real model for, after
+--model-latency seconds. The Google APIs are a stub_server.FakeGoogleServer
+over a synthetic mailbox, so nothing leaves the machine. The report holds
+p50/p95/p99 turn latency overall and per flow, throughput, and how session
+state and event history grow per turn; the exit status is 1 when any turn
+failed or --p95-budget was exceeded.
+"""
+import argparse
+import asyncio
+import importlib
+import itertools
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable, Tuple, Union
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import DatabaseSessionService, InMemorySessionService
+from google.genai import types
+
+from .benchmarks import REPO_ROOT, SEED, _percentile, build_mailbox
+from .stub_server import FakeGoogleServer
+
+AGENTS = ("email_agent", "email_agent_example")
+USER_ID = "load-test"
+
+Arguments = Union[Dict[str, Any], Callable[[Dict[str, Any]], Dict[str, Any]]]
+Reply = Union[str, Callable[[Dict[str, Any], str], str]]
+
+
+def _fill(value: Any, n: str) -> Any:
+    if isinstance(value, str):
+        return value.replace("{n}", n)
+    if isinstance(value, list):
+        return [_fill(item, n) for item in value]
+    if isinstance(value, dict):
+        return {key: _fill(item, n) for key, item in value.items()}
+    return value
+
+
+class Turn:
+    """
+    One scripted user message and the model's answer to it.
+
+    text:  the user message; "{n}" stands for a number unique to each run of the flow
+    calls: rounds of tool calls, each a list of (tool name, arguments); arguments are a
+           dict or a function of the latest response of every tool in the session
+    reply: the final text, or a function of (latest responses, n) returning it
+    "{n}" in arguments and replies is filled in with the same number.
+    """
+
+    def __init__(self, text: str, calls: Optional[List[List[Tuple[str, Arguments]]]] = None, reply: Reply = ""):
+        self.text = text
+        self.calls = calls or []
+        self.reply = reply
+        self.pattern = re.compile(re.escape(text).replace(re.escape("{n}"), r"(?P<n>\d+)") + "$")
+
+    def answer(self, round_: int, responses: Dict[str, Any], n: str) -> List[types.Part]:
+        if round_ < len(self.calls):
+            return [types.Part(function_call=types.FunctionCall(
+                name=tool, args=_fill(arguments(responses) if callable(arguments) else arguments, n)
+            )) for tool, arguments in self.calls[round_]]
+        text = self.reply(responses, n) if callable(self.reply) else _fill(self.reply, n)
+        return [types.Part(text=text)]
+
+
+def _action_turn(text: str, action: Dict[str, Any]) -> Turn:
+    """A turn answered with one host app action, run through run_actions."""
+
+    def reply(responses: Dict[str, Any], n: str) -> str:
+        response = responses.get("run_actions") or {}
+        if response.get("status") == "unavailable":
+            # No token on the server: the instruction says to emit the action JSON alone
+            return _fill(json.dumps(action), n)
+        failed = [result for result in response.get("results", []) if not result.get("ok")]
+        if failed or response.get("status") == "error":
+            return f"That did not work: {failed[0]['error'] if failed else response.get('message')}"
+        return f"Done: {', '.join(result['action'] for result in response['results'])}."
+
+    return Turn(text, [[("run_actions", {"actions": json.dumps(action)})]], reply)
+
+
+_RECIPIENT = "alex.morgan@example.com"
+_TEAM = [f"teammate{i:02d}@example.com" for i in range(20)]
+
+
+def _email_ids(tool: str) -> Callable[[Dict[str, Any]], List[str]]:
+    return lambda responses: [email["id"] for email in (responses.get(tool) or {}).get("emails", [])]
+
+
+# Scripted conversations per agent; sessions run them in turn
+FLOWS: Dict[str, Dict[str, List[Turn]]] = {
+    "email_agent": {
+        "read": [
+            _action_turn("Show me my unread emails",
+                         {"action": "READ_EMAILS", "platform": "gmail", "filter": "unread"}),
+            _action_turn("What's the most recent one?",
+                         {"action": "READ_EMAILS", "platform": "gmail", "filter": "most_recent"}),
+            Turn("Summarize the first one", reply="It asks for your feedback on the Q4 report by Friday."),
+            _action_turn("Reply to email_0000001 saying I'll review it today (load test {n})",
+                         {"action": "REPLY_EMAIL", "threadId": "email_0000001",
+                          "content": "Thanks, I'll review it today. (load test {n})"}),
+        ],
+        "compose": [
+            Turn(f"Draft an email to {_RECIPIENT}", reply="What should the subject be?"),
+            Turn("Subject: Load test {n}", reply="What should it say?"),
+            Turn("Tell Alex the results of load test {n} are ready for review",
+                 reply=f"To: {_RECIPIENT}\nSubject: Load test {{n}}\nTone: professional\n---\nHi Alex,\n\n"
+                       "The results of load test {n} are ready for your review.\n\nBest regards\n\nSend now?"),
+            _action_turn("Yes, send the load test {n} email",
+                         {"action": "SEND_EMAIL", "recipient": _RECIPIENT, "subject": "Load test {n}",
+                          "content": "Hi Alex,\n\nThe results of load test {n} are ready for your review."
+                                     "\n\nBest regards", "tone": "professional"}),
+        ],
+        "calendar": [
+            _action_turn("What's on my calendar the week of June 3rd?",
+                         {"action": "LIST_EVENTS", "timeMin": "2024-06-03T00:00:00Z",
+                          "timeMax": "2024-06-10T00:00:00Z"}),
+            _action_turn(f"Add load test sync {{n}} on June 5th, 10:00 to 10:30, with {_RECIPIENT}",
+                         {"action": "CREATE_EVENT", "title": "Load test sync {n}",
+                          "start": "2024-06-05T10:00:00Z", "end": "2024-06-05T10:30:00Z",
+                          "attendees": [_RECIPIENT], "description": "Review of load test {n}"}),
+            _action_turn("Remind me to prepare the agenda for sync {n}",
+                         {"action": "CREATE_TASK", "title": "Prepare the agenda for sync {n}"}),
+            _action_turn("What's on my task list?",
+                         {"action": "LIST_TASKS", "maxResults": 10, "showCompleted": False}),
+        ],
+    },
+    "email_agent_example": {
+        "read": [
+            Turn("Show me my unread emails",
+                 [[("read_emails", {"platform": "gmail", "filter_type": "unread", "limit": 10})]],
+                 "Here are your ten most recent unread emails."),
+            Turn("Show me more",
+                 [[("read_emails", lambda responses: {
+                     "platform": "gmail", "filter_type": "unread", "limit": 10,
+                     "cursor": (responses.get("read_emails") or {}).get("next_cursor")})]],
+                 "Here are the next ten."),
+            Turn("Summarize the urgent ones",
+                 [[("read_emails", {"platform": "gmail", "filter_type": "urgent", "limit": 10})],
+                  [("summarize_emails", lambda responses: {"email_ids": _email_ids("read_emails")(responses)})]],
+                 "Most of the urgent emails ask for feedback or approval before a deadline."),
+        ],
+        "compose": [
+            Turn(f"Draft an email to {_RECIPIENT} about load test {{n}}", reply="What should it say?"),
+            Turn("Say the results of load test {n} are ready for review",
+                 [[("draft_email", {"recipient": _RECIPIENT, "subject": "Load test {n}",
+                                    "content": "The results of load test {n} are ready for review."})]],
+                 "Here is the draft. Would you like any changes?"),
+            Turn("Send the same note about load test {n} to the whole team",
+                 [[("draft_bulk_emails", {"subject": "Load test {n}", "recipients": _TEAM,
+                                          "content": "Hi {first_name}, the results of load test {n} "
+                                                     "are ready for review."})],
+                  [("get_draft_batch", lambda responses: {
+                      "batch_id": (responses.get("draft_bulk_emails") or {}).get("batch_id", ""), "limit": 5})]],
+                 "I drafted the note for all 20 teammates; here are the first five."),
+        ],
+        "calendar": [
+            Turn("When are my meetings?",
+                 [[("search_emails", {"query": "meeting", "platform": "gmail", "limit": 10})],
+                  [("summarize_emails", lambda responses: {
+                      "email_ids": _email_ids("search_emails")(responses),
+                      "fields": ["subject", "sender", "deadlines"]})]],
+                 "You have meetings about the budget review and the product launch."),
+            Turn("Find the call about the project timeline",
+                 [[("search_emails", {"query": "call project timeline", "platform": "gmail", "limit": 5})]],
+                 "Sarah suggested a call tomorrow at 3pm about the project timeline."),
+        ],
+    },
+}
+
+
+class ScriptedModel(BaseLlm):
+    """
+    Deterministic stand-in for the Gemini model, answering from scripted turns.
+
+    The user message that started the current turn picks the Turn; the number
+    of tool-call rounds the model has made since then picks the step. Nothing
+    is kept between requests, so one instance serves every session.
+    """
+
+    model: str = "scripted-gemini-2.0-flash"
+    turns: List[Any] = []
+    latency: float = 0.0
+    calls: int = 0
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        text, round_, responses = _conversation(llm_request.contents)
+        for turn in self.turns:
+            match = turn.pattern.match(text)
+            if match:
+                n = match.groupdict().get("n") or "0"
+                yield LlmResponse(content=types.Content(role="model", parts=turn.answer(round_, responses, n)))
+                return
+        raise ValueError(f"No scripted turn for {text!r}")
+
+
+def _conversation(contents: List[types.Content]) -> Tuple[str, int, Dict[str, Any]]:
+    """(latest user message, tool-call rounds since it, latest response of every tool)."""
+    responses: Dict[str, Any] = {}
+    for content in contents:
+        for part in content.parts or ():
+            if part.function_response:
+                responses[part.function_response.name] = part.function_response.response
+    round_ = 0
+    for content in reversed(contents):
+        parts = content.parts or ()
+        if content.role == "user" and any(part.text for part in parts):
+            return "".join(part.text for part in parts if part.text), round_, responses
+        if content.role == "model" and any(part.function_call for part in parts):
+            round_ += 1
+    return "", round_, responses
+
+
+def _import_agent(name: str):
+    if name == "email_agent":
+        # The host-action agent lives in its own project folder
+        path = os.path.join(REPO_ROOT, "adk-email-agent")
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    return importlib.import_module(name)
+
+
+def _size(value: Any) -> int:
+    return len(json.dumps(value, separators=(",", ":"), default=str))
+
+
+class LoadTest:
+    """
+    N concurrent sessions of one agent against a fake Google backend.
+
+    Each session cycles through `flows`, starting at a different one, for
+    `turns` turns. Latencies are measured around Runner.run_async for one user
+    message, including every model and tool call it triggers; session state
+    is sampled after every flow.
+    """
+
+    def __init__(self, agent_name: str = "email_agent", sessions: int = 10, turns: int = 20,
+                 flows: Optional[List[str]] = None, model_latency: float = 0.0, backend_latency: float = 0.0,
+                 mailbox_size: int = 1000, session_db: Optional[str] = None, server_actions: bool = True,
+                 seed: int = SEED):
+        self.agent_name = agent_name
+        self.sessions = sessions
+        self.turns = turns
+        self.flows = {name: FLOWS[agent_name][name] for name in (flows or FLOWS[agent_name])}
+        self.model = ScriptedModel(turns=[turn for flow in FLOWS[agent_name].values() for turn in flow],
+                                   latency=model_latency)
+        self.mailbox = build_mailbox(mailbox_size, seed)
+        self.server = FakeGoogleServer(self.mailbox, latency=backend_latency)
+        self.session_service = DatabaseSessionService(db_url=session_db) if session_db else InMemorySessionService()
+        self.server_actions = server_actions
+        self._parse_actions: Optional[Callable[[str], List[Dict[str, Any]]]] = None
+        self._set_session_token: Optional[Callable[[str, Optional[str]], None]] = None
+        self._runs = itertools.count(1)
+        self.latencies: Dict[str, List[float]] = {name: [] for name in self.flows}
+        self.errors: List[str] = []
+        self.tool_calls = 0
+        self.action_results = 0
+        self.action_failures: List[str] = []
+        self.emitted_actions = 0
+        self.state_samples: List[Tuple[int, int]] = []
+        self.sessions_report: List[Dict[str, Any]] = []
+
+    def _build_runner(self) -> Runner:
+        package = _import_agent(self.agent_name)
+        if self.agent_name == "email_agent":
+            actions = importlib.import_module("email_agent.actions")
+            actions.GOOGLE_API_BASE_URL = self.server.url
+            self._parse_actions = actions.parse_actions
+            self._set_session_token = actions.set_session_token
+            if not self.server_actions:
+                # run_actions falls back to this; without it the agent must emit the JSON
+                os.environ.pop("GOOGLE_ACCESS_TOKEN", None)
+        else:
+            from .gmail import GmailClient, GmailProvider
+            from .mailbox import set_mailbox
+            from .providers import register_provider
+            # Reads go through the Gmail provider to the fake server; summaries read the same mailbox locally
+            set_mailbox(self.mailbox)
+            register_provider(GmailProvider("gmail", GmailClient("load-test", base_url=self.server.url)))
+        agent = package.root_agent.model_copy(update={"model": self.model})
+        return Runner(app_name=self.agent_name, agent=agent, session_service=self.session_service)
+
+    def _share_token(self, session_id: str, index: int) -> None:
+        if self.agent_name == "email_agent" and self.server_actions:
+            # One token per session, as for separate users: each gets its own action executor.
+            # The host hands it over per request, outside session state.
+            self._set_session_token(session_id, f"load-test-{index}")
+
+    def _session(self, session_id: str):
+        return self.session_service.get_session(app_name=self.agent_name, user_id=USER_ID, session_id=session_id)
+
+    async def _turn(self, runner: Runner, session_id: str, text: str) -> Optional[str]:
+        message = types.Content(role="user", parts=[types.Part(text=text)])
+        final = None
+        async for event in runner.run_async(user_id=USER_ID, session_id=session_id, new_message=message):
+            self.tool_calls += len(event.get_function_calls())
+            for response in event.get_function_responses():
+                results = (response.response or {}).get("results")
+                if response.name == "run_actions" and results:
+                    self.action_results += len(results)
+                    self.action_failures += [f"{result['action']}: {result['error']}"
+                                             for result in results if not result.get("ok")]
+            if event.is_final_response() and event.content and event.content.parts:
+                final = "".join(part.text or "" for part in event.content.parts)
+        return final
+
+    async def _drive(self, runner: Runner, index: int) -> None:
+        session_id = f"load-test-{index}"
+        session = self.session_service.create_session(app_name=self.agent_name, user_id=USER_ID,
+                                                      state={}, session_id=session_id)
+        self._share_token(session_id, index)
+        initial = _size(session.state)
+        names = list(self.flows)
+        done = 0
+        for flow_index in itertools.count(index):
+            name = names[flow_index % len(names)]
+            n = str(next(self._runs))
+            for turn in self.flows[name][:self.turns - done]:
+                text = _fill(turn.text, n)
+                started = time.perf_counter()
+                try:
+                    final = await self._turn(runner, session_id, text)
+                except Exception as e:
+                    final = None
+                    self.errors.append(f"{session_id} {text!r}: {type(e).__name__}: {e}")
+                else:
+                    if not final:
+                        self.errors.append(f"{session_id} {text!r}: no final response")
+                self.latencies[name].append((time.perf_counter() - started) * 1000)
+                if final and self.agent_name == "email_agent":
+                    self.emitted_actions += len(self._parse_actions(final))
+                done += 1
+            self.state_samples.append((done, _size(self._session(session_id).state)))
+            if done >= self.turns:
+                break
+        session = self._session(session_id)
+        self.sessions_report.append({
+            "initial_state_bytes": initial,
+            "state_bytes": _size(session.state),
+            "events": len(session.events),
+            "event_bytes": sum(len(event.model_dump_json(exclude_none=True)) for event in session.events),
+        })
+
+    async def run(self) -> Dict[str, Any]:
+        """Run every session to completion and return the report."""
+        runner = self._build_runner()
+        with self.server:
+            started = time.perf_counter()
+            await asyncio.gather(*(self._drive(runner, index) for index in range(self.sessions)))
+            wall = time.perf_counter() - started
+            backend = {"requests": self.server.requests, "emails_sent": len(self.server.sent),
+                       "events": len(self.server.events), "tasks": len(self.server.tasks)}
+        return self._report(wall, backend)
+
+    def _report(self, wall: float, backend: Dict[str, Any]) -> Dict[str, Any]:
+        every = [value for values in self.latencies.values() for value in values]
+        sessions = self.sessions_report
+        growth: Dict[int, List[int]] = {}
+        for done, size in self.state_samples:
+            growth.setdefault(done, []).append(size)
+        state_bytes = [s["state_bytes"] for s in sessions] or [0]
+        report = {
+            "turns": dict(_latency_summary(every), errors=len(self.errors)),
+            "flows": {name: _latency_summary(values) for name, values in self.latencies.items() if values},
+            "throughput": {
+                "wall_s": round(wall, 3),
+                "turns_per_s": round(len(every) / wall, 2) if wall else 0.0,
+                "model_calls": self.model.calls,
+                "tool_calls": self.tool_calls,
+            },
+            "state": {
+                "initial_bytes": round(statistics.fmean(s["initial_state_bytes"] for s in sessions), 1)
+                if sessions else 0,
+                "final_bytes_mean": round(statistics.fmean(state_bytes), 1),
+                "final_bytes_max": max(state_bytes),
+                "bytes_per_turn": round(statistics.fmean(
+                    (s["state_bytes"] - s["initial_state_bytes"]) / max(self.turns, 1) for s in sessions), 1
+                ) if sessions else 0.0,
+                "events_per_session": round(statistics.fmean(s["events"] for s in sessions), 1) if sessions else 0,
+                "event_bytes_mean": round(statistics.fmean(s["event_bytes"] for s in sessions), 1) if sessions else 0,
+                # Mean state size of the sessions that had completed this many turns
+                "growth": [{"turns": done, "state_bytes": round(statistics.fmean(sizes), 1)}
+                           for done, sizes in sorted(growth.items())],
+            },
+            "backend": backend,
+            "errors": self.errors[:20],
+        }
+        if self.agent_name == "email_agent":
+            report["actions"] = {"executed": self.action_results, "failed": len(self.action_failures),
+                                 "emitted": self.emitted_actions, "failures": self.action_failures[:20]}
+        return report
+
+
+def _latency_summary(values: List[float]) -> Dict[str, Any]:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50_ms": round(_percentile(values, 0.50), 3),
+        "p95_ms": round(_percentile(values, 0.95), 3),
+        "p99_ms": round(_percentile(values, 0.99), 3),
+        "mean_ms": round(statistics.fmean(values), 3),
+        "max_ms": round(max(values), 3),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agent", choices=AGENTS, default="email_agent")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent sessions")
+    parser.add_argument("--turns", type=int, default=20, help="User messages per session")
+    parser.add_argument("--flows", nargs="+", help="Flows to run (default: all of the agent's)")
+    parser.add_argument("--model-latency", type=float, default=0.0, help="Seconds the stub model takes per call")
+    parser.add_argument("--backend-latency", type=float, default=0.0, help="Seconds added to every Google API call")
+    parser.add_argument("--mailbox-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--session-db", help="Database URL for DatabaseSessionService (default: in memory)")
+    parser.add_argument("--host-actions", action="store_true",
+                        help="Give sessions no Google token, so email_agent emits actions for the host app")
+    parser.add_argument("--p95-budget", type=float, help="Fail when the p95 turn latency exceeds this many ms")
+    parser.add_argument("--output", help="Write the report as JSON to this file (default: stdout)")
+    args = parser.parse_args(argv)
+    unknown = set(args.flows or ()) - set(FLOWS[args.agent])
+    if unknown:
+        parser.error(f"unknown flows for {args.agent}: {', '.join(sorted(unknown))}")
+
+    test = LoadTest(args.agent, args.sessions, args.turns, args.flows, args.model_latency, args.backend_latency,
+                    args.mailbox_size, args.session_db, not args.host_actions, args.seed)
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "agent": args.agent,
+            "sessions": args.sessions,
+            "turns": args.turns,
+            "flows": list(test.flows),
+            "model_latency": args.model_latency,
+            "backend_latency": args.backend_latency,
+            "mailbox_size": args.mailbox_size,
+            "session_db": args.session_db or "memory",
+            "server_actions": not args.host_actions,
+        },
+    }
+    report.update(asyncio.run(test.run()))
+
+    turns = report["turns"]
+    print(f"  {args.agent}: {turns['count']} turns in {report['throughput']['wall_s']} s "
+          f"({report['throughput']['turns_per_s']}/s), p50 {turns.get('p50_ms')} ms, "
+          f"p95 {turns.get('p95_ms')} ms, p99 {turns.get('p99_ms')} ms, {turns['errors']} errors; "
+          f"state {report['state']['final_bytes_mean']} B/session (+{report['state']['bytes_per_turn']} B/turn)",
+          file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    failed = bool(turns["errors"])
+    for line in report["errors"]:
+        print(f"ERROR {line}", file=sys.stderr)
+    if args.p95_budget is not None and turns.get("p95_ms", 0) > args.p95_budget:
+        print(f"OVER BUDGET p95 {turns['p95_ms']:.3f} ms > {args.p95_budget:.3f} ms", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,487 @@
+import base64
+import json
+import os
+import sqlite3
+import threading
+from itertools import islice
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple, Callable
+
+from .records import EmailBatch, EmailRecord, body_hash, make_preview
+from .search_index import SearchIndex
+
+
+# Records the agent ships with so a fresh local store has something to serve
+SAMPLE_EMAILS = [
+    {
+        "id": "email_001",
+        "sender": "john.doe@company.com",
+        "sender_name": "John Doe",
+        "subject": "Q4 Project Update - Urgent Review Required",
+        "date": "2024-01-15 09:30:00",
+        "content": "Hi team, I need your review of the Q4 project deliverables by EOD today. The client meeting is scheduled for tomorrow morning and we need to ensure all materials are ready. Please prioritize this as it's critical for our quarterly review.",
+        "priority": "high",
+        "category": "urgent",
+        "has_attachments": True,
+        "attachments": ["Q4_Report.pdf", "Project_Timeline.xlsx"],
+        "requires_response": True,
+        "deadline": "2024-01-15 17:00:00"
+    },
+    {
+        "id": "email_002",
+        "sender": "newsletter@techcompany.com",
+        "sender_name": "Tech Weekly Newsletter",
+        "subject": "This Week in AI: Latest Developments",
+        "date": "2024-01-15 08:15:00",
+        "content": "This week's top AI news: New developments in machine learning, breakthrough in natural language processing, and upcoming AI conferences. Read more about the latest trends and innovations in artificial intelligence.",
+        "priority": "low",
+        "category": "promotional",
+        "has_attachments": False,
+        "attachments": [],
+        "requires_response": False,
+        "deadline": None
+    },
+    {
+        "id": "email_003",
+        "sender": "sarah.wilson@client.com",
+        "sender_name": "Sarah Wilson",
+        "subject": "Follow-up: Contract Discussion",
+        "date": "2024-01-14 16:45:00",
+        "content": "Hi, I wanted to follow up on our contract discussion from last week. I'm still interested in moving forward with the project and would like to schedule a call to discuss the next steps. When would be a good time for you?",
+        "priority": "medium",
+        "category": "follow-up",
+        "has_attachments": False,
+        "attachments": [],
+        "requires_response": True,
+        "deadline": "2024-01-17 17:00:00"
+    }
+]
+
+
+class MailboxBackend:
+    """
+    Interface for the stores that serve email records to the agent tools.
+
+    Records are returned as EmailRecord (or an EmailBatch for result sets) with
+    headers and a preview; bodies are loaded by id on first access to `content`
+    unless requested up front. Writes accept records or plain dicts. Listeners registered with add_listener
+    are called as listener(event, payload) after each write: ("added", [email, ...])
+    and ("replied", [email_id, ...]).
+    """
+
+    def __init__(self):
+        self._listeners: List[Callable[[str, List[Any]], None]] = []
+
+    def add_listener(self, listener: Callable[[str, List[Any]], None]) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, List[Any]], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, event: str, payload: List[Any]) -> None:
+        for listener in list(self._listeners):
+            listener(event, payload)
+
+    def add_emails(self, emails: Iterable[Any]) -> int:
+        """Insert or replace email records. Returns the number written."""
+        raise NotImplementedError
+
+    def get_emails(self, email_ids: List[str], include_body: bool = False) -> Dict[str, EmailRecord]:
+        """Fetch records by id, with bodies preloaded if `include_body`. Unknown ids are omitted."""
+        raise NotImplementedError
+
+    def get_bodies(self, email_ids: List[str]) -> Dict[str, str]:
+        """Fetch message bodies by id. Unknown ids are omitted from the result."""
+        raise NotImplementedError
+
+    def load_bodies(self, emails: Iterable[Any]) -> None:
+        """Load the bodies of records read without them, with one get_bodies() call for all of them."""
+        pending = [email for email in emails if not getattr(email, "body_loaded", True)]
+        if pending:
+            bodies = self.get_bodies([email.id for email in pending])
+            for email in pending:
+                email.content = bodies.get(email.id, "")
+
+    def filter_emails(self, filter_type: str = "all") -> EmailBatch:
+        """Return records matching a read_emails filter, newest first."""
+        raise NotImplementedError
+
+    def iter_emails(self, filter_type: str = "all", after: Optional[Tuple[str, str]] = None,
+                    batch_size: int = 100) -> Iterator[EmailRecord]:
+        """
+        Stream records matching a filter, newest first, without materializing the result.
+
+        `after` is the (date, id) of the last record already seen; streaming resumes
+        strictly after it.
+        """
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Total number of stored records."""
+        raise NotImplementedError
+
+    def mark_replied(self, email_ids: List[str]) -> int:
+        """Record that the user replied, clearing requires_response. Returns rows changed."""
+        raise NotImplementedError
+
+    def iter_pending_replies(self) -> Iterator[EmailRecord]:
+        """Stream every record that still requires a response, without its body."""
+        raise NotImplementedError
+
+    def search(self, query: str, sender: Optional[str] = None, category: Optional[str] = None,
+               priority: Optional[str] = None, date_from: Optional[str] = None,
+               date_to: Optional[str] = None, limit: int = 10) -> List[Tuple[EmailRecord, float]]:
+        """Full-text search over subject, sender and body: (record, score) pairs, best match first."""
+        raise NotImplementedError
+
+    def get_email(self, email_id: str, include_body: bool = False) -> Optional[EmailRecord]:
+        return self.get_emails([email_id], include_body).get(email_id)
+
+    def get_body(self, email_id: str) -> Optional[str]:
+        return self.get_bodies([email_id]).get(email_id)
+
+    def page_emails(self, filter_type: str = "all", limit: int = 5,
+                    cursor: Optional[str] = None) -> Tuple[EmailBatch, Optional[str]]:
+        """
+        Return one page of a filter plus the cursor for the next page (None when exhausted).
+
+        Raises:
+            ValueError: If the cursor is malformed or was issued for another filter.
+        """
+        after = decode_cursor(cursor, filter_type) if cursor else None
+        _, _, filter_limit = FILTERS.get(filter_type, FILTERS["all"])
+        if filter_limit:
+            limit = min(limit, filter_limit)
+        # Read one record past the page to know whether a continuation exists
+        page = EmailBatch(islice(self.iter_emails(filter_type, after, batch_size=limit + 1), limit + 1))
+        if len(page) <= limit:
+            return page, None
+        page = page[:limit]
+        return page, encode_cursor(filter_type, page[len(page) - 1])
+
+
+# filter_type -> (WHERE clause, parameters, row limit). Every clause is served
+# by one of the secondary indexes created in SQLiteMailbox._SCHEMA.
+FILTERS = {
+    "all": ("", (), None),
+    "most_recent": ("", (), 1),
+    "unread": ("WHERE unread = ?", (1,), None),
+    "read": ("WHERE unread = ?", (0,), None),
+    "urgent": ("WHERE priority = ?", ("high",), None),
+    "promotional": ("WHERE category = ?", ("promotional",), None),
+}
+
+# Columns of the header table; bodies live in email_bodies
+_COLUMNS = (
+    "id", "sender", "sender_name", "subject", "date", "preview", "body_hash", "priority",
+    "category", "has_attachments", "attachments", "requires_response", "deadline", "unread",
+)
+
+# A change to any of these means the search index entry must be rebuilt
+_TEXT_COLUMNS = ("subject", "sender", "sender_name", "body_hash")
+
+# Bytes of the database file SQLite may memory-map (file-backed stores only)
+MMAP_SIZE = int(os.getenv("EMAIL_MAILBOX_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Upper bound on ids bound into one IN (...) query
+_MAX_PARAMS = 500
+
+
+def _chunks(items: List[Any], size: int = _MAX_PARAMS) -> Iterator[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class SQLiteMailbox(MailboxBackend):
+    """
+    Local mailbox backed by SQLite with secondary indexes for every filter.
+
+    Headers and a short preview live in `emails`; bodies are kept apart in
+    `email_bodies`, so listing, filtering and paging never read or copy a body.
+    File-backed stores memory-map the database, so bodies fetched by id are
+    served from the page cache without extra copies through read().
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS emails (
+            id TEXT PRIMARY KEY,
+            sender TEXT NOT NULL,
+            sender_name TEXT,
+            subject TEXT,
+            date TEXT NOT NULL,
+            preview TEXT NOT NULL DEFAULT '',
+            body_hash TEXT,
+            priority TEXT,
+            category TEXT,
+            has_attachments INTEGER NOT NULL DEFAULT 0,
+            attachments TEXT NOT NULL DEFAULT '[]',
+            requires_response INTEGER NOT NULL DEFAULT 0,
+            deadline TEXT,
+            unread INTEGER NOT NULL DEFAULT 1
+        );
+        CREATE TABLE IF NOT EXISTS email_bodies (
+            id TEXT PRIMARY KEY,
+            content TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_emails_date ON emails (date, id);
+        CREATE INDEX IF NOT EXISTS idx_emails_unread ON emails (unread, date, id);
+        CREATE INDEX IF NOT EXISTS idx_emails_priority ON emails (priority, date, id);
+        CREATE INDEX IF NOT EXISTS idx_emails_category ON emails (category, date, id);
+        CREATE INDEX IF NOT EXISTS idx_emails_sender ON emails (sender, date, id);
+        CREATE INDEX IF NOT EXISTS idx_emails_pending ON emails (requires_response, deadline);
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        super().__init__()
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(f"PRAGMA mmap_size={int(MMAP_SIZE)}")
+        self._conn.executescript(self._SCHEMA)
+        self.search_index = SearchIndex(self._conn, self._lock)
+
+    def _select(self, sql: str, ids: List[str]) -> List[sqlite3.Row]:
+        # Runs `sql` (with one "{}" for the id placeholders) over ids in chunks; caller holds the lock
+        rows = []
+        for chunk in _chunks(ids):
+            rows.extend(self._conn.execute(sql.format(", ".join("?" for _ in chunk)), chunk))
+        return rows
+
+    def add_emails(self, emails: Iterable[Any]) -> int:
+        emails = list(emails)
+        latest: Dict[str, Tuple[tuple, str]] = {}
+        for email in emails:
+            row, content = _to_row(email)
+            latest[row[0]] = (row, content)
+        ids = list(latest)
+        placeholders = ", ".join("?" for _ in _COLUMNS)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in _COLUMNS[1:])
+        with self._lock, self._conn:
+            current = {row["id"]: row for row in self._select(
+                "SELECT rowid, id, subject, sender, sender_name, body_hash FROM emails WHERE id IN ({})", ids
+            )}
+            # Only records whose indexed text changed are reindexed; their old body is
+            # read solely to remove it from the index.
+            changed = [email_id for email_id, (row, _) in latest.items()
+                       if email_id not in current
+                       or tuple(current[email_id][column] for column in _TEXT_COLUMNS)
+                       != tuple(row[_COLUMNS.index(column)] for column in _TEXT_COLUMNS)]
+            stale = [current[email_id] for email_id in changed if email_id in current]
+            if stale:
+                old_bodies = {row["id"]: row["content"] for row in self._select(
+                    "SELECT id, content FROM email_bodies WHERE id IN ({})", [row["id"] for row in stale]
+                )}
+                self.search_index.remove([
+                    (row["rowid"], row["subject"], row["sender"], row["sender_name"], old_bodies.get(row["id"], ""))
+                    for row in stale
+                ])
+
+            self._conn.executemany(
+                f"INSERT INTO emails ({', '.join(_COLUMNS)}) VALUES ({placeholders}) "
+                f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                [row for row, _ in latest.values()],
+            )
+            self._conn.executemany(
+                "INSERT INTO email_bodies (id, content) VALUES (?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET content = excluded.content",
+                [(email_id, latest[email_id][1]) for email_id in changed],
+            )
+            rowids = {row["id"]: row["rowid"] for row in self._select(
+                "SELECT rowid, id FROM emails WHERE id IN ({})", changed
+            )}
+            documents = []
+            for email_id in changed:
+                row, content = latest[email_id]
+                documents.append((rowids[email_id], row[_COLUMNS.index("subject")],
+                                  row[_COLUMNS.index("sender")], row[_COLUMNS.index("sender_name")], content))
+            self.search_index.add(documents)
+        self._notify("added", emails)
+        return len(emails)
+
+    def get_emails(self, email_ids: List[str], include_body: bool = False) -> Dict[str, EmailRecord]:
+        if not email_ids:
+            return {}
+        if include_body:
+            sql = "SELECT e.*, b.content FROM emails e LEFT JOIN email_bodies b ON b.id = e.id WHERE e.id IN ({})"
+        else:
+            sql = "SELECT * FROM emails WHERE id IN ({})"
+        with self._lock:
+            rows = self._select(sql, list(email_ids))
+        return {row["id"]: self._record(row) for row in rows}
+
+    def get_bodies(self, email_ids: List[str]) -> Dict[str, str]:
+        with self._lock:
+            rows = self._select("SELECT id, content FROM email_bodies WHERE id IN ({})", list(email_ids))
+        return {row["id"]: row["content"] for row in rows}
+
+    def _record(self, row: sqlite3.Row) -> EmailRecord:
+        return _from_row(row, loader=self.get_bodies)
+
+    def filter_emails(self, filter_type: str = "all") -> EmailBatch:
+        where, params, limit = FILTERS.get(filter_type, FILTERS["all"])
+        sql = f"SELECT * FROM emails {where} ORDER BY date DESC, id DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return EmailBatch(self._record(row) for row in rows)
+
+    def iter_emails(self, filter_type: str = "all", after: Optional[Tuple[str, str]] = None,
+                    batch_size: int = 100) -> Iterator[EmailRecord]:
+        where, params, limit = FILTERS.get(filter_type, FILTERS["all"])
+        remaining = limit
+        # Keyset pagination: each batch is an index range scan starting after the
+        # last (date, id) seen, so no lock or cursor is held between batches.
+        while remaining is None or remaining > 0:
+            clause, args = where, list(params)
+            if after is not None:
+                clause += (" AND " if clause else "WHERE ") + "(date, id) < (?, ?)"
+                args.extend(after)
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT * FROM emails {clause} ORDER BY date DESC, id DESC LIMIT ?",
+                    args + [size],
+                ).fetchall()
+            for row in rows:
+                yield self._record(row)
+            if len(rows) < size:
+                return
+            if remaining is not None:
+                remaining -= len(rows)
+            after = (rows[-1]["date"], rows[-1]["id"])
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM emails").fetchone()[0]
+
+    def mark_replied(self, email_ids: List[str]) -> int:
+        if not email_ids:
+            return 0
+        changed = 0
+        with self._lock, self._conn:
+            for chunk in _chunks(list(email_ids)):
+                changed += self._conn.execute(
+                    "UPDATE emails SET requires_response = 0 WHERE requires_response = 1 "
+                    f"AND id IN ({', '.join('?' for _ in chunk)})",
+                    chunk,
+                ).rowcount
+        self._notify("replied", list(email_ids))
+        return changed
+
+    def iter_pending_replies(self) -> Iterator[EmailRecord]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, sender, sender_name, subject, date, priority, deadline "
+                "FROM emails WHERE requires_response = 1"
+            ).fetchall()
+        for row in rows:
+            yield EmailRecord(row["id"], row["sender"], row["date"], sender_name=row["sender_name"],
+                              subject=row["subject"], priority=row["priority"],
+                              requires_response=True, deadline=row["deadline"])
+
+    def search(self, query: str, sender: Optional[str] = None, category: Optional[str] = None,
+               priority: Optional[str] = None, date_from: Optional[str] = None,
+               date_to: Optional[str] = None, limit: int = 10) -> List[Tuple[EmailRecord, float]]:
+        # Flip FTS5's lower-is-better BM25 so higher means more relevant
+        return [(self._record(row), round(-score, 4))
+                for row, score in self.search_index.search(query, sender, category, priority,
+                                                           date_from, date_to, limit)]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _to_row(email: Any) -> Tuple[tuple, str]:
+    """Split an email into its header-table row and its body."""
+    content = email.get("content") or ""
+    return (
+        email["id"],
+        email["sender"],
+        email.get("sender_name", ""),
+        email.get("subject", ""),
+        email["date"],
+        make_preview(content),
+        body_hash(content),
+        email.get("priority", "medium"),
+        email.get("category", ""),
+        int(bool(email.get("has_attachments", bool(email.get("attachments"))))),
+        json.dumps(email.get("attachments", [])),
+        int(bool(email.get("requires_response", False))),
+        email.get("deadline"),
+        int(bool(email.get("unread", True))),
+    ), content
+
+
+def _from_row(row: sqlite3.Row, loader: Optional[Callable[[List[str]], Dict[str, str]]] = None) -> EmailRecord:
+    # The body is present only when the query joined email_bodies
+    content = row["content"] if "content" in row.keys() else None
+    return EmailRecord(
+        row["id"], row["sender"], row["date"],
+        sender_name=row["sender_name"] or "",
+        subject=row["subject"] or "",
+        content=content,
+        preview=row["preview"],
+        body_hash=row["body_hash"],
+        loader=loader,
+        priority=row["priority"],
+        category=row["category"] or "",
+        has_attachments=row["has_attachments"],
+        attachments=json.loads(row["attachments"]),
+        requires_response=row["requires_response"],
+        deadline=row["deadline"],
+        unread=row["unread"],
+    )
+
+
+def encode_cursor(filter_type: str, last_email: Any) -> str:
+    """Build the opaque continuation token for the page ending at `last_email`."""
+    payload = json.dumps({"f": filter_type, "d": last_email["date"], "i": last_email["id"]},
+                         separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, filter_type: str) -> Tuple[str, str]:
+    """Return the (date, id) position encoded in a cursor issued for `filter_type`."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        position = (payload["d"], payload["i"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if payload.get("f") != filter_type:
+        raise ValueError(f"Cursor was issued for filter '{payload.get('f')}', not '{filter_type}'")
+    return position
+
+
+_mailbox: Optional[MailboxBackend] = None
+_mailbox_lock = threading.Lock()
+
+
+def get_mailbox() -> MailboxBackend:
+    """
+    Return the process-wide mailbox backend, creating the default local store on first use.
+
+    The SQLite file is taken from EMAIL_MAILBOX_PATH (in-memory when unset) and is
+    seeded with SAMPLE_EMAILS if it is empty.
+    """
+    global _mailbox
+    if _mailbox is None:
+        with _mailbox_lock:
+            if _mailbox is None:
+                mailbox = SQLiteMailbox(os.getenv("EMAIL_MAILBOX_PATH", ":memory:"))
+                if mailbox.count() == 0:
+                    mailbox.add_emails(SAMPLE_EMAILS)
+                _mailbox = mailbox
+    return _mailbox
+
+
+def set_mailbox(mailbox: MailboxBackend) -> None:
+    """Install a different mailbox backend (e.g. a provider-backed store)."""
+    global _mailbox
+    with _mailbox_lock:
+        _mailbox = mailbox
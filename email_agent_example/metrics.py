@@ -0,0 +1,265 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import List, Dict, Any, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# TOOL_METRICS=0 turns instrumentation off; instrumented tools then cost one flag check
+ENABLED = os.getenv("TOOL_METRICS", "1") != "0"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = tuple(float(4 ** i) for i in range(1, 12))  # 4 B .. 4 MiB
+CARDINALITY_BUCKETS = (0.0, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0, 200.0, 500.0, 1000.0, 5000.0, 10000.0)
+
+_HELP = {
+    "email_agent_tool_calls_total": ("counter", "Tool calls by returned status"),
+    "email_agent_tool_wall_seconds": ("histogram", "Wall-clock time per tool call"),
+    "email_agent_tool_cpu_seconds": ("histogram", "CPU time of the calling thread per tool call"),
+    "email_agent_tool_argument_size": ("histogram", "Number of items in list, dict or string arguments"),
+    "email_agent_tool_response_bytes": ("histogram", "JSON size of the tool response"),
+    "email_agent_tool_state_write_bytes": ("histogram", "JSON size of session-state values written per call"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    """
+    In-process counters and histograms without locks on the update path.
+
+    Every thread writes to its own shard (a plain dict), so an update is a few
+    list increments that never contend; the shard list is only locked when a
+    thread records its first metric. render_prometheus() merges the shards.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Dict[Tuple[str, Labels], Any]] = []
+        self._shards_lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+
+    def _shard(self) -> Dict[Tuple[str, Labels], Any]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name: str, labels: Labels, amount: float = 1.0) -> None:
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def observe(self, name: str, labels: Labels, value: float, buckets: Tuple[float, ...]) -> None:
+        self._buckets.setdefault(name, buckets)
+        shard = self._shard()
+        key = (name, labels)
+        histogram = shard.get(key)
+        if histogram is None:
+            # [per-bucket counts (last one is +Inf), sum, count]
+            histogram = shard[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+        histogram[0][bisect_left(buckets, value)] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+    def _merged(self) -> Dict[Tuple[str, Labels], Any]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        merged: Dict[Tuple[str, Labels], Any] = {}
+        for shard in shards:
+            for key, value in list(shard.items()):
+                if isinstance(value, list):
+                    counts, total, count = list(value[0]), value[1], value[2]
+                    current = merged.get(key)
+                    if current is None:
+                        merged[key] = [counts, total, count]
+                    else:
+                        current[0] = [a + b for a, b in zip(current[0], counts)]
+                        current[1] += total
+                        current[2] += count
+                else:
+                    merged[key] = merged.get(key, 0.0) + value
+        return merged
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        merged = self._merged()
+        lines = []
+        for name in sorted({name for name, _ in merged}):
+            kind, text = _HELP.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric, labels), value in sorted(merged.items()):
+                if metric != name:
+                    continue
+                if not isinstance(value, list):
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket in zip(self._buckets[name] + (float("inf"),), counts):
+                    cumulative += bucket
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._shards_lock:
+            for shard in self._shards:
+                shard.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _json_size(value: Any) -> int:
+    try:
+        return len(json.dumps(value, separators=(",", ":"), default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class _RecordingState:
+    """Session-state view that adds up the JSON size of every value written through it."""
+
+    __slots__ = ("_state", "written")
+
+    def __init__(self, state):
+        self._state = state
+        self.written = 0
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.written += _json_size(value)
+        self._state[key] = value
+
+    def __getitem__(self, key: str) -> Any:
+        return self._state[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._state
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._state.get(key, default)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._state, name)
+
+
+class _RecordingContext:
+    """ToolContext stand-in that routes `.state` through a _RecordingState."""
+
+    def __init__(self, context):
+        self._context = context
+        self.state = _RecordingState(context.state)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._context, name)
+
+
+registry = MetricsRegistry()
+
+
+def set_enabled(enabled: bool) -> None:
+    """Turn instrumentation of every decorated tool on or off at runtime."""
+    global ENABLED
+    ENABLED = enabled
+
+
+def instrument(tool: Callable) -> Callable:
+    """
+    Record metrics for every call of an agent tool (plain or `async def`).
+
+    The wrapper keeps the tool's signature and docstring (functools.wraps), so
+    the agent framework builds the same tool declaration from it. A debug log
+    line replaces the old per-call print. For async tools the CPU histogram
+    includes whatever else ran on the event loop thread while the call was
+    suspended.
+    """
+    name = tool.__name__
+    parameters = list(inspect.signature(tool).parameters)
+    context_index = parameters.index("tool_context") if "tool_context" in parameters else None
+    labels = (("tool", name),)
+
+    def begin(args: tuple, kwargs: Dict[str, Any]):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("--- Tool: %s called ---", name)
+        recording = None
+        if kwargs.get("tool_context") is not None:
+            recording = kwargs["tool_context"] = _RecordingContext(kwargs["tool_context"])
+        elif context_index is not None and context_index < len(args) and args[context_index] is not None:
+            recording = _RecordingContext(args[context_index])
+            args = args[:context_index] + (recording,) + args[context_index + 1:]
+        for argument, value in list(zip(parameters, args)) + list(kwargs.items()):
+            if argument != "tool_context" and isinstance(value, (list, tuple, dict, str)):
+                registry.observe("email_agent_tool_argument_size", labels + (("argument", argument),),
+                                 float(len(value)), CARDINALITY_BUCKETS)
+        return args, recording, time.perf_counter(), time.thread_time()
+
+    def finish(result: Any, status: str, recording, wall: float, cpu: float) -> None:
+        registry.observe("email_agent_tool_wall_seconds", labels, time.perf_counter() - wall, LATENCY_BUCKETS)
+        registry.observe("email_agent_tool_cpu_seconds", labels, time.thread_time() - cpu, LATENCY_BUCKETS)
+        registry.inc("email_agent_tool_calls_total", labels + (("status", status),))
+        if status != "exception":
+            registry.observe("email_agent_tool_response_bytes", labels, float(_json_size(result)), SIZE_BUCKETS)
+        if recording is not None:
+            registry.observe("email_agent_tool_state_write_bytes", labels,
+                             float(recording.state.written), SIZE_BUCKETS)
+
+    def status_of(result: Any) -> str:
+        return result.get("status", "unknown") if isinstance(result, dict) else "unknown"
+
+    if inspect.iscoroutinefunction(tool):
+        @functools.wraps(tool)
+        async def async_wrapper(*args, **kwargs):
+            if not ENABLED:
+                return await tool(*args, **kwargs)
+            args, recording, wall, cpu = begin(args, kwargs)
+            result, status = None, "exception"
+            try:
+                result = await tool(*args, **kwargs)
+                status = status_of(result)
+                return result
+            finally:
+                finish(result, status, recording, wall, cpu)
+
+        return async_wrapper
+
+    @functools.wraps(tool)
+    def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return tool(*args, **kwargs)
+        args, recording, wall, cpu = begin(args, kwargs)
+        result, status = None, "exception"
+        try:
+            result = tool(*args, **kwargs)
+            status = status_of(result)
+            return result
+        finally:
+            finish(result, status, recording, wall, cpu)
+
+    return wrapper
+
+
+def render_prometheus() -> str:
+    """Prometheus text dump of the process-wide tool metrics."""
+    return registry.render_prometheus()
@@ -0,0 +1,246 @@
+import asyncio
+import base64
+import heapq
+import json
+import os
+import threading
+import urllib.parse
+import urllib.request
+from itertools import islice
+from typing import List, Dict, Any, Optional, Tuple
+
+from .mailbox import FILTERS, MailboxBackend, encode_cursor, get_mailbox
+from .records import EmailRecord
+
+# Seconds each provider gets to answer before a fan-out call gives up on it
+PROVIDER_TIMEOUT = float(os.getenv("EMAIL_PROVIDER_TIMEOUT", "10"))
+
+Position = Optional[Tuple[str, str]]
+
+
+class MailProvider:
+    """
+    Asynchronous source of email records for one connected account.
+
+    Pages are keyset-based: fetch_page returns records strictly after the
+    (date, id) position `after`, newest first, so results from several
+    providers can be merged by date and resumed independently.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    async def fetch_page(self, filter_type: str, limit: int, after: Position = None,
+                         include_body: bool = False) -> List[EmailRecord]:
+        raise NotImplementedError
+
+    async def search(self, query: str, limit: int = 10, **filters: Any) -> List[Tuple[EmailRecord, float]]:
+        raise NotImplementedError
+
+
+class LocalMailboxProvider(MailProvider):
+    """Serves a MailboxBackend, running its blocking calls in a worker thread."""
+
+    def __init__(self, name: str, mailbox: MailboxBackend):
+        super().__init__(name)
+        self.mailbox = mailbox
+
+    def _page(self, filter_type: str, limit: int, after: Position, include_body: bool) -> List[EmailRecord]:
+        records = list(islice(self.mailbox.iter_emails(filter_type, after, batch_size=limit), limit))
+        if include_body:
+            bodies = self.mailbox.get_bodies([record.id for record in records])
+            for record in records:
+                record.content = bodies.get(record.id, "")
+        return records
+
+    async def fetch_page(self, filter_type: str, limit: int, after: Position = None,
+                         include_body: bool = False) -> List[EmailRecord]:
+        return await asyncio.to_thread(self._page, filter_type, limit, after, include_body)
+
+    async def search(self, query: str, limit: int = 10, **filters: Any) -> List[Tuple[EmailRecord, float]]:
+        return await asyncio.to_thread(self.mailbox.search, query, limit=limit, **filters)
+
+
+class HTTPMailProvider(MailProvider):
+    """
+    Client for a mail service speaking the JSON API of stub_server.StubMailServer.
+
+    GET /emails?filter=&limit=&cursor=&include_body= and GET /search?q=&limit=&...
+    both answer {"emails": [...]}; cursors use the mailbox cursor format.
+    """
+
+    def __init__(self, name: str, base_url: str, timeout: float = PROVIDER_TIMEOUT):
+        super().__init__(name)
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _get(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        query = urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
+        with urllib.request.urlopen(f"{self.base_url}{path}?{query}", timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    async def fetch_page(self, filter_type: str, limit: int, after: Position = None,
+                         include_body: bool = False) -> List[EmailRecord]:
+        cursor = encode_cursor(filter_type, {"date": after[0], "id": after[1]}) if after else None
+        payload = await asyncio.to_thread(self._get, "/emails", {
+            "filter": filter_type, "limit": limit, "cursor": cursor, "include_body": int(include_body),
+        })
+        return [EmailRecord.from_dict(email) for email in payload["emails"]]
+
+    async def search(self, query: str, limit: int = 10, **filters: Any) -> List[Tuple[EmailRecord, float]]:
+        payload = await asyncio.to_thread(self._get, "/search", dict(filters, q=query, limit=limit))
+        return [(EmailRecord.from_dict(email), email.get("score", 0.0)) for email in payload["emails"]]
+
+
+async def _call(provider: MailProvider, coroutine, timeout: float) -> Tuple[str, Any, Optional[str]]:
+    """Await one provider call; returns (name, result or None, "timeout"/error message or None)."""
+    try:
+        return provider.name, await asyncio.wait_for(coroutine, timeout), None
+    except asyncio.TimeoutError:
+        return provider.name, None, "timeout"
+    except Exception as e:  # one failing account must not sink the others
+        return provider.name, None, f"{type(e).__name__}: {e}"
+
+
+async def fetch_merged(providers: List[MailProvider], filter_type: str, limit: int,
+                       positions: Optional[Dict[str, Position]] = None, exhausted: Tuple[str, ...] = (),
+                       include_body: bool = False, timeout: float = PROVIDER_TIMEOUT) -> Dict[str, Any]:
+    """
+    Fetch one page from every provider concurrently and merge it newest first.
+
+    Each provider is asked for limit + 1 records after its own position so the
+    merge knows whether it has more. Providers that time out or fail keep their
+    position and are retried on the next page. A filter with a fixed size
+    (most_recent) caps the merged result, which is then the only page.
+
+    Returns {"emails": [(provider name, record)], "positions", "exhausted",
+    "has_more", "failed": {name: reason}}.
+    """
+    _, _, filter_limit = FILTERS.get(filter_type, FILTERS["all"])
+    if filter_limit:
+        limit = min(limit, filter_limit)
+    positions = dict(positions or {})
+    active = [p for p in providers if p.name not in exhausted]
+    outcomes = await asyncio.gather(*(
+        _call(p, p.fetch_page(filter_type, limit + 1, positions.get(p.name), include_body), timeout)
+        for p in active
+    ))
+
+    failed = {name: reason for name, _, reason in outcomes if reason is not None}
+    fetched = {name: records for name, records, reason in outcomes if reason is None}
+    streams = [[(record.date, record.id, name, record) for record in records]
+               for name, records in fetched.items()]
+    merged = list(islice(heapq.merge(*streams, key=lambda item: (item[0], item[1]), reverse=True), limit))
+
+    consumed: Dict[str, int] = {}
+    for date, email_id, name, _ in merged:
+        positions[name] = (date, email_id)
+        consumed[name] = consumed.get(name, 0) + 1
+    done = set(exhausted)
+    for name, records in fetched.items():
+        if len(records) <= limit and consumed.get(name, 0) == len(records):
+            done.add(name)
+    if filter_limit:
+        done.update(p.name for p in providers)
+    return {
+        "emails": [(name, record) for _, _, name, record in merged],
+        "positions": positions,
+        "exhausted": tuple(sorted(done)),
+        "has_more": any(p.name not in done for p in providers),
+        "failed": failed,
+    }
+
+
+def page_prefix(page: Dict[str, Any], count: int, positions: Optional[Dict[str, Position]] = None,
+                exhausted: Tuple[str, ...] = ()) -> Dict[str, Any]:
+    """
+    A fetch_merged page cut to its first `count` emails, with positions that
+    continue right after them. `positions` and `exhausted` are the ones the page
+    was fetched with.
+    """
+    positions = dict(positions or {})
+    for name, record in page["emails"][:count]:
+        positions[name] = (record.date, record.id)
+    return dict(page, emails=page["emails"][:count], positions=positions, exhausted=tuple(exhausted),
+                has_more=True)
+
+
+async def search_merged(providers: List[MailProvider], query: str, limit: int,
+                        timeout: float = PROVIDER_TIMEOUT, **filters: Any) -> Dict[str, Any]:
+    """Search every provider concurrently; results are merged by relevance score."""
+    outcomes = await asyncio.gather(*(_call(p, p.search(query, limit, **filters), timeout) for p in providers))
+    results = [(score, name, record) for name, found, reason in outcomes if reason is None
+               for record, score in found]
+    results.sort(key=lambda item: item[0], reverse=True)
+    return {
+        "emails": [(name, record, score) for score, name, record in results[:limit]],
+        "failed": {name: reason for name, _, reason in outcomes if reason is not None},
+    }
+
+
+def encode_multi_cursor(filter_type: str, positions: Dict[str, Position], exhausted: Tuple[str, ...]) -> str:
+    """Continuation token for a merged page: each provider's position plus those already drained."""
+    payload = json.dumps({"f": filter_type, "p": positions, "x": list(exhausted)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_multi_cursor(cursor: str, filter_type: str) -> Tuple[Dict[str, Position], Tuple[str, ...]]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        positions = {name: tuple(pos) if pos else None for name, pos in payload["p"].items()}
+        exhausted = tuple(payload.get("x", ()))
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise ValueError("Invalid cursor")
+    if payload.get("f") != filter_type:
+        raise ValueError(f"Cursor was issued for filter '{payload.get('f')}', not '{filter_type}'")
+    return positions, exhausted
+
+
+_providers: Dict[str, MailProvider] = {}
+_providers_lock = threading.Lock()
+_configured = False
+
+
+def _load_configured() -> None:
+    # EMAIL_PROVIDERS="gmail=http://127.0.0.1:8081,outlook=http://127.0.0.1:8082"
+    global _configured
+    with _providers_lock:
+        if _configured:
+            return
+        for entry in filter(None, os.getenv("EMAIL_PROVIDERS", "").split(",")):
+            name, _, url = entry.partition("=")
+            if name.strip() and url.strip():
+                _providers.setdefault(name.strip(), HTTPMailProvider(name.strip(), url.strip()))
+        # GMAIL_ACCESS_TOKEN connects the Gmail API directly (GMAIL_API_URL overrides the host)
+        if os.getenv("GMAIL_ACCESS_TOKEN") and "gmail" not in _providers:
+            from .gmail import GmailClient, GmailProvider
+            _providers["gmail"] = GmailProvider("gmail", GmailClient(os.environ["GMAIL_ACCESS_TOKEN"]))
+        _configured = True
+
+
+def register_provider(provider: MailProvider) -> None:
+    """Connect an account; it then serves its platform name and takes part in "all"."""
+    _load_configured()
+    with _providers_lock:
+        _providers[provider.name] = provider
+
+
+def unregister_provider(name: str) -> None:
+    with _providers_lock:
+        _providers.pop(name, None)
+
+
+def get_provider(platform: str) -> MailProvider:
+    """Provider for `platform`; platforms without one are served from the local mailbox."""
+    _load_configured()
+    provider = _providers.get(platform)
+    return provider or LocalMailboxProvider(platform, get_mailbox())
+
+
+def connected_providers() -> List[MailProvider]:
+    """Every connected provider, or the local mailbox alone when none is registered."""
+    _load_configured()
+    with _providers_lock:
+        providers = list(_providers.values())
+    return providers or [LocalMailboxProvider("local", get_mailbox())]
@@ -0,0 +1,306 @@
+import hashlib
+import sys
+from array import array
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Sequence, Callable
+
+
+# Every field of an email as tools see it
+EMAIL_FIELDS = (
+    "id", "sender", "sender_name", "subject", "date", "content", "priority",
+    "category", "has_attachments", "attachments", "requires_response",
+    "deadline", "unread",
+)
+# What listings return by default: everything but the body, plus a short preview
+HEADER_FIELDS = tuple(field for field in EMAIL_FIELDS if field != "content") + ("preview",)
+PREVIEW_CHARS = 160
+
+_FLAG_ATTACHMENTS = 1
+_FLAG_RESPONSE = 2
+_FLAG_UNREAD = 4
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def make_preview(content: str) -> str:
+    """First PREVIEW_CHARS characters of a body, whitespace collapsed."""
+    text = " ".join(content[:PREVIEW_CHARS * 2].split())
+    return text if len(text) <= PREVIEW_CHARS else text[:PREVIEW_CHARS - 3].rstrip() + "..."
+
+
+def body_hash(content: str) -> str:
+    """Digest stored next to the headers so caches can key on a body without loading it."""
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class EmailRecord:
+    """
+    One email, held in slots instead of a per-record dict.
+
+    Low-cardinality strings (sender, priority, category) are interned so a large
+    working set shares a single copy of each. Records support read-only mapping
+    access (`email["subject"]`, `email.get("deadline")`) so helpers written for
+    plain dicts accept them unchanged; `to_dict()` produces the JSON-compatible
+    form tools return.
+
+    The body may be left unloaded (content=None) with a `loader` that fetches
+    bodies by id (the store's get_bodies, so a batch can load all of its missing
+    bodies in one call); it is then read on first access to `content` and kept. `preview` and
+    `body_hash` are always available without touching the body.
+    """
+
+    __slots__ = tuple(field for field in EMAIL_FIELDS if field != "content") + (
+        "preview", "body_hash", "_content", "_loader",
+    )
+
+    def __init__(self, id: str, sender: str, date: str, sender_name: str = "", subject: str = "",
+                 content: Optional[str] = "", priority: str = "medium", category: str = "",
+                 has_attachments: bool = False, attachments: Sequence[str] = (),
+                 requires_response: bool = False, deadline: Optional[str] = None,
+                 unread: bool = True, preview: Optional[str] = None, body_hash: Optional[str] = None,
+                 loader: Optional[Callable[[List[str]], Dict[str, str]]] = None):
+        self.id = id
+        self.sender = _intern(sender)
+        self.sender_name = _intern(sender_name)
+        self.subject = subject
+        self.date = date
+        self._content = content
+        self._loader = loader
+        self.preview = make_preview(content) if preview is None and content is not None else preview or ""
+        self.body_hash = body_hash
+        self.priority = _intern(priority)
+        self.category = _intern(category)
+        self.has_attachments = bool(has_attachments)
+        self.attachments = tuple(attachments)
+        self.requires_response = bool(requires_response)
+        self.deadline = deadline
+        self.unread = bool(unread)
+
+    @property
+    def content(self) -> str:
+        if self._content is None:
+            if self._loader is None:
+                return ""
+            self._content = self._loader([self.id]).get(self.id) or ""
+        return self._content
+
+    @content.setter
+    def content(self, value: str) -> None:
+        self._content = value
+
+    @property
+    def body_loaded(self) -> bool:
+        return self._content is not None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Loaders hold a store connection; records cross process boundaries with their body
+        state = {slot: getattr(self, slot) for slot in self.__slots__ if slot not in ("_content", "_loader")}
+        state["_content"] = self.content
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self._loader = None
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+    @classmethod
+    def from_dict(cls, email: Dict[str, Any]) -> "EmailRecord":
+        """Build a record from a plain email dict; unknown keys are ignored."""
+        if isinstance(email, cls):
+            return email
+        attachments = email.get("attachments") or ()
+        return cls(
+            email["id"], email["sender"], email["date"],
+            sender_name=email.get("sender_name") or "",
+            subject=email.get("subject") or "",
+            content=email.get("content") or "",
+            preview=email.get("preview"),
+            priority=email.get("priority") or "medium",
+            category=email.get("category") or "",
+            has_attachments=email.get("has_attachments", bool(attachments)),
+            attachments=attachments,
+            requires_response=email.get("requires_response", False),
+            deadline=email.get("deadline"),
+            unread=email.get("unread", True),
+        )
+
+    def __getitem__(self, field: str) -> Any:
+        if field not in EMAIL_FIELDS and field != "preview":
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __contains__(self, field: str) -> bool:
+        return field in EMAIL_FIELDS or field == "preview"
+
+    def get(self, field: str, default: Any = None) -> Any:
+        return getattr(self, field) if field in self else default
+
+    def keys(self):
+        return EMAIL_FIELDS
+
+    def to_dict(self, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        JSON-compatible dict of the record, optionally restricted to `fields`.
+
+        The body is loaded only when "content" is among the fields (the default).
+        """
+        email = {field: getattr(self, field) for field in (fields or EMAIL_FIELDS)}
+        if "attachments" in email:
+            email["attachments"] = list(email["attachments"])
+        return email
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, EmailRecord):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in EMAIL_FIELDS)
+
+    def __repr__(self) -> str:
+        return f"EmailRecord(id={self.id!r}, sender={self.sender!r}, subject={self.subject!r})"
+
+
+class StringPool:
+    """Bidirectional string <-> small-integer table shared by a batch's coded columns."""
+
+    __slots__ = ("_codes", "values")
+
+    def __init__(self):
+        self._codes: Dict[Optional[str], int] = {}
+        self.values: List[Optional[str]] = []
+
+    def code(self, value: Optional[str]) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(_intern(value))
+        return code
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class EmailBatch:
+    """
+    Column-oriented container for many emails.
+
+    Free-text fields are kept as one list per column; sender, sender name,
+    priority and category are stored as integer codes into a shared StringPool,
+    and the three boolean flags are packed into one byte per email. A batch
+    costs a fraction of the equivalent list of dicts and converts to dicts only
+    when a tool builds its response. Bodies stay unloaded (None) until the
+    content column is asked for.
+    """
+
+    __slots__ = ("pool", "ids", "dates", "subjects", "contents", "previews", "body_hashes",
+                 "deadlines", "attachments", "loader",
+                 "_senders", "_sender_names", "_priorities", "_categories", "_flags")
+
+    def __init__(self, records: Iterable[Any] = ()):
+        self.pool = StringPool()
+        self.ids: List[str] = []
+        self.dates: List[str] = []
+        self.subjects: List[str] = []
+        self.contents: List[Optional[str]] = []
+        self.previews: List[str] = []
+        self.body_hashes: List[Optional[str]] = []
+        self.loader: Optional[Callable[[List[str]], Dict[str, str]]] = None
+        self.deadlines: List[Optional[str]] = []
+        self.attachments: List[tuple] = []
+        self._senders = array("I")
+        self._sender_names = array("I")
+        self._priorities = array("I")
+        self._categories = array("I")
+        self._flags = array("B")
+        self.extend(records)
+
+    def append(self, email: Any) -> None:
+        """Add an EmailRecord (or plain email dict) to the end of the batch."""
+        record = EmailRecord.from_dict(email)
+        code = self.pool.code
+        self.ids.append(record.id)
+        self.dates.append(record.date)
+        self.subjects.append(record.subject)
+        self.contents.append(record._content)
+        self.previews.append(record.preview)
+        self.body_hashes.append(record.body_hash)
+        self.loader = record._loader or self.loader
+        self.deadlines.append(record.deadline)
+        self.attachments.append(record.attachments)
+        self._senders.append(code(record.sender))
+        self._sender_names.append(code(record.sender_name))
+        self._priorities.append(code(record.priority))
+        self._categories.append(code(record.category))
+        self._flags.append(
+            (_FLAG_ATTACHMENTS if record.has_attachments else 0)
+            | (_FLAG_RESPONSE if record.requires_response else 0)
+            | (_FLAG_UNREAD if record.unread else 0)
+        )
+
+    def extend(self, emails: Iterable[Any]) -> None:
+        for email in emails:
+            self.append(email)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __bool__(self) -> bool:
+        return bool(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return EmailBatch(self[i] for i in range(*index.indices(len(self))))
+        values = self.pool.values
+        flags = self._flags[index]
+        return EmailRecord(
+            self.ids[index], values[self._senders[index]], self.dates[index],
+            sender_name=values[self._sender_names[index]],
+            subject=self.subjects[index],
+            content=self.contents[index],
+            priority=values[self._priorities[index]],
+            category=values[self._categories[index]],
+            has_attachments=flags & _FLAG_ATTACHMENTS,
+            attachments=self.attachments[index],
+            requires_response=flags & _FLAG_RESPONSE,
+            deadline=self.deadlines[index],
+            unread=flags & _FLAG_UNREAD,
+            preview=self.previews[index],
+            body_hash=self.body_hashes[index],
+            loader=self.loader,
+        )
+
+    def __iter__(self) -> Iterator[EmailRecord]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def column(self, field: str) -> List[Any]:
+        """All values of one field, in batch order."""
+        coded = {"sender": self._senders, "sender_name": self._sender_names,
+                 "priority": self._priorities, "category": self._categories}
+        if field in coded:
+            values = self.pool.values
+            return [values[code] for code in coded[field]]
+        flag = {"has_attachments": _FLAG_ATTACHMENTS, "requires_response": _FLAG_RESPONSE,
+                "unread": _FLAG_UNREAD}.get(field)
+        if flag is not None:
+            return [bool(flags & flag) for flags in self._flags]
+        if field == "content":
+            missing = [index for index, content in enumerate(self.contents) if content is None]
+            if missing:
+                # One loader call for every unloaded body rather than one per email
+                bodies = self.loader([self.ids[index] for index in missing]) if self.loader else {}
+                for index in missing:
+                    self.contents[index] = bodies.get(self.ids[index]) or ""
+            return list(self.contents)
+        columns = {"id": self.ids, "date": self.dates, "subject": self.subjects,
+                   "preview": self.previews, "deadline": self.deadlines}
+        if field == "attachments":
+            return [list(attachments) for attachments in self.attachments]
+        if field not in columns:
+            raise KeyError(field)
+        return list(columns[field])
+
+    def to_dicts(self, fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """JSON-compatible dicts for the whole batch, optionally restricted to `fields`."""
+        fields = tuple(fields or EMAIL_FIELDS)
+        columns = [self.column(field) for field in fields]
+        return [dict(zip(fields, values)) for values in zip(*columns)]
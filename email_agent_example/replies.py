@@ -0,0 +1,154 @@
+import heapq
+import threading
+from datetime import datetime, time
+from typing import List, Dict, Any, Optional, Tuple
+
+from .mailbox import MailboxBackend
+from .records import EmailRecord
+
+
+PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+# Emails owing a reply but without a (readable) deadline sort after every dated one
+NO_DEADLINE = datetime.max
+
+
+def parse_deadline(value: Optional[str]) -> datetime:
+    """
+    Parse an ISO 8601 deadline into a naive local datetime that orders correctly.
+
+    Accepts dates ("2024-06-03", due at the end of that day), date-times with a
+    space or "T", and UTC offsets or "Z" (converted to local time). Missing or
+    unparseable deadlines map to NO_DEADLINE.
+    """
+    if not value:
+        return NO_DEADLINE
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return NO_DEADLINE
+    if parsed.tzinfo is not None:
+        return parsed.astimezone().replace(tzinfo=None)
+    if len(value) == len("YYYY-MM-DD"):
+        return datetime.combine(parsed.date(), time.max)
+    return parsed
+
+
+class ReplyTracker:
+    """
+    Priority index of emails still owing a reply, kept current from mailbox events.
+
+    Entries live in a binary heap keyed on (deadline, priority, date, id), with the
+    deadline parsed by parse_deadline so mixed ISO formats compare by time. Replies
+    and updated records are removed lazily: the heap may hold stale tuples that
+    are skipped on read and dropped when the heap is rebuilt. The k most pressing
+    emails are read by walking the heap as a tree with a small frontier heap, so a
+    query costs O(k log k) no matter how large the mailbox is.
+    """
+
+    def __init__(self, mailbox: MailboxBackend):
+        self.mailbox = mailbox
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[datetime, int, str, str]] = []
+        self._entries: Dict[str, Tuple[Tuple[datetime, int, str, str], EmailRecord]] = {}
+        self.high_priority = 0
+        for email in mailbox.iter_pending_replies():
+            self._add(email)
+        heapq.heapify(self._heap)
+        mailbox.add_listener(self._on_mailbox_event)
+
+    def _add(self, email: Any, push: bool = False) -> None:
+        self._remove(email["id"])
+        key = (parse_deadline(email.get("deadline")), PRIORITY_RANK.get(email.get("priority"), 1),
+               email["date"], email["id"])
+        # Headers only: the tracker never needs the body
+        record = EmailRecord(email["id"], email["sender"], email["date"],
+                             sender_name=email.get("sender_name") or "",
+                             subject=email.get("subject") or "", priority=email.get("priority"),
+                             requires_response=True, deadline=email.get("deadline"))
+        self._entries[email["id"]] = (key, record)
+        self.high_priority += record.priority == "high"
+        if push:
+            heapq.heappush(self._heap, key)
+        else:
+            self._heap.append(key)
+
+    def _remove(self, email_id: str) -> None:
+        entry = self._entries.pop(email_id, None)
+        if entry is not None:
+            self.high_priority -= entry[1].priority == "high"
+
+    def _on_mailbox_event(self, event: str, payload: List[Any]) -> None:
+        with self._lock:
+            if event == "added":
+                for email in payload:
+                    if email.get("requires_response"):
+                        self._add(email, push=True)
+                    else:
+                        self._remove(email["id"])
+            elif event == "replied":
+                for email_id in payload:
+                    self._remove(email_id)
+            # Stale tuples only cost memory; rebuild once they outnumber live ones
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._heap = [key for key, _ in self._entries.values()]
+                heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _walk(self):
+        """Yield live (key, record) pairs in heap order without popping anything."""
+        heap, entries = self._heap, self._entries
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            key, index = heapq.heappop(frontier)
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+            entry = entries.get(key[3])
+            if entry is not None and entry[0] == key:
+                yield entry
+
+    def most_pressing(self, limit: int) -> List[EmailRecord]:
+        """The `limit` emails with the earliest deadlines, ties broken by priority then age."""
+        with self._lock:
+            results = []
+            for _, record in self._walk():
+                if len(results) >= limit:
+                    break
+                results.append(record)
+            return results
+
+    def overdue_between(self, since: Optional[datetime], now: datetime) -> List[EmailRecord]:
+        """Emails whose deadline passed in (since, now]; all overdue ones when `since` is None."""
+        with self._lock:
+            results = []
+            for key, record in self._walk():
+                if key[0] > now:
+                    break  # heap order: every later entry is due after `now`
+                if since is None or key[0] > since:
+                    results.append(record)
+            return results
+
+
+_tracker: Optional[ReplyTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_reply_tracker(mailbox: MailboxBackend) -> ReplyTracker:
+    """Return the tracker for `mailbox`, building it from the mailbox on first use."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None or _tracker.mailbox is not mailbox:
+            if _tracker is not None:
+                _tracker.mailbox.remove_listener(_tracker._on_mailbox_event)
+            _tracker = ReplyTracker(mailbox)
+        return _tracker
+
+
+def days_since(date: str, now: datetime) -> int:
+    try:
+        return max(0, (now - datetime.fromisoformat(date)).days)
+    except (TypeError, ValueError):
+        return 0
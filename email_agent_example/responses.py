@@ -0,0 +1,183 @@
+import json
+import os
+from typing import List, Dict, Any, Optional, Callable, Sequence, Union
+
+# Default size limit of one tool response, in estimated model tokens; a session
+# can set its own with state["response_token_budget"] (0 disables the limit)
+RESPONSE_TOKEN_BUDGET = int(os.getenv("RESPONSE_TOKEN_BUDGET", "4000"))
+# Average characters per token of JSON-encoded English text
+CHARS_PER_TOKEN = float(os.getenv("RESPONSE_CHARS_PER_TOKEN", "3.6"))
+
+_PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+# Identifiers are never projected away, so trimmed responses can still be followed up
+_ID_FIELDS = ("email_id", "id", "row", "recipient")
+# Characters set aside, once trimming starts, for the "response" report and the message note
+_TRIM_OVERHEAD = 320
+
+
+def _encoded_size(value: Any) -> int:
+    # Characters of the compact JSON; equal to its bytes for ASCII text
+    return len(json.dumps(value, separators=(",", ":"), default=str))
+
+
+def estimate_tokens(value: Any) -> int:
+    """Approximate model tokens of a value as the JSON the model receives (a byte ratio, no tokenizer)."""
+    size = len(value) if isinstance(value, str) else _encoded_size(value)
+    return int(size / CHARS_PER_TOKEN + 0.5)
+
+
+def by_priority(item: Dict[str, Any]) -> int:
+    """Rank of an email-like item; higher ranks are trimmed first."""
+    return _PRIORITY_RANK.get(item.get("priority"), 1)
+
+
+class ResponsePolicy:
+    """
+    How one tool's responses are shaped.
+
+    Args:
+        items: Key of the response's list of per-email items, or several keys; the
+            first is the main list, the others are trimmed before it when over budget
+        truncate: Longest allowed string (characters) or list (elements) per item field
+        rank: Function ranking items; the highest ranks are dropped first when over
+            budget (default: later items first)
+        drop_empty: Leave out item fields that are None, "" or empty lists
+        paged: Items are one page of a cursor; only trailing items are dropped (never
+            the first), so the caller can continue the cursor after the last one kept
+        counts: Result keys counting the main list, each with the amount one item
+            adds to it; dropped items are subtracted so counts match what is returned
+    """
+
+    def __init__(self, items: Union[str, Sequence[str], None] = None, truncate: Optional[Dict[str, int]] = None,
+                 rank: Optional[Callable[[Dict[str, Any]], Any]] = None, drop_empty: bool = True,
+                 paged: bool = False, counts: Optional[Dict[str, Callable[[Dict[str, Any]], int]]] = None):
+        self.lists = (items,) if isinstance(items, str) else tuple(items or ())
+        self.items = self.lists[0] if self.lists else None
+        self.truncate = truncate or {}
+        self.rank = rank
+        self.drop_empty = drop_empty
+        self.paged = paged
+        self.counts = counts or {}
+
+
+def one(item: Dict[str, Any]) -> int:
+    """Count weight of an item that stands for itself alone."""
+    return 1
+
+
+def _item_id(item: Any, index: int) -> Any:
+    if isinstance(item, dict):
+        for name in _ID_FIELDS:
+            if name in item:
+                return item[name]
+    return index
+
+
+def _shape_item(item: Any, policy: ResponsePolicy, fields: Optional[Sequence[str]]) -> Any:
+    if not isinstance(item, dict):
+        return item
+    shaped = {}
+    for name, value in item.items():
+        if fields is not None and name not in fields and name not in _ID_FIELDS:
+            continue
+        if policy.drop_empty and (value is None or value == "" or value == []):
+            continue
+        limit = policy.truncate.get(name)
+        if limit is not None:
+            if isinstance(value, str) and len(value) > limit:
+                value = value[:max(limit - 3, 0)].rstrip() + "..."
+            elif isinstance(value, (list, tuple)) and len(value) > limit:
+                value = list(value[:limit]) + [f"+{len(value) - limit} more"]
+        if isinstance(value, list):
+            # Nested records (a summary's duplicates) get the same field treatment
+            value = [_shape_item(element, policy, None) for element in value]
+        shaped[name] = value
+    return shaped
+
+
+def response_budget(state) -> int:
+    budget = state.get("response_token_budget") if state is not None else None
+    return RESPONSE_TOKEN_BUDGET if budget is None else int(budget)
+
+
+def shape_response(result: Dict[str, Any], policy: ResponsePolicy, fields: Optional[Sequence[str]] = None,
+                   budget: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Project, truncate and trim a tool result to fit a token budget.
+
+    Item fields of every list in the policy are limited to `fields` (identifiers
+    are always kept), empty fields dropped and long values cut per the policy.
+    If the result still exceeds `budget` tokens, the lowest-ranked items are
+    dropped: their ids are listed per list in "omitted", the policy's counts are
+    reduced to what is returned and the message says so. When anything was
+    saved, the result gains
+    "response": {"tokens", "bytes_saved", "tokens_saved"[, "omitted"]}.
+    Error results are returned unchanged.
+    """
+    keys = [key for key in policy.lists if isinstance(result.get(key), list)]
+    if result.get("status") == "error" or policy.items not in keys:
+        return result
+    # Every item is encoded once as received and once shaped (unless shaping left
+    # it unchanged); the response size is the rest of the result plus the items
+    items: Dict[str, List[Any]] = {}
+    sizes: Dict[str, List[int]] = {}
+    original_sizes: Dict[str, List[int]] = {}
+    for key in keys:
+        original_sizes[key] = [_encoded_size(item) for item in result[key]]
+        items[key], sizes[key] = [], []
+        for item, size in zip(result[key], original_sizes[key]):
+            shaped_item = _shape_item(item, policy, fields)
+            items[key].append(shaped_item)
+            sizes[key].append(size if shaped_item == item else _encoded_size(shaped_item))
+
+    def total(base: Dict[str, Any], item_sizes: Dict[str, Sequence[int]]) -> int:
+        return (_encoded_size(dict(base, **{key: [] for key in keys}))
+                + sum(sum(values) + max(len(values) - 1, 0) for values in item_sizes.values()))
+
+    original = total(result, original_sizes)
+    shaped = dict(result)
+    dropped: Dict[str, set] = {key: set() for key in keys}
+    limit = int(budget * CHARS_PER_TOKEN) if budget else 0
+    current = total(shaped, sizes)
+    if limit and current > limit:
+        # The other lists give way before the main one, lowest-ranked and latest items first
+        order = sorted(((key, i) for key in keys for i in range(len(items[key]))),
+                       key=lambda entry: (policy.rank(items[entry[0]][entry[1]]) if policy.rank else 0,
+                                          keys.index(entry[0]), entry[1]), reverse=True)
+        if policy.paged:
+            # Only trailing items of a page, never its first
+            others = [entry for entry in order if entry[0] != policy.items]
+            order = others + [(policy.items, i) for i in range(len(items[policy.items]) - 1, 0, -1)]
+        for key, i in order:
+            if current <= limit - _TRIM_OVERHEAD:
+                break
+            dropped[key].add(i)
+            # The item leaves the list and its id joins response.omitted
+            current -= sizes[key][i] - _encoded_size(_item_id(result[key][i], i))
+    omitted = {key: [_item_id(result[key][i], i) for i in sorted(indexes)]
+               for key, indexes in dropped.items() if indexes}
+    for key in keys:
+        shaped[key] = [item for i, item in enumerate(items[key]) if i not in dropped[key]]
+    if omitted:
+        main = result[policy.items]
+        for name, weight in policy.counts.items():
+            if isinstance(shaped.get(name), int):
+                shaped[name] -= sum(weight(main[i]) for i in dropped[policy.items])
+        # Paged callers continue their cursor and describe that themselves
+        if not policy.paged and isinstance(shaped.get("message"), str):
+            shaped["message"] += "; " + ", ".join(
+                f"{len(shaped[key])} of {len(result[key])} {key.replace('_', ' ')}" for key in keys
+                if key in omitted or key == policy.items
+            ) + " returned to fit the response budget, the rest are listed by id in response.omitted"
+    size = total(shaped, {key: [size for i, size in enumerate(sizes[key]) if i not in dropped[key]]
+                          for key in keys})
+    if size >= original and not omitted:
+        return result
+    if omitted:
+        size += _encoded_size(omitted)
+    report = {"tokens": int(size / CHARS_PER_TOKEN + 0.5), "bytes_saved": original - size,
+              "tokens_saved": int((original - size) / CHARS_PER_TOKEN + 0.5)}
+    if omitted:
+        report["omitted"] = omitted
+    shaped["response"] = report
+    return shaped
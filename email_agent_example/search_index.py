@@ -0,0 +1,130 @@
+import re
+import sqlite3
+import threading
+from typing import List, Optional, Tuple
+
+
+# Relative BM25 weight of each indexed column
+FIELD_WEIGHTS = {"subject": 4.0, "sender": 2.0, "sender_name": 2.0, "content": 1.0}
+
+_TOKEN = re.compile(r"\w+\*?", re.UNICODE)
+
+
+def build_match_query(query: str) -> str:
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word must match (implicit AND); a trailing "*" keeps prefix search.
+    Words are quoted so user input can never inject FTS5 operators.
+    """
+    terms = []
+    for token in _TOKEN.findall(query):
+        prefix = token.endswith("*")
+        word = token.rstrip("*")
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+class SearchIndex:
+    """
+    Inverted index over subject, sender and body of the mailbox's emails.
+
+    An external-content FTS5 table over the `email_documents` view, which joins
+    the header table with the separately stored bodies, so text is indexed
+    without being stored twice. The mailbox calls remove()/add() inside its
+    write transaction for every record it replaces or inserts; updates that
+    touch only flags (unread, requires_response) never reach the index.
+    Queries are ranked with FTS5's built-in BM25.
+    """
+
+    _SCHEMA = """
+        CREATE VIEW IF NOT EXISTS email_documents AS
+            SELECT e.rowid AS rowid, e.subject, e.sender, e.sender_name, b.content
+            FROM emails e JOIN email_bodies b ON b.id = e.id;
+        CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+            subject, sender, sender_name, content,
+            content='email_documents', content_rowid='rowid', tokenize='unicode61'
+        );
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self._conn = conn
+        self._lock = lock
+        with self._lock, self._conn:
+            fresh = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'emails_fts'"
+            ).fetchone() is None
+            self._conn.executescript(self._SCHEMA)
+            if fresh:
+                # Mail stored before the index existed is indexed once; from then on
+                # the mailbox keeps it current.
+                self._conn.execute("INSERT INTO emails_fts (emails_fts) VALUES ('rebuild')")
+
+    def remove(self, documents: List[Tuple[int, str, str, str, str]]) -> None:
+        """
+        Drop (rowid, subject, sender, sender_name, content) documents from the index.
+
+        The values must be the ones that were indexed. The caller holds the mailbox
+        lock and an open write transaction.
+        """
+        self._conn.executemany(
+            "INSERT INTO emails_fts (emails_fts, rowid, subject, sender, sender_name, content) "
+            "VALUES ('delete', ?, ?, ?, ?, ?)", documents,
+        )
+
+    def add(self, documents: List[Tuple[int, str, str, str, str]]) -> None:
+        """Index (rowid, subject, sender, sender_name, content) documents; same locking as remove()."""
+        self._conn.executemany(
+            "INSERT INTO emails_fts (rowid, subject, sender, sender_name, content) VALUES (?, ?, ?, ?, ?)",
+            documents,
+        )
+
+    def search(self, query: str, sender: Optional[str] = None, category: Optional[str] = None,
+               priority: Optional[str] = None, date_from: Optional[str] = None,
+               date_to: Optional[str] = None, limit: int = 10) -> List[Tuple[sqlite3.Row, float]]:
+        """
+        Return up to `limit` (row, score) pairs, best match first.
+
+        `sender` matches a full address or, when given as "@domain", a domain.
+        Dates compare as "YYYY-MM-DD[ HH:MM:SS]" strings; date_to is inclusive of the day.
+        Lower scores are better (FTS5 BM25 convention).
+        """
+        match = build_match_query(query)
+        clauses, params = [], []
+        if sender:
+            if sender.startswith("@"):
+                clauses.append("e.sender LIKE ?")
+                params.append(f"%{sender}")
+            else:
+                clauses.append("e.sender = ?")
+                params.append(sender)
+        if category:
+            clauses.append("e.category = ?")
+            params.append(category)
+        if priority:
+            clauses.append("e.priority = ?")
+            params.append(priority)
+        if date_from:
+            clauses.append("e.date >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("e.date <= ?")
+            params.append(date_to if len(date_to) > 10 else date_to + " 23:59:59")
+
+        weights = ", ".join(str(w) for w in FIELD_WEIGHTS.values())
+        if match:
+            sql = (
+                f"SELECT e.*, bm25(emails_fts, {weights}) AS score FROM emails_fts "
+                "JOIN emails e ON e.rowid = emails_fts.rowid WHERE emails_fts MATCH ?"
+                + "".join(f" AND {clause}" for clause in clauses)
+                + " ORDER BY score LIMIT ?"
+            )
+            params = [match] + params
+        else:
+            # Filter-only search: no text to rank by, so newest first
+            where = " WHERE " + " AND ".join(clauses) if clauses else ""
+            sql = f"SELECT e.*, 0.0 AS score FROM emails e{where} ORDER BY e.date DESC, e.id DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit]).fetchall()
+        return [(row, row["score"]) for row in rows]
@@ -0,0 +1,274 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+from array import array
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+
+N_FEATURES = 1 << 16
+# A model trained offline on labelled mail; without one the seed model below is used
+SPAM_MODEL_PATH = os.getenv("SPAM_MODEL_PATH")
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9'$%!-]+")
+# Function words carry no spam signal and would only crowd out the indicators
+_STOPWORDS = frozenset("""
+    a about all an and any are as at be been being but by can could did do does for from had has have i if in
+    into is it its just me more my no not of on or our out so some than that the their them then there these
+    they this to up us very was we were what when which who will with would you your
+""".split())
+_MAGIC = b"SPAMNB2\n"
+
+# Unmistakable spam and ordinary mail the seed model is trained on. The user's
+# own mail is never trained on: it is what the model scores.
+SEED_SPAM = [
+    {"id": "seed_spam_01", "sender": "winner@prize-center.biz", "subject": "Congratulations, you won!",
+     "content": "You have been selected as our lucky winner. Claim your free prize now, click here!"},
+    {"id": "seed_spam_02", "sender": "security@account-verify.net", "subject": "Urgent: verify your account",
+     "content": "Your account has been suspended. Verify your password and bank details within 24 hours."},
+    {"id": "seed_spam_03", "sender": "offers@cheap-deals.info", "subject": "Limited time offer!!!",
+     "content": "Act now! 90% off, limited time offer, buy now before this deal expires. 100% free shipping."},
+    {"id": "seed_spam_04", "sender": "invest@crypto-returns.io", "subject": "Double your bitcoin",
+     "content": "Guaranteed returns! Invest $100 in bitcoin today and earn $10,000 risk free."},
+    {"id": "seed_spam_05", "sender": "pharmacy@meds-online.biz", "subject": "Cheap meds, no prescription",
+     "content": "Buy cheap pills online, no prescription needed. Discreet delivery, order now!"},
+    {"id": "seed_spam_06", "sender": "barrister@inheritance-claims.org", "subject": "Unclaimed inheritance",
+     "content": "A wire transfer of $4,500,000 awaits you. Send your bank account details to claim the funds."},
+    {"id": "seed_spam_07", "sender": "noreply@free-gift-cards.com", "subject": "Your free gift card",
+     "content": "Click here to claim your $500 gift card. Exclusive reward, act now, unsubscribe anytime."},
+    {"id": "seed_spam_08", "sender": "jobs@work-from-home.biz", "subject": "Earn $5000 a week from home",
+     "content": "Make money fast working from home! No experience needed, guaranteed income, click here."},
+]
+SEED_HAM = [
+    {"id": "seed_ham_01", "sender": "maria.lopez@acme-corp.com", "subject": "Agenda for Thursday's planning meeting",
+     "content": "Hi all, attached is the agenda for Thursday. Please add any topics and review last week's notes."},
+    {"id": "seed_ham_02", "sender": "accounts@supplier-ltd.co.uk", "subject": "Invoice 4471 for October",
+     "content": "Please find the October invoice attached. Payment is due within 30 days of receipt. Thanks."},
+    {"id": "seed_ham_03", "sender": "dev-team@acme-corp.com", "subject": "Release notes: version 2.3",
+     "content": "The release went out this morning. It fixes the login timeout and improves report export speed."},
+    {"id": "seed_ham_04", "sender": "tom.baker@gmail.com", "subject": "Dinner on Saturday?",
+     "content": "Hey, are you free for dinner on Saturday evening? Let me know and I'll book a table."},
+    {"id": "seed_ham_05", "sender": "digest@engineering-weekly.com", "subject": "This week in engineering",
+     "content": "This week's articles cover database indexing, code review habits and a conference recap."},
+    {"id": "seed_ham_06", "sender": "hr@acme-corp.com", "subject": "Reminder: submit your timesheet",
+     "content": "A reminder to submit your timesheet for the current period by Friday. Contact HR with questions."},
+    {"id": "seed_ham_07", "sender": "j.chen@client-partners.com", "subject": "Re: project proposal feedback",
+     "content": "Thanks for the proposal. We reviewed the draft and have a few comments on the timeline and budget."},
+    {"id": "seed_ham_08", "sender": "noreply@calendar.example.com", "subject": "Updated invitation: design review",
+     "content": "The design review has moved to 3pm tomorrow. The meeting room and dial-in details are unchanged."},
+]
+
+logger = logging.getLogger(__name__)
+
+
+def tokenize(email: Dict[str, Any]) -> List[str]:
+    """Feature tokens for an email: body words, prefixed subject words and sender parts."""
+    sender = email.get("sender", "").lower()
+    local, _, domain = sender.partition("@")
+    words = _WORD.findall(email.get("content", "").lower())
+    subject = _WORD.findall(email.get("subject", "").lower())
+    tokens = [word for word in words if word not in _STOPWORDS]
+    tokens += ["subj:" + word for word in subject if word not in _STOPWORDS]
+    tokens += ["from:" + domain, "sender:" + local]
+    return tokens
+
+
+def _feature(token: str) -> int:
+    # crc32 rather than hash() so feature ids are stable across processes
+    return zlib.crc32(token.encode("utf-8")) & (N_FEATURES - 1)
+
+
+class SpamClassifier:
+    """
+    Multinomial Naive Bayes over hashed token features.
+
+    Per-class feature counts live in flat float arrays, so training is an in-place
+    increment and the model saves/loads as raw bytes. The label every email was
+    trained with is kept by id: training it again with the same label is a no-op,
+    and a new label moves its counts to the other class. Scoring a batch computes
+    the log-ratio of each distinct feature once and then sums, per email, its
+    token counts times those weights.
+    """
+
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+        self.counts = {label: array("d", bytes(8 * N_FEATURES)) for label in ("ham", "spam")}
+        self.totals = {"ham": 0.0, "spam": 0.0}
+        self.docs = {"ham": 0, "spam": 0}
+        # Email id -> the label its counts are filed under
+        self.labels: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, email: Dict[str, Any], label: str, sign: float) -> None:
+        # Caller holds the lock. Unlearning clamps at zero in case the body changed since it was learnt.
+        counts = self.counts[label]
+        tokens = tokenize(email)
+        for token in tokens:
+            feature = _feature(token)
+            counts[feature] = max(counts[feature] + sign, 0.0)
+        self.totals[label] = max(self.totals[label] + sign * len(tokens), 0.0)
+        self.docs[label] = max(self.docs[label] + int(sign), 0)
+
+    def partial_fit(self, emails: Iterable[Dict[str, Any]], labels: Iterable[bool]) -> int:
+        """
+        Train labelled emails (True = spam), each identified by its "id".
+
+        An email already trained with the same label is skipped; one trained with
+        the other label is unlearnt from that class first. Returns the number of
+        emails whose label changed.
+        """
+        changed = 0
+        with self._lock:
+            for email, is_spam in zip(emails, labels):
+                label = "spam" if is_spam else "ham"
+                previous = self.labels.get(email["id"])
+                if previous == label:
+                    continue
+                if previous is not None:
+                    self._count(email, previous, -1.0)
+                self._count(email, label, 1.0)
+                self.labels[email["id"]] = label
+                changed += 1
+        return changed
+
+    def predict(self, emails: List[Dict[str, Any]],
+                overlay: Optional["CorrectionOverlay"] = None) -> List[Tuple[float, List[str]]]:
+        """
+        Return (spam probability, top spam-indicating tokens) for each email.
+
+        Args:
+            emails: Emails to score
+            overlay: Corrections added to the model's counts for this call only
+        """
+        overlay = overlay or CorrectionOverlay()
+        docs = []
+        weights: Dict[int, float] = {}
+        with self._lock:
+            spam, ham, alpha = self.counts["spam"], self.counts["ham"], self.alpha
+            extra_spam, extra_ham = overlay.counts["spam"], overlay.counts["ham"]
+            for email in emails:
+                doc: Dict[str, int] = {}
+                for token in tokenize(email):
+                    doc[token] = doc.get(token, 0) + 1
+                docs.append(doc)
+                for token in doc:
+                    feature = _feature(token)
+                    if feature not in weights:
+                        weights[feature] = (math.log(spam[feature] + extra_spam.get(feature, 0) + alpha)
+                                            - math.log(ham[feature] + extra_ham.get(feature, 0) + alpha))
+            docs_spam = self.docs["spam"] + overlay.docs["spam"]
+            docs_ham = self.docs["ham"] + overlay.docs["ham"]
+            prior = math.log(docs_spam + 1) - math.log(docs_ham + 1)
+            norm = (math.log(self.totals["spam"] + overlay.totals["spam"] + alpha * N_FEATURES)
+                    - math.log(self.totals["ham"] + overlay.totals["ham"] + alpha * N_FEATURES))
+
+        results = []
+        for doc in docs:
+            contributions = {token: count * weights[_feature(token)] for token, count in doc.items()}
+            logit = prior + sum(contributions.values()) - norm * sum(doc.values())
+            probability = 1.0 / (1.0 + math.exp(-max(min(logit, 50.0), -50.0)))
+            indicators = sorted((t for t, c in contributions.items() if c > 0),
+                                key=contributions.get, reverse=True)[:3]
+            results.append((probability, indicators))
+        return results
+
+    def save(self, path: str) -> None:
+        """Write the model atomically as a JSON header followed by the raw count arrays."""
+        with self._lock:
+            header = json.dumps({
+                "n_features": N_FEATURES, "alpha": self.alpha, "totals": self.totals,
+                "docs": self.docs, "labels": self.labels,
+            }).encode("utf-8")
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(_MAGIC)
+                f.write(len(header).to_bytes(4, "little"))
+                f.write(header)
+                self.counts["ham"].tofile(f)
+                self.counts["spam"].tofile(f)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SpamClassifier":
+        """
+        Load a model written by save().
+
+        Raises:
+            ValueError: If the file is not a model for this feature space.
+        """
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} is not a spam model file")
+            header = json.loads(f.read(int.from_bytes(f.read(4), "little")))
+            if header["n_features"] != N_FEATURES:
+                raise ValueError(f"{path} was trained with {header['n_features']} features")
+            model = cls(alpha=header["alpha"])
+            for label in ("ham", "spam"):
+                counts = array("d")
+                counts.fromfile(f, N_FEATURES)
+                model.counts[label] = counts
+        model.totals = header["totals"]
+        model.docs = header["docs"]
+        model.labels = header["labels"]
+        return model
+
+
+class CorrectionOverlay:
+    """
+    One session's spam corrections as sparse counts on top of the shared model.
+
+    The overlay is rebuilt from session state on every call and only passed to
+    predict(), so a user's corrections never change another session's verdicts.
+    """
+
+    def __init__(self, emails: Optional[Dict[str, Dict[str, Any]]] = None,
+                 corrections: Optional[Dict[str, str]] = None):
+        self.counts: Dict[str, Dict[int, int]] = {"ham": {}, "spam": {}}
+        self.totals = {"ham": 0, "spam": 0}
+        self.docs = {"ham": 0, "spam": 0}
+        for email_id, correction in (corrections or {}).items():
+            if emails is None or email_id not in emails:
+                continue
+            label = "spam" if correction == "spam" else "ham"
+            counts = self.counts[label]
+            tokens = tokenize(emails[email_id])
+            for token in tokens:
+                feature = _feature(token)
+                counts[feature] = counts.get(feature, 0) + 1
+            self.totals[label] += len(tokens)
+            self.docs[label] += 1
+
+
+_classifier: Optional[SpamClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier() -> SpamClassifier:
+    """
+    Return the process-wide classifier.
+
+    Loads SPAM_MODEL_PATH when it is configured; otherwise, or when it cannot be
+    read, trains a model on SEED_SPAM and SEED_HAM in memory. The model is never
+    trained at runtime: corrections stay per session in a CorrectionOverlay.
+    """
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                classifier = None
+                if SPAM_MODEL_PATH:
+                    try:
+                        classifier = SpamClassifier.load(SPAM_MODEL_PATH)
+                    except (OSError, ValueError, KeyError, EOFError) as e:
+                        logger.warning("Could not load the spam model from %s: %s", SPAM_MODEL_PATH, e)
+                if classifier is None:
+                    classifier = SpamClassifier()
+                    classifier.partial_fit(SEED_SPAM + SEED_HAM, [True] * len(SEED_SPAM) + [False] * len(SEED_HAM))
+                _classifier = classifier
+    return _classifier
@@ -0,0 +1,134 @@
+import os
+from typing import List, Dict, Any, Optional, Callable, Sequence, Tuple
+
+# Pending changes of a key are folded into its snapshot after this many writes
+SNAPSHOT_EVERY = int(os.getenv("STATE_SNAPSHOT_EVERY", "20"))
+
+Op = Tuple[str, List[str], Any]
+
+
+def _count_key(key: str) -> str:
+    return f"{key}.ops"
+
+
+def _op_key(key: str, index: int) -> str:
+    return f"{key}.ops.{index}"
+
+
+# Session state services persist the keys written during a turn. Writing a
+# whole history or map back rewrites all of it every turn, so growing values
+# are instead kept as a snapshot under `key` plus up to SNAPSHOT_EVERY small
+# operation keys ("key.ops.0", ...) and a count ("key.ops"). A write stores one
+# operation and the count; every SNAPSHOT_EVERY writes the operations are
+# folded into a new snapshot and the slots are set to None until reused, so
+# the state never carries operations that the snapshot already holds.
+
+
+def pending_ops(state, key: str) -> List[Op]:
+    """Operations written since the last snapshot of `key`, oldest first."""
+    count = state.get(_count_key(key)) or 0
+    return [tuple(state.get(_op_key(key, index))) for index in range(count)]
+
+
+def _own(container: Any, copied: set) -> Any:
+    clone = list(container) if isinstance(container, list) else dict(container)
+    copied.add(id(clone))
+    return clone
+
+
+def _merge(target: Dict[str, Any], changes: Dict[str, Any], copied: set) -> None:
+    for name, value in changes.items():
+        if value is None:
+            target.pop(name, None)
+        elif isinstance(value, dict) and isinstance(target.get(name), dict):
+            child = target[name]
+            if id(child) not in copied:
+                child = target[name] = _own(child, copied)
+            _merge(child, value, copied)
+        else:
+            target[name] = value
+
+
+def apply_ops(base: Any, ops: Sequence[Op]) -> Any:
+    """
+    Value of `base` after `ops`, leaving `base` untouched.
+
+    Only the containers an operation reaches are copied, so applying a few
+    appends to a large snapshot does not copy the rest of it.
+    """
+    if not ops:
+        return base
+    copied: set = set()
+    if base is None:
+        kind, path, _ = ops[0]
+        root = [] if kind == "append" and not path else {}
+        copied.add(id(root))
+    else:
+        root = _own(base, copied)
+    for kind, path, value in ops:
+        node = root
+        for depth, part in enumerate(path):
+            child = node.get(part)
+            if child is None:
+                child = [] if kind == "append" and depth == len(path) - 1 else {}
+                copied.add(id(child))
+            elif id(child) not in copied:
+                child = _own(child, copied)
+            node[part] = child
+            node = child
+        if kind == "append":
+            node.extend(value)
+        else:
+            _merge(node, value, copied)
+    return root
+
+
+def load(state, key: str, default: Any = None) -> Any:
+    """Current value of a logged key: its snapshot with the pending operations applied."""
+    value = apply_ops(state.get(key), pending_ops(state, key))
+    return default if value is None else value
+
+
+def snapshot(state, key: str, value: Any) -> None:
+    """Store `value` as the new snapshot of `key`, discarding pending operations."""
+    state[key] = value
+    count = state.get(_count_key(key)) or 0
+    # State services cannot delete keys, so superseded slots are nulled rather
+    # than left holding payloads that would be persisted forever
+    for index in range(count):
+        state[_op_key(key, index)] = None
+    if count:
+        state[_count_key(key)] = 0
+
+
+def _record(state, key: str, op: Op, fold: Optional[Callable[[Any], Any]]) -> Any:
+    ops = pending_ops(state, key) + [op]
+    current = apply_ops(state.get(key), ops)
+    if len(ops) >= SNAPSHOT_EVERY:
+        current = fold(current) if fold else current
+        snapshot(state, key, current)
+    else:
+        state[_op_key(key, len(ops) - 1)] = [op[0], op[1], op[2]]
+        state[_count_key(key)] = len(ops)
+    return current
+
+
+def append(state, key: str, items: List[Any], path: Sequence[str] = (),
+           fold: Optional[Callable[[Any], Any]] = None) -> Any:
+    """
+    Append `items` to the list at `path` inside `key`, writing only the new items.
+
+    `fold` is applied to the value whenever a snapshot is taken (for example to
+    enforce retention). Returns the current value.
+    """
+    return _record(state, key, ("append", list(path), list(items)), fold)
+
+
+def update(state, key: str, changes: Dict[str, Any], path: Sequence[str] = (),
+           fold: Optional[Callable[[Any], Any]] = None) -> Any:
+    """
+    Merge `changes` into the dict at `path` inside `key`, writing only the changes.
+
+    Nested dicts are merged and a None value removes the entry. Returns the current value.
+    """
+    return _record(state, key, ("update", list(path), dict(changes)), fold)
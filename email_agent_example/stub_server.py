@@ -0,0 +1,473 @@
+"""
+Local stand-in for a remote mail service, for exercising providers without real accounts.
+
+    python -m email_agent_example.stub_server --port 8081 --size 1000 --latency 0.05
+
+serves a synthetic mailbox over the JSON API HTTPMailProvider speaks; point
+the agent at it with EMAIL_PROVIDERS="gmail=http://127.0.0.1:8081". With
+--gmail it imitates the Gmail REST API instead, for the Gmail provider:
+GMAIL_API_URL=http://127.0.0.1:8081 GMAIL_ACCESS_TOKEN=test. --google adds
+the Calendar, Drive and Tasks APIs the host app actions use:
+GOOGLE_API_BASE_URL=http://127.0.0.1:8081.
+"""
+import argparse
+import base64
+import json
+import threading
+import time
+import urllib.parse
+import uuid
+from datetime import datetime, timezone
+from email.utils import format_datetime, formataddr
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from typing import List, Dict, Any, Optional, Tuple
+
+from .gmail import FILTER_QUERIES, multipart_boundary, split_multipart
+from .mailbox import MailboxBackend
+from .records import EMAIL_FIELDS, HEADER_FIELDS, EmailRecord
+
+
+class _ServerThread:
+    """Runs an HTTP server on a daemon thread; use as a context manager or call start()/stop()."""
+
+    def _serve(self, host: str, port: int, handler) -> None:
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def _json_response(handler: BaseHTTPRequestHandler, status: int, body: Dict[str, Any]) -> None:
+    data = json.dumps(body).encode("utf-8")
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/json")
+    handler.send_header("Content-Length", str(len(data)))
+    handler.end_headers()
+    handler.wfile.write(data)
+
+
+class StubMailServer(_ServerThread):
+    """
+    Threaded HTTP server exposing a MailboxBackend.
+
+    GET /emails?filter=&limit=&cursor=&include_body=  one page plus next_cursor
+    GET /search?q=&limit=&sender=&category=&priority=&date_from=&date_to=
+
+    `latency` seconds are slept before every response to model a remote API.
+    """
+
+    def __init__(self, mailbox: MailboxBackend, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0):
+        self.mailbox = mailbox
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                url = urllib.parse.urlparse(self.path)
+                params = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+                if server.latency:
+                    time.sleep(server.latency)
+                try:
+                    if url.path == "/emails":
+                        body = server._emails(params)
+                    elif url.path == "/search":
+                        body = server._search(params)
+                    else:
+                        return self._send(404, {"error": "not found"})
+                except ValueError as e:
+                    return self._send(400, {"error": str(e)})
+                self._send(200, body)
+
+            def _send(self, status: int, body: Dict[str, Any]) -> None:
+                _json_response(self, status, body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._serve(host, port, Handler)
+
+    def _emails(self, params: Dict[str, str]) -> Dict[str, Any]:
+        page, next_cursor = self.mailbox.page_emails(
+            params.get("filter", "all"), int(params.get("limit", 5)), params.get("cursor")
+        )
+        fields = EMAIL_FIELDS + ("preview",) if params.get("include_body") == "1" else HEADER_FIELDS
+        return {"emails": page.to_dicts(fields), "next_cursor": next_cursor}
+
+    def _search(self, params: Dict[str, str]) -> Dict[str, Any]:
+        filters = {k: params.get(k) for k in ("sender", "category", "priority", "date_from", "date_to")}
+        results = self.mailbox.search(params.get("q", ""), limit=int(params.get("limit", 10)), **filters)
+        return {"emails": [dict(email.to_dict(HEADER_FIELDS), score=score) for email, score in results]}
+
+
+
+class FakeGmailServer(_ServerThread):
+    """
+    Imitation of the Gmail REST API over a MailboxBackend, speaking HTTP/1.1 keep-alive.
+
+    GET  /gmail/v1/users/me/messages?q=&maxResults=&pageToken=   messages.list
+    GET  /gmail/v1/users/me/messages/<id>?format=metadata|full    messages.get
+    POST /batch/gmail/v1                                          multipart batch of messages.get
+
+    `q` understands is:unread, is:read, is:important, category:promotions,
+    before:<epoch seconds>, from:<address> and free text. Mailbox dates are
+    treated as UTC. The first `flaky` messages.get calls (batched or not)
+    answer 429. `requests`, `message_gets` and `connections` count traffic.
+    """
+
+    def __init__(self, mailbox: MailboxBackend, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, flaky: int = 0):
+        self.mailbox = mailbox
+        self.latency = latency
+        self.flaky = flaky
+        self.requests = 0
+        self.message_gets = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def _dispatch(self, method: str) -> None:
+                with server._lock:
+                    server.requests += 1
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if server.latency:
+                    time.sleep(server.latency)
+                if not self.headers.get("Authorization", "").startswith("Bearer "):
+                    return _json_response(self, 401, {"error": {"code": 401, "message": "Login Required"}})
+                if method == "POST" and self.path == "/batch/gmail/v1":
+                    return self._batch(body)
+                status, payload = server.handle(method, self.path, body)
+                if status == 204:
+                    self.send_response(204)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                _json_response(self, status, payload or {"error": {"code": status}})
+
+            def _batch(self, body: bytes) -> None:
+                boundary = f"batch_{uuid.uuid4().hex}"
+                lines = []
+                for headers, part in split_multipart(body, multipart_boundary(self.headers.get("Content-Type"))):
+                    request_line = part.split(b"\r\n", 1)[0].decode()
+                    method, path = request_line.split()[:2]
+                    status, payload = server.handle_get(path) if method == "GET" else (405, None)
+                    content_id = headers.get("content-id", "").strip("<>")
+                    lines += [f"--{boundary}", "Content-Type: application/http",
+                              f"Content-ID: <response-{content_id}>", "",
+                              f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+                              "Content-Type: application/json; charset=UTF-8", "",
+                              json.dumps(payload or {"error": {"code": status}})]
+                lines.append(f"--{boundary}--")
+                data = "\r\n".join(lines).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/mixed; boundary={boundary}")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_PATCH(self):
+                self._dispatch("PATCH")
+
+            def do_DELETE(self):
+                self._dispatch("DELETE")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._serve(host, port, Handler)
+
+    def handle(self, method: str, path: str, body: bytes) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """(status, JSON payload) of one request outside the batch endpoint."""
+        return self.handle_get(path) if method == "GET" else (404, None)
+
+    def handle_get(self, path: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        url = urllib.parse.urlparse(path)
+        params = urllib.parse.parse_qs(url.query)
+        prefix = "/gmail/v1/users/me/messages"
+        if url.path == prefix:
+            try:
+                return 200, self._list(params)
+            except ValueError:
+                return 400, None
+        if url.path.startswith(prefix + "/"):
+            with self._lock:
+                self.message_gets += 1
+                throttled = self.message_gets <= self.flaky
+            if throttled:
+                return 429, None
+            email = self.mailbox.get_email(urllib.parse.unquote(url.path[len(prefix) + 1:]), include_body=True)
+            if email is None:
+                return 404, None
+            return 200, self._message(email, params.get("format", ["full"])[-1])
+        return 404, None
+
+    def _list(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        limit = min(int(params.get("maxResults", ["100"])[-1]), 500)
+        filter_type, before, sender, words = "all", None, None, []
+        for term in params.get("q", [""])[-1].split():
+            key, _, value = term.partition(":")
+            if term in _GMAIL_FILTERS:
+                filter_type = _GMAIL_FILTERS[term]
+            elif key == "before" and value.isdigit():
+                before = datetime.fromtimestamp(int(value), tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+            elif key == "from":
+                sender = value if "@" in value else "@" + value
+            else:
+                words.append(term)
+        if words or sender:
+            results = self.mailbox.search(" ".join(words), limit=limit, sender=sender)
+            return {"messages": [{"id": email.id, "threadId": email.id} for email, _ in results]}
+        token = params.get("pageToken", [None])[-1]
+        # (date, "") sorts before every id, so the position excludes the whole second
+        after = tuple(json.loads(token)) if token else ((before, "") if before else None)
+        emails = list(islice(self.mailbox.iter_emails(filter_type, after, batch_size=limit + 1), limit + 1))
+        page = {"messages": [{"id": email.id, "threadId": email.id} for email in emails[:limit]]}
+        if len(emails) > limit:
+            page["nextPageToken"] = json.dumps([emails[limit - 1].date, emails[limit - 1].id])
+        return page
+
+    @staticmethod
+    def _message(email: EmailRecord, format: str) -> Dict[str, Any]:
+        received = datetime.strptime(email.date, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+        labels = ["INBOX"] + ["UNREAD"] * email.unread
+        if email.priority == "high":
+            labels.append("IMPORTANT")
+        if email.category == "promotional":
+            labels.append("CATEGORY_PROMOTIONS")
+        headers = [
+            {"name": "From", "value": formataddr((email.sender_name, email.sender))},
+            {"name": "Subject", "value": email.subject},
+            {"name": "Date", "value": format_datetime(received)},
+        ]
+        payload: Dict[str, Any] = {"mimeType": "multipart/mixed", "headers": headers}
+        if format == "full":
+            text = base64.urlsafe_b64encode(email.content.encode("utf-8")).decode().rstrip("=")
+            payload["parts"] = [{"mimeType": "text/plain", "body": {"data": text}}] + [
+                {"mimeType": "application/octet-stream", "filename": name, "body": {"attachmentId": name}}
+                for name in email.attachments
+            ]
+        return {
+            "id": email.id,
+            "threadId": email.id,
+            "labelIds": labels,
+            "snippet": email.preview,
+            "internalDate": str(int(received.timestamp() * 1000)),
+            "payload": payload,
+        }
+
+
+# Gmail search operators the fake server maps onto mailbox filters
+_GMAIL_FILTERS = {query: filter_type for filter_type, query in FILTER_QUERIES.items() if query}
+
+
+def _instant(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class FakeGoogleServer(FakeGmailServer):
+    """
+    FakeGmailServer plus the other Google APIs the host app actions call, held in memory.
+
+    POST   /gmail/v1/users/me/messages/send                messages.send (kept in `sent`)
+    GET    /gmail/v1/users/me/threads/<id>                 threads.get of one mailbox email
+    GET    /calendar/v3/calendars/primary/events           events.list (timeMin, timeMax, q, maxResults)
+    POST   /calendar/v3/calendars/primary/events           events.insert
+    DELETE /calendar/v3/calendars/primary/events/<id>      events.delete
+    GET    /drive/v3/files                                 files.list over `drive_files` synthetic files
+    GET    /tasks/v1/users/@me/lists                       a single "My Tasks" list
+    GET    /tasks/v1/lists/<list>/tasks                    tasks.list (showCompleted, maxResults)
+    POST   /tasks/v1/lists/<list>/tasks                    tasks.insert
+    PATCH  /tasks/v1/lists/<list>/tasks/<id>               tasks.patch
+    DELETE /tasks/v1/lists/<list>/tasks/<id>               tasks.delete
+
+    Every access token sees the same calendar, tasks and files.
+    """
+
+    _GMAIL = "/gmail/v1/users/me"
+    _EVENTS = "/calendar/v3/calendars/primary/events"
+    _TASKS = "/tasks/v1/lists/"
+    TASK_LIST_ID = "my-tasks"
+
+    def __init__(self, mailbox: MailboxBackend, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, flaky: int = 0, drive_files: int = 50):
+        super().__init__(mailbox, host, port, latency, flaky)
+        self.sent: List[Dict[str, Any]] = []
+        self.events: Dict[str, Dict[str, Any]] = {}
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.files = [{
+            "id": f"file_{i:05d}", "name": f"Document {i}.pdf", "mimeType": "application/pdf",
+            "modifiedTime": f"2024-01-{1 + i % 28:02d}T09:00:00.000Z", "size": str(1024 * (i + 1)),
+            "owners": [{"displayName": "Load Test"}],
+            "webViewLink": f"https://drive.google.com/file/d/file_{i:05d}/view",
+        } for i in range(drive_files)]
+        self._next_id = 0
+
+    def _new_id(self, prefix: str) -> str:
+        with self._lock:
+            self._next_id += 1
+            return f"{prefix}_{self._next_id:07d}"
+
+    def handle(self, method: str, path: str, body: bytes) -> Tuple[int, Optional[Dict[str, Any]]]:
+        url = urllib.parse.urlparse(path)
+        params = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+        route = urllib.parse.unquote(url.path)
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            return 400, None
+        if route == f"{self._GMAIL}/messages/send" and method == "POST":
+            return 200, self._send(data)
+        if route.startswith(f"{self._GMAIL}/threads/") and method == "GET":
+            return self._get_thread(route[len(self._GMAIL) + len("/threads/"):])
+        if route == self._EVENTS:
+            if method == "GET":
+                return self._list_events(params)
+            if method == "POST":
+                return self._insert(self.events, "event", data, status="confirmed")
+        if route.startswith(self._EVENTS + "/") and method == "DELETE":
+            return self._delete(self.events, route[len(self._EVENTS) + 1:])
+        if route == "/drive/v3/files" and method == "GET":
+            return 200, {"files": self.files[:int(params.get("pageSize", 100))]}
+        if route == "/tasks/v1/users/@me/lists" and method == "GET":
+            return 200, {"items": [{"id": self.TASK_LIST_ID, "title": "My Tasks"}]}
+        if route.startswith(self._TASKS):
+            list_id, _, task_id = route[len(self._TASKS):].partition("/tasks")
+            if list_id != self.TASK_LIST_ID:
+                return 404, None
+            task_id = task_id.lstrip("/")
+            if not task_id:
+                if method == "GET":
+                    return 200, self._list_tasks(params)
+                if method == "POST":
+                    return self._insert(self.tasks, "task", data, status="needsAction")
+            elif method == "PATCH":
+                return self._patch(self.tasks, task_id, data)
+            elif method == "DELETE":
+                return self._delete(self.tasks, task_id)
+        return super().handle(method, path, body)
+
+    def _send(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        message_id = self._new_id("sent")
+        sent = {"id": message_id, "threadId": data.get("threadId") or message_id,
+                "bytes": len(data.get("raw") or "")}
+        with self._lock:
+            self.sent.append(sent)
+        return {"id": sent["id"], "threadId": sent["threadId"], "labelIds": ["SENT"]}
+
+    def _get_thread(self, thread_id: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        # Mailbox emails are their own threads
+        email = self.mailbox.get_email(thread_id, include_body=False)
+        if email is None:
+            return 404, None
+        message = self._message(email, "metadata")
+        message["payload"]["headers"].append({"name": "Message-Id", "value": f"<{email.id}@mail.example>"})
+        return 200, {"id": email.id, "messages": [message]}
+
+    def _insert(self, store: Dict[str, Dict[str, Any]], kind: str, data: Dict[str, Any],
+                **defaults: Any) -> Tuple[int, Dict[str, Any]]:
+        item = dict(defaults, **data, id=self._new_id(kind))
+        with self._lock:
+            store[item["id"]] = item
+        return 200, item
+
+    def _patch(self, store: Dict[str, Dict[str, Any]], item_id: str,
+               data: Dict[str, Any]) -> Tuple[int, Optional[Dict[str, Any]]]:
+        with self._lock:
+            if item_id not in store:
+                return 404, None
+            store[item_id] = dict(store[item_id], **data, id=item_id)
+            return 200, store[item_id]
+
+    def _delete(self, store: Dict[str, Dict[str, Any]], item_id: str) -> Tuple[int, None]:
+        with self._lock:
+            return (204, None) if store.pop(item_id, None) is not None else (404, None)
+
+    def _list_events(self, params: Dict[str, str]) -> Tuple[int, Optional[Dict[str, Any]]]:
+        try:
+            start = _instant(params["timeMin"]) if params.get("timeMin") else None
+            end = _instant(params["timeMax"]) if params.get("timeMax") else None
+            with self._lock:
+                events = [(_instant(event["start"]["dateTime"]), event) for event in self.events.values()]
+        except (KeyError, ValueError):
+            return 400, None
+        query = params.get("q", "").lower()
+        found = [event for begins, event in sorted(events, key=lambda pair: pair[0])
+                 if (start is None or begins >= start) and (end is None or begins < end)
+                 and (not query or query in f"{event.get('summary', '')} {event.get('description', '')}".lower())]
+        return 200, {"kind": "calendar#events", "items": found[:int(params.get("maxResults", 250))]}
+
+    def _list_tasks(self, params: Dict[str, str]) -> Dict[str, Any]:
+        with self._lock:
+            tasks = list(self.tasks.values())
+        if params.get("showCompleted") == "false":
+            tasks = [task for task in tasks if task.get("status") != "completed"]
+        return {"items": tasks[:int(params.get("maxResults", 100))]}
+
+
+def main() -> None:
+    from .benchmarks import build_mailbox
+
+    parser = argparse.ArgumentParser(description="Serve a synthetic mailbox over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--gmail", action="store_true", help="Imitate the Gmail REST API")
+    parser.add_argument("--google", action="store_true",
+                        help="Imitate the Gmail, Calendar, Drive and Tasks REST APIs")
+    args = parser.parse_args()
+
+    server_class = FakeGoogleServer if args.google else FakeGmailServer if args.gmail else StubMailServer
+    server = server_class(build_mailbox(args.size, args.seed), args.host, args.port, args.latency)
+    print(f"Serving {args.size} synthetic emails at {server.url}")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
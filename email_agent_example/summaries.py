@@ -0,0 +1,115 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from .cache import LRUCache, fields_hash
+from .text_analysis import get_analyzer
+
+
+# Fields that feed a summary; a change to any of them invalidates its cache entry
+SUMMARY_FIELDS = (
+    "sender", "sender_name", "date", "subject", "priority", "category", "content",
+    "has_attachments", "attachments", "requires_response",
+)
+
+
+def content_hash(email: Dict[str, Any]) -> str:
+    """Hash of the summary-relevant fields of an email record."""
+    return fields_hash(email, SUMMARY_FIELDS)
+
+
+# Keys of one summarize_emails entry, in response order
+SUMMARY_KEYS = (
+    "email_id", "sender", "sender_email", "date", "subject", "priority", "category",
+    "main_content", "keywords", "actions_required", "deadlines", "has_attachments",
+    "attachments", "requires_response",
+)
+_LIST_KEYS = ("keywords", "actions_required", "deadlines", "attachments")
+
+
+class EmailSummary:
+    """
+    Slotted, immutable-by-convention summary of one email.
+
+    List-valued fields are stored as tuples so cached summaries can be handed
+    out without copying; `to_dict()` builds the JSON-compatible response entry.
+    """
+
+    __slots__ = SUMMARY_KEYS
+
+    def __init__(self, **values: Any):
+        for key in SUMMARY_KEYS:
+            value = values[key]
+            setattr(self, key, tuple(value) if key in _LIST_KEYS else value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        summary = {key: getattr(self, key) for key in SUMMARY_KEYS}
+        for key in _LIST_KEYS:
+            summary[key] = list(summary[key])
+        return summary
+
+
+def build_summary(email_id: str, email: Any) -> EmailSummary:
+    """Build the summarize_emails entry for one email record (EmailRecord or dict)."""
+    # Extract key information with a single analyzer call
+    analysis = get_analyzer().analyze(email["content"])
+    return EmailSummary(
+        email_id=email_id,
+        sender=email["sender_name"],
+        sender_email=email["sender"],
+        date=email["date"],
+        subject=email["subject"],
+        priority=email["priority"],
+        category=email["category"],
+        main_content=email["content"][:200] + "..." if len(email["content"]) > 200 else email["content"],
+        keywords=analysis["keywords"],
+        actions_required=analysis["actions"],
+        deadlines=analysis["deadlines"],
+        has_attachments=email["has_attachments"],
+        attachments=email["attachments"],
+        requires_response=email["requires_response"],
+    )
+
+
+class SummaryCache(LRUCache):
+    """Size-bounded LRU of built summaries keyed by (email id, content hash)."""
+
+    def lookup(self, email_id: str, email: Any) -> Tuple[Tuple[str, str], Optional[EmailSummary]]:
+        """Return (cache key, cached summary or None) for an email record."""
+        key = (email_id, content_hash(email))
+        return key, self.get(key)
+
+    def summarize(self, email_id: str, email: Any) -> Tuple[EmailSummary, bool]:
+        """Return (summary, was_cached) for an email, building and storing it on a miss."""
+        key, summary = self.lookup(email_id, email)
+        if summary is not None:
+            return summary, True
+        summary = build_summary(email_id, email)
+        self.put(key, summary)
+        return summary, False
+
+
+# SUMMARY_CACHE_SHARED=0 gives every session its own cache; otherwise all
+# sessions in the process share one.
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "10000"))
+SUMMARY_CACHE_SHARED = os.getenv("SUMMARY_CACHE_SHARED", "1") != "0"
+MAX_SESSION_CACHES = 256
+
+_shared_cache = SummaryCache(SUMMARY_CACHE_SIZE)
+_session_caches: "OrderedDict[str, SummaryCache]" = OrderedDict()
+_session_lock = threading.Lock()
+
+
+def get_summary_cache(session_id: Optional[str] = None) -> SummaryCache:
+    """Return the summary cache serving `session_id` under the configured sharing mode."""
+    if SUMMARY_CACHE_SHARED or session_id is None:
+        return _shared_cache
+    with _session_lock:
+        cache = _session_caches.get(session_id)
+        if cache is None:
+            cache = _session_caches[session_id] = SummaryCache(SUMMARY_CACHE_SIZE)
+            while len(_session_caches) > MAX_SESSION_CACHES:
+                _session_caches.popitem(last=False)
+        _session_caches.move_to_end(session_id)
+        return cache
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("google.adk")
+
+from email_agent_example import agent, async_tools, mailbox  # noqa: E402
+from email_agent_example.benchmarks import StubToolContext, build_mailbox  # noqa: E402
+
+
+@pytest.fixture
+def local_mailbox(monkeypatch):
+    store = build_mailbox(50)
+    monkeypatch.setattr(mailbox, "_mailbox", store)
+    return store
+
+
+@pytest.mark.parametrize("include_body", [False, True])
+def test_read_emails_projects_requested_fields(local_mailbox, include_body):
+    result = asyncio.run(async_tools.read_emails("gmail", StubToolContext(), limit=5, include_body=include_body,
+                                                 fields=["subject"]))
+
+    assert result["status"] == "success"
+    assert result["count"] == 5
+    assert all(set(email) == {"id", "subject"} for email in result["emails"])
+
+
+def test_read_emails_matches_sync_projection(local_mailbox):
+    expected = agent.read_emails("gmail", StubToolContext(), limit=5, fields=["subject", "priority"])
+    result = asyncio.run(async_tools.read_emails("gmail", StubToolContext(), limit=5,
+                                                 fields=["subject", "priority"]))
+
+    assert result["emails"] == expected["emails"]
+
+
+def test_read_emails_all_platforms_returns_one_most_recent(monkeypatch):
+    from email_agent_example import providers
+    from email_agent_example.stub_server import StubMailServer
+
+    monkeypatch.setattr(providers, "_providers", {})
+    monkeypatch.setattr(providers, "_configured", True)
+    servers = [StubMailServer(build_mailbox(20, seed)).start() for seed in (1, 2)]
+    try:
+        for name, server in zip(("gmail", "outlook"), servers):
+            providers.register_provider(providers.HTTPMailProvider(name, server.url))
+        result = asyncio.run(async_tools.read_emails("all", StubToolContext(), filter_type="most_recent", limit=5))
+    finally:
+        for server in servers:
+            server.stop()
+
+    assert result["count"] == 1
+    assert result["next_cursor"] is None
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+
+import pytest
+
+# Importing the package loads the ADK agent
+pytest.importorskip("google.adk")
+
+from email_agent_example.benchmarks import build_mailbox  # noqa: E402
+from email_agent_example.gmail import (  # noqa: E402
+    ConnectionPool, GmailAPIError, GmailClient, GmailProvider, decode_batch, encode_batch,
+)
+from email_agent_example.stub_server import FakeGmailServer  # noqa: E402
+
+
+class FailingListServer(FakeGmailServer):
+    """FakeGmailServer whose first `failures` messages.list calls answer `status`."""
+
+    def __init__(self, mailbox, status: int, failures: int):
+        super().__init__(mailbox)
+        self.status = status
+        self.failures = failures
+
+    def handle(self, method, path, body):
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                return self.status, None
+        return super().handle(method, path, body)
+
+
+@pytest.fixture(scope="module")
+def mailbox():
+    return build_mailbox(200)
+
+
+def _client(server, pool_size: int = 4) -> GmailClient:
+    return GmailClient("test", pool=ConnectionPool(server.url, size=pool_size), backoff=0)
+
+
+def _newest(mailbox, count):
+    return [email.id for email in mailbox.iter_emails("all", batch_size=count)][:count]
+
+
+def test_fifty_message_read_takes_two_round_trips(mailbox):
+    with FakeGmailServer(mailbox) as server:
+        client = _client(server)
+        records = asyncio.run(GmailProvider("gmail", client).fetch_page("all", 50))
+        client.close()
+
+    assert [record.id for record in records] == _newest(mailbox, 50)
+    assert client.round_trips == server.requests == 2
+    assert server.message_gets == 50
+    assert server.connections == 1
+
+
+def test_batch_resends_only_throttled_parts(mailbox):
+    with FakeGmailServer(mailbox, flaky=10) as server:
+        client = _client(server)
+        ids = _newest(mailbox, 50)
+        messages = client.batch_get(ids)
+        client.close()
+
+    assert sorted(messages) == sorted(ids)
+    assert client.round_trips == 2
+    assert server.message_gets == 60
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_request_retries_on_throttling_and_server_errors(mailbox, status):
+    with FailingListServer(mailbox, status, failures=2) as server:
+        client = _client(server)
+        ids, _ = client.list_messages(limit=10)
+        client.close()
+
+    assert ids == _newest(mailbox, 10)
+    assert client.round_trips == 3
+
+
+def test_request_gives_up_after_max_retries(mailbox):
+    with FailingListServer(mailbox, 503, failures=10) as server:
+        client = GmailClient("test", pool=ConnectionPool(server.url), max_retries=2, backoff=0)
+        with pytest.raises(GmailAPIError) as error:
+            client.list_messages()
+        client.close()
+
+    assert error.value.status == 503
+    assert client.round_trips == 3
+
+
+def test_client_errors_are_not_retried(mailbox):
+    with FailingListServer(mailbox, 400, failures=1) as server:
+        client = _client(server)
+        with pytest.raises(GmailAPIError):
+            client.list_messages()
+        client.close()
+
+    assert client.round_trips == 1
+
+
+def test_pool_bounds_concurrent_connections(mailbox):
+    with FakeGmailServer(mailbox, latency=0.02) as server:
+        client = _client(server, pool_size=2)
+        ids = _newest(mailbox, 80)
+        threads = [threading.Thread(target=client.batch_get, args=(ids[i:i + 10],)) for i in range(0, 80, 10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        client.close()
+
+    assert client.round_trips == 8
+    assert client.pool.opened == server.connections == 2
+
+
+def test_decode_batch_matches_parts_by_content_id():
+    body = (
+        "--b\r\nContent-Type: application/http\r\nContent-ID: <response-item1>\r\n\r\n"
+        "HTTP/1.1 404 Not Found\r\nContent-Type: application/json\r\n\r\n{}\r\n"
+        "--b\r\nContent-Type: application/http\r\nContent-ID: <response-item0>\r\n\r\n"
+        "HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n{\"id\": \"a\"}\r\n"
+        "--b--"
+    ).encode()
+
+    assert decode_batch('multipart/mixed; boundary="b"', body) == {0: (200, b'{"id": "a"}'), 1: (404, b"{}")}
+    assert encode_batch(["/x", "/y"], "b").count(b"Content-ID: <item") == 2
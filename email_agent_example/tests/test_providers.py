@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+# Importing the package loads the ADK agent
+pytest.importorskip("google.adk")
+
+from email_agent_example.benchmarks import build_mailbox  # noqa: E402
+from email_agent_example.providers import HTTPMailProvider, fetch_merged  # noqa: E402
+from email_agent_example.stub_server import StubMailServer  # noqa: E402
+
+
+@pytest.fixture
+def servers():
+    started = [StubMailServer(build_mailbox(30, seed)).start() for seed in (1, 2)]
+    yield started
+    for server in started:
+        server.stop()
+
+
+def _providers(servers):
+    return [HTTPMailProvider(name, server.url) for name, server in zip(("gmail", "outlook"), servers)]
+
+
+def test_fetch_merged_fans_out_and_merges_newest_first(servers):
+    page = asyncio.run(fetch_merged(_providers(servers), "all", 10))
+
+    assert all(server.requests == 1 for server in servers)
+    assert {name for name, _ in page["emails"]} == {"gmail", "outlook"}
+    keys = [(record.date, record.id) for _, record in page["emails"]]
+    assert keys == sorted(keys, reverse=True)
+    assert page["has_more"] and not page["failed"]
+
+
+def test_fetch_merged_pages_through_every_provider_once(servers):
+    providers = _providers(servers)
+    positions, exhausted, seen = {}, (), []
+    while True:
+        page = asyncio.run(fetch_merged(providers, "all", 7, positions, exhausted))
+        seen.extend((name, record.id) for name, record in page["emails"])
+        if not page["has_more"]:
+            break
+        positions, exhausted = page["positions"], page["exhausted"]
+
+    expected = {(name, email.id) for name, server in zip(("gmail", "outlook"), servers)
+                for email in server.mailbox.iter_emails()}
+    assert len(seen) == len(expected) == 60
+    assert set(seen) == expected
+
+
+def test_fetch_merged_skips_a_provider_that_times_out(servers):
+    servers[1].latency = 0.5
+    providers = _providers(servers)
+    page = asyncio.run(fetch_merged(providers, "all", 5, timeout=0.1))
+
+    assert page["failed"] == {"outlook": "timeout"}
+    assert [name for name, _ in page["emails"]] == ["gmail"] * 5
+    # The slow provider keeps its position and is asked again on the next page
+    assert "outlook" not in page["positions"] and page["has_more"]
+
+
+def test_fetch_merged_caps_most_recent_across_providers(servers):
+    page = asyncio.run(fetch_merged(_providers(servers), "most_recent", 5))
+
+    newest = max((email.date, email.id) for server in servers for email in server.mailbox.iter_emails())
+    assert [(record.date, record.id) for _, record in page["emails"]] == [newest]
+    assert not page["has_more"]
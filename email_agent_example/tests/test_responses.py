@@ -0,0 +1,40 @@
+from email_agent_example.responses import ResponsePolicy, estimate_tokens, one, shape_response
+
+
+def _summary(i: int, duplicates: int = 0):
+    return {"email_id": f"e{i:03d}", "summary": "x" * 200, "keywords": [],
+            "duplicates": [{"email_id": f"d{i:03d}_{j}", "subject": ""} for j in range(duplicates)]}
+
+
+def test_trimmed_items_are_listed_by_id_and_counts_follow():
+    summaries = [_summary(i, duplicates=1) for i in range(40)]
+    result = {"status": "success", "summaries": summaries, "count": 80, "unique": 40,
+              "message": "Summarized 80 emails"}
+    policy = ResponsePolicy(items="summaries", counts={
+        "count": lambda summary: 1 + len(summary["duplicates"]), "unique": one})
+
+    shaped = shape_response(result, policy, budget=500)
+
+    kept = [summary["email_id"] for summary in shaped["summaries"]]
+    omitted = shaped["response"]["omitted"]["summaries"]
+    assert sorted(kept + omitted) == [summary["email_id"] for summary in summaries]
+    assert shaped["unique"] == len(kept) and shaped["count"] == 2 * len(kept)
+    assert f"{len(kept)} of 40 summaries returned" in shaped["message"]
+    assert estimate_tokens(shaped) <= 500
+    # Nested records are shaped like items: empty fields dropped
+    assert shaped["summaries"][0]["duplicates"] == [{"email_id": "d000_0"}]
+
+
+def test_secondary_lists_give_way_before_the_main_one():
+    rows = [{"email_id": f"e{i:03d}", "subject": "y" * 100} for i in range(30)]
+    result = {"status": "success", "unanswered_emails": rows[:15], "newly_overdue": rows[15:],
+              "count": 30, "message": "Found 30"}
+    policy = ResponsePolicy(items=("unanswered_emails", "newly_overdue"))
+
+    shaped = shape_response(result, policy, budget=600)
+
+    omitted = shaped["response"]["omitted"]
+    assert shaped["count"] == 30
+    assert len(omitted["newly_overdue"]) == 15 - len(shaped["newly_overdue"])
+    if "unanswered_emails" in omitted:
+        assert not shaped["newly_overdue"]
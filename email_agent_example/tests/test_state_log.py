@@ -0,0 +1,41 @@
+import json
+
+from email_agent_example import state_log
+
+
+def _state_size(state) -> int:
+    return len(json.dumps(state, sort_keys=True))
+
+
+def test_snapshot_nulls_superseded_op_slots():
+    state = {}
+    for i in range(state_log.SNAPSHOT_EVERY - 1):
+        state_log.append(state, "history", [{"n": i}])
+    assert state["history.ops"] == state_log.SNAPSHOT_EVERY - 1
+
+    state_log.append(state, "history", [{"n": "last"}])
+
+    assert state["history.ops"] == 0
+    assert all(state[f"history.ops.{i}"] is None for i in range(state_log.SNAPSHOT_EVERY - 1))
+    assert len(state_log.load(state, "history")) == state_log.SNAPSHOT_EVERY
+
+
+def test_state_size_stays_bounded_across_snapshots():
+    state = {}
+    keep_last = 10
+    writes = 6 * state_log.SNAPSHOT_EVERY
+    sizes = []
+    for i in range(writes):
+        # Fixed-width entries, so equal sizes mean equal amounts of data
+        state_log.append(state, "history", [{"n": f"{i:06d}", "payload": "x" * 200}],
+                         fold=lambda entries: entries[-keep_last:])
+        if state["history.ops"] == 0:
+            sizes.append(_state_size(state))
+
+    assert len(sizes) == 6
+    # Right after every snapshot the state holds only the retained entries
+    assert len(set(sizes)) == 1
+    assert sizes[0] < 2 * keep_last * 250
+    assert [entry["n"] for entry in state_log.load(state, "history")] == [
+        f"{i:06d}" for i in range(writes - keep_last, writes)
+    ]
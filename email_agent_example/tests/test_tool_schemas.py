@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip("google.adk")
+
+from google.adk.tools.function_tool import FunctionTool  # noqa: E402
+
+from email_agent_example import agent, tool_schemas  # noqa: E402
+
+
+def test_private_declaration_hook_exists_in_installed_adk():
+    # CachedFunctionTool overrides this private method; fail loudly if an ADK upgrade drops it
+    assert tool_schemas._CACHEABLE
+    assert all(isinstance(tool, tool_schemas.CachedFunctionTool) for tool in agent.get_root_agent().tools)
+
+
+def test_cached_declaration_matches_and_is_built_once():
+    tool = tool_schemas.CachedFunctionTool(agent.track_unanswered_emails)
+    declaration = tool._get_declaration()
+
+    assert declaration == FunctionTool(agent.track_unanswered_emails)._get_declaration()
+    assert tool._get_declaration() is declaration
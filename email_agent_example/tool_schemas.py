@@ -0,0 +1,38 @@
+import logging
+from typing import List, Callable
+
+from google.adk.tools.function_tool import FunctionTool
+
+logger = logging.getLogger(__name__)
+
+# _get_declaration is private to ADK; the override below was written against
+# google-adk 0.3.0 (pinned in adk-email-agent/requirements.txt). Other versions
+# that drop it get plain FunctionTools instead of an override nothing calls.
+_CACHEABLE = callable(getattr(FunctionTool, "_get_declaration", None))
+
+
+class CachedFunctionTool(FunctionTool):
+    """
+    FunctionTool that builds its declaration once.
+
+    The framework asks every tool for its declaration on each model request,
+    and FunctionTool rebuilds it from the signature every time; tool
+    signatures never change at runtime, so the first result is kept.
+    """
+
+    def __init__(self, func: Callable):
+        super().__init__(func)
+        self._cached_declaration = None
+
+    def _get_declaration(self):
+        if self._cached_declaration is None:
+            self._cached_declaration = super()._get_declaration()
+        return self._cached_declaration
+
+
+def cached_tools(funcs: List[Callable]) -> List[FunctionTool]:
+    """Tools for `funcs`, caching their declarations when this ADK version allows it."""
+    if not _CACHEABLE:
+        logger.warning("FunctionTool._get_declaration is missing; tool declarations are not cached")
+        return [FunctionTool(func) for func in funcs]
+    return [CachedFunctionTool(func) for func in funcs]